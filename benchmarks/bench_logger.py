@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#
+# benchmarks for the logger hot paths
+#
+#  runs against the fake linuxcnc backend (no machine needed) and reports
+#  per-call latency and throughput for different program sizes
+#
+#  python3 benchmarks/bench_logger.py
+#  python3 benchmarks/bench_logger.py --sizes 10 1000 --fake frames.jsonl --json out.json
+#
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import numpy  # noqa: E402
+
+from robotlogger.outputs import DEFAULT_CHANNELS  # noqa: E402
+from robotlogger.simplify import simplify  # noqa: E402
+from robotlogger.status import snapshot  # noqa: E402
+
+
+def load_logger():
+    spec = importlib.util.spec_from_file_location(
+        "robot_logger", os.path.join(BASE_DIR, "linuxcnc-robot-logger.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(func, setup=None, min_time=0.2, max_calls=1000):
+    """calls func until min_time or max_calls is reached, returns the latencies."""
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_calls and (
+        time.perf_counter() - started < min_time or len(latencies) < 5
+    ):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summary(latencies):
+    latencies = sorted(latencies)
+    mean = statistics.fmean(latencies)
+    return {
+        "calls": len(latencies),
+        "mean_us": mean * 1e6,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1e6,
+        "max_us": latencies[-1] * 1e6,
+        "per_s": 1.0 / mean if mean else 0.0,
+    }
+
+
+def bench_size(logger, size, tmpdir, min_time):
+    filename = os.path.join(tmpdir, f"bench_{size}.ngc")
+    logger.args.filename = [filename]
+    form = logger.WinForm(logger.args)
+    form.poller.stop()
+    form.timer.stop()
+
+    # program with size blocks
+    form.program.blocks.extend(
+        f"G0 X{n % 400}.0 Y{n % 300}.0 Z{n % 200}.0" for n in range(size)
+    )
+    form.view_reload()
+
+    def next_status():
+        form.status = snapshot(logger.s)
+
+    results = {}
+    results["poll"] = summary(measure(next_status, min_time=min_time))
+    results["statusUpdate"] = summary(
+        measure(form.statusUpdate, next_status, min_time=min_time)
+    )
+    results["runTimer"] = summary(measure(form.runTimer, next_status, min_time=min_time))
+    results["add_callback"] = summary(
+        measure(form.add_callback, next_status, min_time=min_time)
+    )
+    results["addcode"] = summary(
+        measure(lambda: form.addcode("\n(bench)\nG0 X1.0"), min_time=min_time)
+    )
+    results["save_callback"] = summary(
+        measure(form.save_callback, min_time=min_time, max_calls=50)
+    )
+    results["reset_callback"] = summary(
+        measure(form.reset_callback, min_time=min_time, max_calls=20)
+    )
+    form.close()
+    form.deleteLater()
+    return results
+
+
+# a recording of this size has to be simplified well under a second
+SIMPLIFY_BUDGET = 1.0
+
+
+def bench_simplify(points, min_time):
+    """simplify of a noisy recorded path (helix with 0.05 mm noise)."""
+    rng = numpy.random.default_rng(0)
+    steps = numpy.linspace(0.0, 100.0, points)
+    path = numpy.stack((numpy.sin(steps) * 100.0, numpy.cos(steps) * 100.0, steps), axis=1)
+    noisy = path + rng.normal(scale=0.05, size=path.shape)
+    results = {}
+    for name, space, tolerance in (
+        ("smooth 0.1", path, 0.1),
+        ("noisy 0.1", noisy, 0.1),
+        ("noisy 0.01", noisy, 0.01),
+    ):
+        results[name] = summary(
+            measure(lambda: simplify((space, tolerance)), min_time=min_time, max_calls=20)
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        help="program sizes (blocks)",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000, 100000],
+    )
+    parser.add_argument(
+        "--fake",
+        help="'synthetic' or a recorded frame file",
+        type=str,
+        default="synthetic",
+    )
+    parser.add_argument(
+        "--time", help="minimum time per benchmark (s)", type=float, default=0.2
+    )
+    parser.add_argument(
+        "--simplify-points", help="points of the simplify benchmark", type=int, default=100000
+    )
+    parser.add_argument("--json", help="write results to file", type=str, default=None)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)  # noqa: F841
+    logger = load_logger()
+    logger.connect(args.fake)
+    logger.args = argparse.Namespace(
+        joints=False,
+        check=False,
+        no_autoupdate=False,
+        poll_fast=50,
+        poll_idle=500,
+        refresh=500,
+        aout_channels=DEFAULT_CHANNELS,
+        dout_channels=DEFAULT_CHANNELS,
+        profile=None,
+        ini=None,
+        hal=None,
+        dedup_world=0.0,
+        dedup_joint=0.0,
+        dedup_any=False,
+        motion_timeout=None,
+        record_rate=100.0,
+        fake=args.fake,
+        connect=None,
+        publish=None,
+        filename=None,
+    )
+
+    results = {}
+    print(f"{'size':>8} {'hot path':<14} {'calls':>6} {'mean us':>10} {'p50 us':>10} {'p99 us':>10} {'max us':>10} {'calls/s':>10}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in args.sizes:
+            results[size] = bench_size(logger, size, tmpdir, args.time)
+            for name, result in results[size].items():
+                print(
+                    f"{size:>8} {name:<14} {result['calls']:>6} {result['mean_us']:>10.1f} "
+                    f"{result['p50_us']:>10.1f} {result['p99_us']:>10.1f} "
+                    f"{result['max_us']:>10.1f} {result['per_s']:>10.0f}"
+                )
+
+    results["simplify"] = bench_simplify(args.simplify_points, args.time)
+    for name, result in results["simplify"].items():
+        seconds = result["mean_us"] / 1e6
+        check = "ok" if seconds < SIMPLIFY_BUDGET else f"SLOW (> {SIMPLIFY_BUDGET}s)"
+        print(f"simplify {args.simplify_points} points, {name:<10} {seconds:>8.3f}s  {check}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,14 +8,23 @@
 
 
 import argparse
+import os
 import platform
 import math
 import signal
 import sys
+from collections import OrderedDict
+from functools import partial
+from typing import NamedTuple
 
+import numpy
 from OpenGL import GL
 from HersheyFonts.HersheyFonts import HersheyFonts
+from robotlogger.kinematics import DEFAULT_HAL, GenSerKins, parse_hal
+from robotlogger.recorder import COLS_JOINT, load_trajectory
+from robotlogger.workspace import DEFAULT_LIMIT, VOXEL_SIZE, WorkspaceSampler, read_joint_limits
 
+from PyQt5.QtCore import QObject, Qt, pyqtSignal  # pylint: disable=E0611
 from PyQt5.QtOpenGL import QGLFormat, QGLWidget  # pylint: disable=E0611
 from PyQt5.QtWidgets import (  # pylint: disable=E0611
     QApplication,
@@ -25,36 +34,162 @@ from PyQt5.QtWidgets import (  # pylint: disable=E0611
     QPlainTextEdit,
     QDoubleSpinBox,
     QPushButton,
+    QSlider,
     QVBoxLayout,
     QWidget,
 )
 
-hal = """
-setp genserkins.A-0 0.0
-setp genserkins.ALPHA-0 0.0
-setp genserkins.D-0 350.0
-setp genserkins.A-1 85.0
-setp genserkins.ALPHA-1 -1.571
-setp genserkins.D-1 0.0
-setp genserkins.A-2 380.0
-setp genserkins.ALPHA-2 0.0
-setp genserkins.D-2 0.0
-setp genserkins.A-3 100.0
-setp genserkins.ALPHA-3 -1.571
-setp genserkins.D-3 425.0
-setp genserkins.A-4 0.0
-setp genserkins.ALPHA-4 1.571
-setp genserkins.D-4 0.0
-setp genserkins.A-5 0.0
-setp genserkins.ALPHA-5 -1.571
-setp genserkins.D-5 0.0
-"""
+hal = DEFAULT_HAL
 parameter = {}
 
 font = HersheyFonts()
 font.load_default_font()
 font.normalize_rendering(6)
 
+CIRCLE_SEGMENTS = 100
+FRAME_SIZE = 50.0
+POINT_CAPACITY = 1 << 16
+LABEL_CACHE_SIZE = 256
+
+
+class Label(NamedTuple):
+    """line vertices (n, 3) of a text, already centered, and its bounds (min, max)."""
+
+    vertices: numpy.ndarray
+    bounds: tuple
+
+
+def build_label(text, scale, center_x, center_y):
+    lines = numpy.asarray(tuple(font.lines_for_text(text)), dtype=float).reshape(-1, 2) * scale
+    vertices = numpy.zeros((len(lines), 3), dtype=numpy.float32)
+    vertices[:, :2] = lines
+    if len(lines):
+        # width/height from the origin, like the font renders
+        size = numpy.maximum(lines.max(axis=0), 0.0)
+        if center_x:
+            vertices[:, 0] -= size[0] / 2.0
+        if center_y:
+            vertices[:, 1] -= size[1] / 2.0
+        bounds = (tuple(vertices[:, :2].min(axis=0)), tuple(vertices[:, :2].max(axis=0)))
+    else:
+        bounds = ((0.0, 0.0), (0.0, 0.0))
+    vertices.setflags(write=False)
+    return Label(vertices, bounds)
+
+
+class LabelCache:
+    """labels by (text, scale, centering), the least recently used are dropped."""
+
+    def __init__(self, size=LABEL_CACHE_SIZE):
+        self.size = size
+        self.labels = OrderedDict()
+
+    def get(self, text, scale=1.0, center_x=False, center_y=False):
+        key = (text, scale, center_x, center_y)
+        label = self.labels.get(key)
+        if label is None:
+            label = build_label(*key)
+            self.labels[key] = label
+            if len(self.labels) > self.size:
+                self.labels.popitem(last=False)
+        else:
+            self.labels.move_to_end(key)
+        return label
+
+
+labels = LabelCache()
+
+
+class LineBatch:
+    """lines (GL_LINES) of one color and width in a vertex buffer."""
+
+    def __init__(self, color, width):
+        self.color = color
+        self.width = width
+        self.vbo = None
+        self.count = 0
+
+    def upload(self, vertices):
+        vertices = numpy.ascontiguousarray(vertices, dtype=numpy.float32).reshape(-1, 3)
+        self.count = len(vertices)
+        if not self.count:
+            return
+        if self.vbo is None:
+            self.vbo = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL.GL_STATIC_DRAW)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        """needs GL_VERTEX_ARRAY enabled."""
+        if not self.count:
+            return
+        GL.glLineWidth(self.width)
+        GL.glColor4f(*self.color)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        GL.glVertexPointer(3, GL.GL_FLOAT, 0, None)
+        GL.glDrawArrays(GL.GL_LINES, 0, self.count)
+
+
+class PointCloud:
+    """points (GL_POINTS) in a vertex buffer, new points are appended."""
+
+    def __init__(self, color, size):
+        self.color = color
+        self.size = size
+        self.vbo = None
+        self.points = numpy.zeros((0, 3), dtype=numpy.float32)
+        self.count = 0
+        self.uploaded = 0
+        self.capacity = 0
+
+    def append(self, points):
+        """adds points (n, 3), uploaded with the next draw (needs the gl context)."""
+        points = numpy.asarray(points, dtype=numpy.float32).reshape(-1, 3)
+        if self.count + len(points) > len(self.points):
+            capacity = max(2 * len(self.points), self.count + len(points), POINT_CAPACITY)
+            grown = numpy.zeros((capacity, 3), dtype=numpy.float32)
+            grown[: self.count] = self.points[: self.count]
+            self.points = grown
+        self.points[self.count : self.count + len(points)] = points
+        self.count += len(points)
+
+    def clear(self):
+        self.count = 0
+        self.uploaded = 0
+
+    def upload(self):
+        if self.vbo is None:
+            self.vbo = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        if self.capacity < len(self.points):
+            # new buffer with all points
+            self.capacity = len(self.points)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, self.points.nbytes, self.points, GL.GL_DYNAMIC_DRAW)
+        else:
+            # only the new points
+            new = self.points[self.uploaded : self.count]
+            GL.glBufferSubData(GL.GL_ARRAY_BUFFER, self.uploaded * 12, new.nbytes, new)
+        self.uploaded = self.count
+
+    def draw(self):
+        """needs GL_VERTEX_ARRAY enabled."""
+        if not self.count:
+            return
+        if self.uploaded != self.count:
+            self.upload()
+        GL.glPointSize(self.size)
+        GL.glColor4f(*self.color)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        GL.glVertexPointer(3, GL.GL_FLOAT, 0, None)
+        GL.glDrawArrays(GL.GL_POINTS, 0, self.count)
+
+
+class WorkspaceSignal(QObject):
+    # delivers the points of the sampler thread to the gui thread (with the run number)
+    points = pyqtSignal(int, object)
+    finished = pyqtSignal(int)
+
 
 class GLWidget(QGLWidget):
     """customized GLWidget."""
@@ -97,7 +232,26 @@ class GLWidget(QGLWidget):
     def __init__(self, parent=None):
         """init function."""
         self.parent = parent
-        self.oldout = ""
+        # static geometry (grid) and geometry of the parameters (chain)
+        self.batches = {
+            "grid": LineBatch((0.9, 0.9, 0.9, 1.0), 0.5),
+            "center": LineBatch((0.0, 1.0, 0.0, 1.0), 5),
+            "links": LineBatch((0.0, 1.0, 1.0, 1.0), 15),
+            "circles_z": LineBatch((0.0, 0.0, 1.0, 1.0), 5),
+            "circles_y": LineBatch((1.0, 0.0, 1.0, 1.0), 5),
+            "axes_z": LineBatch((1.0, 1.0, 1.0, 0.5), 5),
+            "axes_y": LineBatch((1.0, 0.0, 0.0, 1.0), 5),
+            "frame_x": LineBatch((1.0, 0.0, 0.0, 1.0), 2),
+            "frame_y": LineBatch((0.0, 1.0, 0.0, 1.0), 2),
+            "frame_z": LineBatch((0.0, 0.0, 1.0, 1.0), 2),
+            "path": LineBatch((1.0, 1.0, 0.0, 1.0), 1),
+            "labels": LineBatch((0.9, 0.9, 0.9, 1.0), 1),
+        }
+        self.static_built = False
+        self.geometry_dirty = True
+        self.path_dirty = True
+        # reachable workspace
+        self.cloud = PointCloud((1.0, 0.6, 0.0, 0.3), 2)
         my_format = QGLFormat.defaultFormat()
         my_format.setSampleBuffers(True)
         QGLFormat.setDefaultFormat(my_format)
@@ -110,7 +264,7 @@ class GLWidget(QGLWidget):
             sys.exit(0)
 
         super(GLWidget, self).__init__()
-        self.startTimer(40)
+        # repaints only on changes (mouse, wheel, resize, parameters)
         self.setMouseTracking(True)
         if platform.system().lower() == "darwin":
             self.retina = not call(
@@ -205,160 +359,85 @@ class GLWidget(QGLWidget):
 
         GL.glNormal3f(0, 0, 1)
 
-        # Grid-X
+        if not self.static_built:
+            self.build_static()
+        if self.geometry_dirty:
+            self.build_geometry()
+
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        for batch in self.batches.values():
+            batch.draw()
+        self.cloud.draw()
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+
+        GL.glPopMatrix()
+
+    def geometry_changed(self, path=False) -> None:
+        """joints changed, path: parameters changed (trajectory path too)."""
+        self.geometry_dirty = True
+        self.path_dirty = self.path_dirty or path
+        self.update()
+
+    def build_static(self) -> None:
+        """grid and center cross."""
         grid_size = 100
-        GL.glLineWidth(0.5)
-        GL.glColor3f(0.9, 0.9, 0.9)
-        GL.glBegin(GL.GL_LINES)
-        for p_x in range(self.min_max[0], self.min_max[2] + grid_size, grid_size):
-            GL.glVertex3f(p_x, self.min_max[1], 0)
-            GL.glVertex3f(p_x, self.min_max[3], 0)
-        GL.glEnd()
-
-        # Grid-Y
-        GL.glLineWidth(0.5)
-        GL.glColor3f(0.9, 0.9, 0.9)
-        GL.glBegin(GL.GL_LINES)
-        for p_y in range(self.min_max[1], self.min_max[3] + grid_size, grid_size):
-            GL.glVertex3f(self.min_max[0], p_y, 0)
-            GL.glVertex3f(self.min_max[2], p_y, 0)
-        GL.glEnd()
-
-        GL.glLineWidth(5)
-        GL.glColor4f(0.0, 1.0, 0.0, 1.0)
-        GL.glBegin(GL.GL_LINES)
-        GL.glVertex3f(-20.0, -20.0, 0.0)
-        GL.glVertex3f(20.0, 20.0, 0.0)
-        GL.glVertex3f(20.0, -20.0, 0.0)
-        GL.glVertex3f(-20.0, 20.0, 0.0)
-        GL.glEnd()
+        min_x, min_y, max_x, max_y = self.min_max
+        lines = []
+        for p_x in range(min_x, max_x + grid_size, grid_size):
+            lines += [(p_x, min_y, 0), (p_x, max_y, 0)]
+        for p_y in range(min_y, max_y + grid_size, grid_size):
+            lines += [(min_x, p_y, 0), (max_x, p_y, 0)]
+        self.batches["grid"].upload(lines)
+        self.batches["center"].upload(
+            [(-20.0, -20.0, 0.0), (20.0, 20.0, 0.0), (20.0, -20.0, 0.0), (-20.0, 20.0, 0.0)]
+        )
+        self.static_built = True
 
+    def build_geometry(self) -> None:
+        """chain, joint circles, frames and labels of the current parameters and joints."""
         text_scale = 5.0
         circle_off = 20.0
         circle_rad = 20.0
-        angle = 0.0
-        next_point = [0.0, 0.0, 0.0]
-        last_point = [0.0, 0.0, 0.0]
-
-        config = []
-        for joint in range(6):
-            param_a = parameter[f"A-{joint}"].value()
-            param_alpha = parameter[f"ALPHA-{joint}"].value()
-            param_d = parameter[f"D-{joint}"].value()
-            config.append(f"setp genserkins.A-{joint} {param_a}")
-            config.append(f"setp genserkins.ALPHA-{joint} {param_alpha}")
-            config.append(f"setp genserkins.D-{joint} {param_d}")
-
-            angle += parameter[f"ALPHA-{joint}"].value()
-            next_point[0] += parameter[f"A-{joint}"].value() * math.sin(math.pi / 2)
-            next_point[2] += parameter[f"A-{joint}"].value() * math.cos(math.pi / 2)
-
-            GL.glLineWidth(15)
-            GL.glColor4f(0.0, 1.0, 1.0, 1.0)
-            GL.glBegin(GL.GL_LINES)
-            GL.glVertex3f(last_point[0], last_point[1], last_point[2])
-            GL.glVertex3f(next_point[0], next_point[1], next_point[2])
-            GL.glEnd()
-            last_point = next_point.copy()
-
-            next_point[0] += parameter[f"D-{joint}"].value() * math.sin(angle)
-            next_point[2] += parameter[f"D-{joint}"].value() * math.cos(angle)
-
-            last_c = None
-            if joint in {0, 4}:
-                GL.glLineWidth(5)
-                GL.glColor4f(0.0, 0.0, 1.0, 1.0)
-                GL.glBegin(GL.GL_LINES)
-                mid_z = last_point[2] + (next_point[2] - last_point[2]) / 2
-                for n in range(100 + 1):
-                    a = math.pi * 2 / 100 * n
-                    ex = next_point[0] + circle_rad * math.sin(a)
-                    ey = next_point[1] + circle_rad * math.cos(a)
-                    next_c = (ex, ey, mid_z)
-                    if last_c:
-                        GL.glVertex3f(*last_c)
-                        GL.glVertex3f(*next_c)
-                    last_c = next_c
-                GL.glEnd()
-
-                GL.glLineWidth(1)
-                GL.glColor3f(0.9, 0.9, 0.9)
-                GL.glBegin(GL.GL_LINES)
-                draw_text(
-                    f"{joint}",
-                    next_point[0],
-                    next_point[1],
-                    mid_z,
-                    text_scale,
-                    True,
-                    True,
-                )
-                GL.glEnd()
-
-            else:
-                GL.glLineWidth(5)
-                GL.glColor4f(1.0, 0.0, 1.0, 1.0)
-                GL.glBegin(GL.GL_LINES)
-                for n in range(100 + 1):
-                    a = math.pi * 2 / 100 * n
-                    ex = next_point[0] + circle_rad * math.sin(a)
-                    ez = next_point[2] + circle_rad * math.cos(a)
-                    next_c = (ex, next_point[1] + 30, ez)
-                    if last_c:
-                        GL.glVertex3f(*last_c)
-                        GL.glVertex3f(*next_c)
-
-                    last_c = next_c
-                GL.glEnd()
-
-                GL.glLineWidth(1)
-                GL.glColor3f(0.9, 0.9, 0.9)
-                GL.glBegin(GL.GL_LINES)
-                draw_text(
-                    f"{joint}",
-                    next_point[0],
-                    next_point[1] + circle_off,
-                    next_point[2],
-                    text_scale,
-                    True,
-                    True,
+        kinematics = self.parent.kinematics()
+        frames = kinematics.frames(self.parent.joint_values)
+
+        # links: along x (A) to the joint axis, along the joint axis (D)
+        origins = frames[:, :3, 3]
+        joint_z = frames[1:, :3, 2]
+        joint_points = origins[1:] - kinematics.d[:, None] * joint_z
+        links = numpy.stack((origins[:-1], joint_points, joint_points, origins[1:]), axis=1)
+        self.batches["links"].upload(links)
+
+        # joint circles and axes, blue for vertical joint axes
+        centers = (joint_points + origins[1:]) / 2.0
+        vertical = numpy.abs(joint_z[:, 2]) > 0.7
+        circles = circle_lines(centers, circle_rad, frames[1:, :3, 0], frames[1:, :3, 1])
+        axes = numpy.stack((centers - circle_off * joint_z, centers + circle_off * joint_z), axis=1)
+        for name, select in (("z", vertical), ("y", ~vertical)):
+            self.batches[f"circles_{name}"].upload(circles[select])
+            self.batches[f"axes_{name}"].upload(axes[select])
+
+        label_lines = []
+        for joint, center in enumerate(centers):
+            offset = 0.0 if vertical[joint] else circle_off
+            label_lines.append(
+                text_lines(
+                    f"{joint}", center[0], center[1] + offset, center[2], text_scale, True, True
                 )
-                GL.glEnd()
-
-            GL.glLineWidth(15)
-            GL.glColor4f(0.0, 1.0, 1.0, 1.0)
-            GL.glBegin(GL.GL_LINES)
-            GL.glVertex3f(last_point[0], last_point[1], last_point[2])
-            GL.glVertex3f(next_point[0], next_point[1], next_point[2])
-            GL.glEnd()
-            GL.glLineWidth(5)
-
-            if joint not in {0, 4}:
-                GL.glColor4f(1.0, 0.0, 0.0, 1.0)
-                GL.glBegin(GL.GL_LINES)
-                GL.glVertex3f(next_point[0], next_point[1] - circle_off, next_point[2])
-                GL.glVertex3f(next_point[0], next_point[1] + circle_off, next_point[2])
-                GL.glEnd()
-            else:
-                GL.glColor4f(1.0, 1.0, 1.0, 0.5)
-                GL.glBegin(GL.GL_LINES)
-                GL.glVertex3f(next_point[0], next_point[1] - circle_off, next_point[2])
-                GL.glVertex3f(next_point[0], next_point[1] + circle_off, next_point[2])
-                GL.glEnd()
-
-            last_point = next_point.copy()
-
-        GL.glPopMatrix()
+            )
+        self.batches["labels"].upload(numpy.concatenate(label_lines) if label_lines else ())
 
-        new = "\n".join(config).strip()
-        if new != self.oldout:
-            self.parent.output.clear()
-            self.parent.output.insertPlainText(new)
-            self.oldout = new
+        # coordinate frames of the base, every link and the tool
+        for column, name in enumerate(("frame_x", "frame_y", "frame_z")):
+            ends = origins + FRAME_SIZE * frames[:, :3, column]
+            self.batches[name].upload(numpy.stack((origins, ends), axis=1))
 
-    def timerEvent(self, event) -> None:  # pylint: disable=C0103,W0613
-        """gltimer function."""
-        self.update()
+        if self.path_dirty:
+            path = self.parent.path()
+            self.batches["path"].upload(polyline_lines(path) if path is not None else ())
+            self.path_dirty = False
+        self.geometry_dirty = False
 
     def mousePressEvent(self, event) -> None:  # pylint: disable=C0103
         """mouse button pressed."""
@@ -396,6 +475,9 @@ class GLWidget(QGLWidget):
             if self.ortho:
                 self.ortho = False
                 self.initializeGL()
+        else:
+            return
+        self.update()
 
     def wheelEvent(self, event) -> None:  # pylint: disable=C0103,W0613
         """mouse wheel moved."""
@@ -403,9 +485,27 @@ class GLWidget(QGLWidget):
             self.scale_xyz += self.wheel_scale
         else:
             self.scale_xyz -= self.wheel_scale
+        self.update()
+
+
+def circle_lines(centers, radius, axes_u, axes_v, segments=CIRCLE_SEGMENTS):
+    """line vertices (n, segments * 2, 3) of circles around centers (n, 3) in the u/v planes."""
+    angles = numpy.linspace(0.0, math.pi * 2, segments + 1)[None, :, None]
+    points = (
+        numpy.asarray(centers)[:, None]
+        + radius * numpy.sin(angles) * numpy.asarray(axes_u)[:, None]
+        + radius * numpy.cos(angles) * numpy.asarray(axes_v)[:, None]
+    )
+    return numpy.stack((points[:, :-1], points[:, 1:]), axis=2).reshape(len(points), -1, 3)
 
 
-def draw_text(
+def polyline_lines(points):
+    """line vertices of a polyline (n, 3)."""
+    points = numpy.asarray(points)
+    return numpy.stack((points[:-1], points[1:]), axis=1)
+
+
+def text_lines(
     text: str,
     pos_x: float,
     pos_y: float,
@@ -413,23 +513,9 @@ def draw_text(
     scale: float = 1.0,
     center_x: bool = False,
     center_y: bool = False,
-) -> None:
-    test_data = tuple(font.lines_for_text(text))
-    if center_x or center_y:
-        width = 0.0
-        height = 0.0
-        for (x_1, y_1), (x_2, y_2) in test_data:
-            width = max(width, x_1 * scale)
-            width = max(width, x_2 * scale)
-            height = max(height, y_1 * scale)
-            height = max(height, y_2 * scale)
-        if center_x:
-            pos_x -= width / 2.0
-        if center_y:
-            pos_y -= height / 2.0
-    for (x_1, y_1), (x_2, y_2) in test_data:
-        GL.glVertex3f(pos_x + x_1 * scale, pos_y + y_1 * scale, pos_z)
-        GL.glVertex3f(pos_x + x_2 * scale, pos_y + y_2 * scale, pos_z)
+):
+    """line vertices (n, 3) of a text (from the label cache)."""
+    return labels.get(text, scale, center_x, center_y).vertices + (pos_x, pos_y, pos_z)
 
 
 class WinForm(QWidget):
@@ -459,11 +545,7 @@ class WinForm(QWidget):
             print(f"loading params from halfile: {args.halfile}")
             hal = open(args.halfile, "r").read()
 
-        for line in hal.split("\n"):
-            if not line.startswith("setp genserkins."):
-                continue
-            key = line.split()[1].split(".")[1]
-            value = float(line.split()[-1])
+        for key, value in parse_hal(hal).items():
 
             vbox = QHBoxLayout()
             layoutleft.addLayout(vbox)
@@ -480,14 +562,205 @@ class WinForm(QWidget):
                 dspinbox.setSingleStep(1.0)
             dspinbox.setValue(value)
             dspinbox.setFixedWidth(250)
+            dspinbox.valueChanged.connect(self.parameters_changed)
             parameter[key] = dspinbox
             vbox.addWidget(dspinbox)
 
+        # joint angles and limits (degrees)
+        self.kinematics_cache = None
+        self.path_cache = None
+        joints = self.kinematics().joints
+        self.joint_values = numpy.zeros(joints)
+        lower = numpy.full(joints, -DEFAULT_LIMIT)
+        upper = numpy.full(joints, DEFAULT_LIMIT)
+        if args.ini:
+            print(f"loading joint limits from ini: {args.ini}")
+            lower, upper = read_joint_limits(args.ini, joints)
+        self.joint_sliders = []
+        self.joint_limits = []
+        layoutleft.addWidget(QLabel("Joints (angle, min, max):"))
+        for joint in range(joints):
+            hbox = QHBoxLayout()
+            layoutleft.addLayout(hbox)
+            jlabel = QLabel(f"J{joint}: 0.0")
+            jlabel.setFixedWidth(70)
+            hbox.addWidget(jlabel)
+            slider = QSlider(Qt.Horizontal)
+            slider.setFixedWidth(130)
+            hbox.addWidget(slider)
+            limits = []
+            for value in (lower[joint], upper[joint]):
+                lspinbox = QDoubleSpinBox()
+                lspinbox.setRange(-9999.0, 9999.0)
+                lspinbox.setDecimals(1)
+                lspinbox.setValue(value)
+                lspinbox.setFixedWidth(60)
+                lspinbox.valueChanged.connect(
+                    lambda _value, joint=joint: self.limits_changed(joint)
+                )
+                hbox.addWidget(lspinbox)
+                limits.append(lspinbox)
+            self.joint_sliders.append((slider, jlabel))
+            self.joint_limits.append(limits)
+            self.limits_changed(joint)
+            slider.valueChanged.connect(
+                lambda value, joint=joint: self.joint_changed(joint, float(value))
+            )
+
+        # recorded trajectory (joint positions of the logger's continuous recording)
+        self.trajectory = None
+        if args.trajectory:
+            print(f"loading trajectory: {args.trajectory}")
+            self.trajectory = load_trajectory(args.trajectory)[:, COLS_JOINT]
+        if self.trajectory is not None and len(self.trajectory):
+            layoutleft.addWidget(QLabel(f"Trajectory ({len(self.trajectory)} samples):"))
+            self.scrubber = QSlider(Qt.Horizontal)
+            self.scrubber.setRange(0, len(self.trajectory) - 1)
+            self.scrubber.setFixedWidth(320)
+            self.scrubber.valueChanged.connect(self.scrub)
+            layoutleft.addWidget(self.scrubber)
+            self.scrub(0)
+
+        # reachable workspace (monte carlo samples within the joint limits)
+        self.sampler = None
+        self.sampler_run = 0
+        self.workers = args.workers
+        self.workspace_signal = WorkspaceSignal()
+        self.workspace_signal.points.connect(self.workspace_points)
+        self.workspace_signal.finished.connect(self.workspace_finished)
+        layoutleft.addWidget(QLabel("Workspace (million samples, voxel mm):"))
+        hbox = QHBoxLayout()
+        layoutleft.addLayout(hbox)
+        self.workspace_samples = QDoubleSpinBox()
+        self.workspace_samples.setRange(0.1, 10000.0)
+        self.workspace_samples.setDecimals(1)
+        self.workspace_samples.setValue(10.0)
+        self.workspace_samples.setFixedWidth(80)
+        hbox.addWidget(self.workspace_samples)
+        self.workspace_voxel = QDoubleSpinBox()
+        self.workspace_voxel.setRange(0.1, 1000.0)
+        self.workspace_voxel.setDecimals(1)
+        self.workspace_voxel.setValue(VOXEL_SIZE)
+        self.workspace_voxel.setFixedWidth(80)
+        hbox.addWidget(self.workspace_voxel)
+        self.workspace_button = QPushButton("Sample")
+        self.workspace_button.clicked.connect(self.workspace_callback)
+        hbox.addWidget(self.workspace_button)
+        self.workspace_label = QLabel("")
+        layoutleft.addWidget(self.workspace_label)
+
         exitbutton = QPushButton("&Exit")
         exitbutton.clicked.connect(self.exit_callback)
         layoutleft.addWidget(exitbutton)
+        self.update_output()
+
+    def kinematics(self):
+        """GenSerKins of the parameter spinboxes."""
+        if self.kinematics_cache is None:
+            self.kinematics_cache = GenSerKins.from_params(
+                {key: spinbox.value() for key, spinbox in parameter.items()}
+            )
+        return self.kinematics_cache
+
+    def path(self):
+        """tool positions (n, 3) of the whole trajectory, one batch."""
+        if self.trajectory is None:
+            return None
+        if self.path_cache is None:
+            self.path_cache = self.kinematics().pose(self.trajectory)[:, :3]
+        return self.path_cache
+
+    def parameters_changed(self):
+        self.kinematics_cache = None
+        self.path_cache = None
+        self.update_output()
+        # the workspace of the old parameters is wrong now
+        self.workspace_stop()
+        self.view3d.cloud.clear()
+        self.workspace_label.setText("")
+        self.view3d.geometry_changed(path=True)
+
+    def limits_changed(self, joint):
+        lower, upper = (spinbox.value() for spinbox in self.joint_limits[joint])
+        slider = self.joint_sliders[joint][0]
+        slider.setRange(int(math.ceil(lower)), int(math.floor(upper)))
+        if not slider.minimum() <= self.joint_values[joint] <= slider.maximum():
+            # the slider is clamped to the new range, the joint follows
+            self.joint_changed(joint, float(slider.value()))
+
+    def workspace_callback(self):
+        if self.sampler is not None:
+            self.workspace_stop()
+            return
+        lower = [limits[0].value() for limits in self.joint_limits]
+        upper = [limits[1].value() for limits in self.joint_limits]
+        self.view3d.cloud.clear()
+        self.sampler_run += 1
+        self.sampler = WorkspaceSampler(
+            self.kinematics(),
+            lower,
+            upper,
+            int(self.workspace_samples.value() * 1e6),
+            partial(self.workspace_signal.points.emit, self.sampler_run),
+            finished=partial(self.workspace_signal.finished.emit, self.sampler_run),
+            voxel=self.workspace_voxel.value(),
+            workers=self.workers,
+        )
+        self.sampler.start()
+        self.workspace_button.setText("Stop")
+
+    def workspace_stop(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+            self.workspace_button.setText("Sample")
+
+    def workspace_points(self, run, points):
+        if run != self.sampler_run or self.sampler is None:
+            # from a stopped run
+            return
+        self.view3d.cloud.append(points)
+        self.workspace_update()
+        self.view3d.update()
+
+    def workspace_finished(self, run):
+        if run != self.sampler_run or self.sampler is None:
+            return
+        self.workspace_update()
+        self.sampler = None
+        self.workspace_button.setText("Sample")
+
+    def workspace_update(self):
+        self.workspace_label.setText(
+            f"{self.sampler.done / 1e6:.1f}M samples, {self.view3d.cloud.count} voxels"
+        )
+
+    def joint_changed(self, joint, value):
+        self.joint_values[joint] = value
+        self.joint_sliders[joint][1].setText(f"J{joint}: {value:.1f}")
+        self.view3d.geometry_changed()
+
+    def scrub(self, index):
+        """shows the robot at a trajectory sample."""
+        joints = self.trajectory[index, : len(self.joint_values)]
+        self.joint_values[:] = joints
+        for joint, ((slider, jlabel), value) in enumerate(zip(self.joint_sliders, joints)):
+            slider.blockSignals(True)
+            slider.setValue(int(round(value)))
+            slider.blockSignals(False)
+            jlabel.setText(f"J{joint}: {value:.1f}")
+        self.view3d.geometry_changed()
+
+    def update_output(self):
+        """hal setp lines of the parameters."""
+        config = []
+        for joint in range(6):
+            for name in ("A", "ALPHA", "D"):
+                config.append(f"setp genserkins.{name}-{joint} {parameter[f'{name}-{joint}'].value()}")
+        self.output.setPlainText("\n".join(config))
 
     def exit_callback(self):
+        self.workspace_stop()
         exit(0)
 
 
@@ -496,6 +769,24 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("halfile", help="halfile", nargs="?", type=str, default=None)
+    parser.add_argument(
+        "--trajectory",
+        help="recorded trajectory of the logger (<filename>.traj) to scrub through",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--ini",
+        help="machine INI for the joint limits of the workspace (default $INI_FILE_NAME)",
+        type=str,
+        default=os.environ.get("INI_FILE_NAME"),
+    )
+    parser.add_argument(
+        "--workers",
+        help="processes for the workspace sampling (default: all cpus)",
+        type=int,
+        default=None,
+    )
     args = parser.parse_args()
     form = WinForm(args)
     form.show()
@@ -6,32 +6,147 @@
 #
 
 import argparse
+import atexit
 import os
 import signal
 import sys
+import time
 from datetime import datetime
 from functools import partial
 
-import linuxcnc
-from PyQt5.QtCore import QTimer
+import numpy
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QObject, Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QFontDatabase, QKeySequence, QPalette
 from PyQt5.QtWidgets import (
     QApplication,
     QCheckBox,
     QHBoxLayout,
     QLabel,
     QLineEdit,
-    QPlainTextEdit,
     QPushButton,
+    QHeaderView,
+    QShortcut,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
 
-MODE_NAME = ["WORLD", "JOINT"]
-AXIS_NAMES = ["X", "Y", "Z", "A", "B", "C", "U", "V", "W"]
+from robotlogger.backend import SOCKET_PREFIX, load_backend
+from robotlogger.capture import AXIS_NAMES, JOINT_OFFSETS, Capture
+from robotlogger.commands import DONE, CommandQueue
+from robotlogger.cycletime import Limits, estimate_program, format_estimate, read_ini
+from robotlogger.dedup import Deduplicator
+from robotlogger.fanout import StatusPublisher
+from robotlogger.gcode import goto_blocks
+from robotlogger.headless import check
+from robotlogger.journal import Journal, ProgramFile
+from robotlogger.kinematics import load_kinematics
+from robotlogger.optimize import format_report, optimize_program
+from robotlogger.outputs import DEFAULT_CHANNELS, OutputState
+from robotlogger.profile import Profiler
+from robotlogger.program import PROGRAM_END, Program, open_program, parse_code
+from robotlogger.recorder import (
+    COL_TIME,
+    COLS_JOINT,
+    COLS_WORLD,
+    TrajectoryRecorder,
+    load_trajectory,
+    trajectory_to_gcode,
+)
+from robotlogger.session import SessionWriter, row_from_status, session_path
+from robotlogger.simplify import simplify, simplify_program
+from robotlogger.status import StatusPoller, snapshot
+from robotlogger.viewmodel import ViewModel, build_view
+
+STYLE_COLORS = {
+    "normal": Qt.black,
+    "snapped": Qt.green,
+    "active": Qt.green,
+    "passive": Qt.blue,
+    "inactive": Qt.red,
+}
 
 # http://linuxcnc.org/docs/master/html/de/config/python-interface.html
-s = linuxcnc.stat()
-c = linuxcnc.command()
+linuxcnc = None
+s = None
+c = None
+
+
+def connect(spec=None):
+    """binds the linuxcnc module (or a fake backend) and its stat/command objects."""
+    global linuxcnc, s, c
+    linuxcnc = load_backend(spec)
+    s = linuxcnc.stat()
+    c = linuxcnc.command()
+
+
+class StatusSignal(QObject):
+    # delivers snapshots from the poller thread (queued) to the gui thread
+    received = pyqtSignal(object)
+
+
+class CommandSignal(QObject):
+    # delivers finished command requests to the gui thread
+    finished = pyqtSignal(object)
+
+
+class ProgramModel(QAbstractListModel):
+    """program blocks (plus the program end) for a virtual list view.
+
+    the view only reads the visible rows, edits go to the program.
+    """
+
+    def __init__(self, program):
+        super().__init__()
+        self.program = program
+
+    def set_program(self, program):
+        self.beginResetModel()
+        self.program = program
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):  # pylint: disable=C0103
+        if parent.isValid():
+            return 0
+        return len(self.program) + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role not in {Qt.DisplayRole, Qt.EditRole}:
+            return None
+        row = index.row()
+        if row == len(self.program):
+            return PROGRAM_END
+        return self.program.blocks[row]
+
+    def flags(self, index):
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if index.row() < len(self.program):
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):  # pylint: disable=C0103
+        if role != Qt.EditRole or index.row() >= len(self.program):
+            return False
+        self.program.set_block(index.row(), value)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def append(self, code):
+        blocks = parse_code(code)
+        if blocks:
+            first = len(self.program)
+            self.beginInsertRows(QModelIndex(), first, first + len(blocks) - 1)
+            self.program.extend(blocks)
+            self.endInsertRows()
+        return blocks
+
+    def delete(self, rows):
+        for row in sorted(set(rows), reverse=True):
+            if row < len(self.program):
+                self.beginRemoveRows(QModelIndex(), row, row)
+                self.program.delete_block(row)
+                self.endRemoveRows()
+
 
 class WinForm(QWidget):
     def __init__(self, args, parent=None):
@@ -41,10 +156,35 @@ class WinForm(QWidget):
         self.setLayout(layoutMain)
         # self.resize(1900, 1200)
         signal.signal(signal.SIGINT, signal.SIG_DFL)
+        # hot path timing (--profile)
+        self.profiler = Profiler(enabled=args.profile is not None)
         layoutleft = QVBoxLayout()
         layoutMain.addLayout(layoutleft)
-        self.logview = QPlainTextEdit()
+        self.capture = Capture(
+            joints=args.joints,
+            outputs=OutputState(args.aout_channels, args.dout_channels),
+            kinematics=load_kinematics(args.hal) if args.hal else None,
+        )
+        self.session = SessionWriter(session_path(args.filename[0]))
+        self.program = Program()
+        self.programmodel = ProgramModel(self.program)
+        # table view with fixed row heights only touches the visible rows
+        self.logview = QTableView()
         self.logview.setFixedWidth(450)
+        self.logview.setShowGrid(False)
+        self.logview.horizontalHeader().hide()
+        self.logview.horizontalHeader().setStretchLastSection(True)
+        self.logview.verticalHeader().hide()
+        self.logview.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.logview.verticalHeader().setDefaultSectionSize(
+            self.logview.fontMetrics().height() + 2
+        )
+        self.logview.setSelectionBehavior(QTableView.SelectRows)
+        self.logview.setSelectionMode(QTableView.ExtendedSelection)
+        self.logview.setModel(self.programmodel)
+        deleteshortcut = QShortcut(QKeySequence.Delete, self.logview)
+        deleteshortcut.setContext(Qt.WidgetShortcut)
+        deleteshortcut.activated.connect(self.delete_callback)
         layoutMain.addWidget(self.logview)
         layoutright = QVBoxLayout()
         layoutMain.addLayout(layoutright)
@@ -60,6 +200,7 @@ class WinForm(QWidget):
             self.checkboxes[f"W_{name}"] = QCheckBox(name)
             if an < 3:
                 self.checkboxes[f"W_{name}"].setChecked(True)
+            self.checkboxes[f"W_{name}"].toggled.connect(self.axes_changed)
             wlay.addWidget(self.checkboxes[f"W_{name}"])
         jlay = QVBoxLayout()
         jlay.addWidget(QLabel("Joint"))
@@ -67,6 +208,7 @@ class WinForm(QWidget):
         for jn, name in enumerate(AXIS_NAMES):
             self.checkboxes[f"J_{name}"] = QCheckBox(f"{jn}")
             self.checkboxes[f"J_{name}"].setChecked(True)
+            self.checkboxes[f"J_{name}"].toggled.connect(self.axes_changed)
             jlay.addWidget(self.checkboxes[f"J_{name}"])
 
         addbutton = QPushButton("\n&Add\n")
@@ -77,6 +219,23 @@ class WinForm(QWidget):
         pausebutton.clicked.connect(self.pause_callback)
         layoutleft.addWidget(pausebutton)
 
+        self.recorder = None
+        self.recordbutton = QPushButton("&Record")
+        self.recordbutton.setCheckable(True)
+        self.recordbutton.toggled.connect(self.record_callback)
+        layoutleft.addWidget(self.recordbutton)
+
+        golay = QHBoxLayout()
+        layoutleft.addLayout(golay)
+        gobutton = QPushButton("&Go to row")
+        gobutton.setToolTip("moves to the point of the selected G0 row (MDI)")
+        gobutton.clicked.connect(self.goto_callback)
+        golay.addWidget(gobutton)
+        stopbutton = QPushButton("Stop")
+        stopbutton.setToolTip("cancels pending MDI commands and aborts the running one")
+        stopbutton.clicked.connect(self.stop_callback)
+        golay.addWidget(stopbutton)
+
         layoutleft.addWidget(QLabel("Comment:"))
         self.commentline = QLineEdit()
         self.commentline.setFixedWidth(250)
@@ -85,11 +244,58 @@ class WinForm(QWidget):
 
         layoutleft.addStretch()
 
+        layoutleft.addWidget(QLabel("Dedup-Tolerance (World/Joint):"))
+        deduplay = QHBoxLayout()
+        layoutleft.addLayout(deduplay)
+        self.dedup_w = QLineEdit()
+        self.dedup_w.setFixedWidth(70)
+        self.dedup_w.setText(str(args.dedup_world))
+        deduplay.addWidget(self.dedup_w)
+        self.dedup_j = QLineEdit()
+        self.dedup_j.setFixedWidth(70)
+        self.dedup_j.setText(str(args.dedup_joint))
+        deduplay.addWidget(self.dedup_j)
+        self.dedup_any = QCheckBox("any")
+        self.dedup_any.setToolTip("compare with all recorded positions, not only the last one")
+        self.dedup_any.setChecked(args.dedup_any)
+        deduplay.addWidget(self.dedup_any)
+        self.dedup_settings = None
+
+        layoutleft.addWidget(QLabel("Simplify-Tolerance (World/Joint):"))
+        simplifylay = QHBoxLayout()
+        layoutleft.addLayout(simplifylay)
+        self.simplify_w = QLineEdit()
+        self.simplify_w.setFixedWidth(70)
+        self.simplify_w.setText("0.1")
+        simplifylay.addWidget(self.simplify_w)
+        self.simplify_j = QLineEdit()
+        self.simplify_j.setFixedWidth(70)
+        self.simplify_j.setText("0.1")
+        simplifylay.addWidget(self.simplify_j)
+        simplifybutton = QPushButton("Simplify")
+        simplifybutton.clicked.connect(self.simplify_callback)
+        simplifylay.addWidget(simplifybutton)
+
+        optimizelay = QHBoxLayout()
+        layoutleft.addLayout(optimizelay)
+        self.parallel_io = QCheckBox("parallel IO")
+        self.parallel_io.setToolTip("one pause for a group of IO writes")
+        optimizelay.addWidget(self.parallel_io)
+        optimizebutton = QPushButton("Optimize")
+        optimizebutton.clicked.connect(self.optimize_callback)
+        optimizelay.addWidget(optimizebutton)
+        estimatebutton = QPushButton("Cycle time")
+        estimatebutton.setToolTip("estimated run time (limits from the machine INI)")
+        estimatebutton.clicked.connect(self.estimate_callback)
+        optimizelay.addWidget(estimatebutton)
+        self.limits = None
+
         snaplabel = QLabel("Snap-Tolerance:")
         snaplabel.setFixedWidth(220)
         layoutleft.addWidget(snaplabel)
         self.snaptol = QLineEdit()
         self.snaptol.setFixedWidth(250)
+        self.snaptol.textChanged.connect(self.snaptol_changed)
         self.snaptol.setText("5.0")
         layoutleft.addWidget(self.snaptol)
 
@@ -103,6 +309,9 @@ class WinForm(QWidget):
             snaplay.addWidget(snaplabel)
             self.snap[axis] = QLineEdit()
             self.snap[axis].setFixedWidth(150)
+            self.snap[axis].textChanged.connect(
+                partial(self.capture.snap.set_values, axis)
+            )
             snaplay.addWidget(self.snap[axis])
             snapbtn = QPushButton("ADD")
             snapbtn.setFixedWidth(40)
@@ -110,6 +319,18 @@ class WinForm(QWidget):
             snapbtn.clicked.connect(cb)
             snaplay.addWidget(snapbtn)
 
+        layoutleft.addWidget(QLabel("Snap-Points (X,Y,Z):"))
+        snaplay = QHBoxLayout()
+        layoutleft.addLayout(snaplay)
+        self.snappoints = QLineEdit()
+        self.snappoints.setFixedWidth(175)
+        self.snappoints.textChanged.connect(self.capture.snap.set_points)
+        snaplay.addWidget(self.snappoints)
+        snapbtn = QPushButton("ADD")
+        snapbtn.setFixedWidth(40)
+        snapbtn.clicked.connect(self.snappointadd_callback)
+        snaplay.addWidget(snapbtn)
+
         layoutleft.addStretch()
 
         savebutton = QPushButton("\n&Save\n")
@@ -144,6 +365,9 @@ class WinForm(QWidget):
                 snapbtn.clicked.connect(cb)
                 coordslay.addWidget(snapbtn)
 
+            snapallbtn = QPushButton("GO (all axes)")
+            snapallbtn.clicked.connect(self.snapgo_all_callback)
+            layoutright.addWidget(snapallbtn)
 
             self.coords_j = {}
             self.mode_joint_label = QLabel("Joints:")
@@ -161,159 +385,189 @@ class WinForm(QWidget):
 
             layoutright.addStretch()
 
-        self.reset_callback()
-
-        if args.check:
-            gcode = self.logview.toPlainText()
-            print(gcode)
+            self.view_widgets = {
+                "mode_world": self.mode_world_label,
+                "mode_joint": self.mode_joint_label,
+            }
+            for axis in AXIS_NAMES:
+                self.view_widgets[f"W_{axis}"] = self.coords_w[axis]
+                self.view_widgets[f"J_{axis}"] = self.coords_j[axis]
+            self.palettes = {}
+            for style, color in STYLE_COLORS.items():
+                palette = QPalette(self.palette())
+                palette.setColor(QPalette.Text, color)
+                palette.setColor(QPalette.WindowText, color)
+                self.palettes[style] = palette
+            self.viewmodel = ViewModel()
+
+        if self.profiler.enabled:
+            self.profilelabel = QLabel()
+            self.profilelabel.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+            layoutright.addWidget(self.profilelabel)
+
+        # first snapshot synchronous, then the poller takes over
+        self.status = None
+        try:
+            self.status = snapshot(s)
+        except Exception as err:
+            print(f"can not poll linuxcnc: {err}")
 
-            exit(0)
+        self.reset_callback(recover=True)
 
         self.commentline.setFocus()
 
+        # linuxcnc commands are sent from a worker thread
+        self.command_signal = CommandSignal()
+        self.command_signal.finished.connect(self.command_finished)
+        self.commands = CommandQueue(c, linuxcnc, motion_timeout=args.motion_timeout)
+        self.commands.start()
+
+        self.status_signal = StatusSignal()
+        self.status_signal.received.connect(self.status_received)
+        self.poller = StatusPoller(
+            s,
+            self.status_signal.received.emit,
+            fast_interval=args.poll_fast / 1000.0,
+            idle_interval=args.poll_idle / 1000.0,
+            profiler=self.profiler,
+            publisher=StatusPublisher(args.publish) if args.publish else None,
+        )
+        self.poller.start()
+
+        if self.profiler.enabled:
+            atexit.register(self.profiler.dump, args.profile)
+            self.profile_timer = QTimer()
+            self.profile_timer.timeout.connect(self.profile_update)
+            self.profile_timer.start(1000)
+
         if not args.no_autoupdate:
             self.timer = QTimer()
             self.timer.timeout.connect(self.runTimer)
-            self.timer.start(500)
+            self.timer.start(args.refresh)
 
 
     def ok_for_mdi(self):
-        return not s.estop and s.enabled and (s.homed.count(1) == s.joints) and (s.interp_state == linuxcnc.INTERP_IDLE)
+        status = self.status
+        if status is None:
+            return False
+        return not status.estop and status.enabled and (status.homed.count(1) == status.joints) and (status.interp_state == linuxcnc.INTERP_IDLE)
+
+    def mdi(self, blocks):
+        if not self.ok_for_mdi():
+            print("MDI not possible (estop, not enabled/homed or not idle)")
+            return None
+        return self.commands.mdi(blocks, callback=self.command_signal.finished.emit)
+
+    def command_finished(self, request):
+        if request.state != DONE:
+            print(f"MDI {request.name}: {request.state} {request.error or ''}")
 
     def snapgo_callback(self, axis):
-        if self.ok_for_mdi():
-            c.mode(linuxcnc.MODE_MDI)
-            c.wait_complete()
-            c.mdi(f"G0 {axis}{self.pos_w[AXIS_NAMES.index(axis)]}")
+        self.mdi(f"G0 {axis}{self.capture.pos_w[AXIS_NAMES.index(axis)]}")
+
+    def snapgo_all_callback(self):
+        # all enabled world axes in one block
+        status = self.status
+        if status is None:
+            return
+        axes = [n for n in sorted(self.capture.world_axes) if status.axis_active[n]]
+        if axes:
+            self.mdi("G0 " + " ".join(f"{AXIS_NAMES[n]}{self.capture.pos_w[n]}" for n in axes))
+
+    def goto_callback(self):
+        rows = [index.row() for index in self.logview.selectedIndexes()]
+        if not rows or rows[-1] >= len(self.program.blocks):
+            return
+        blocks = goto_blocks(self.program.blocks, rows[-1])
+        if blocks is None:
+            print("Go to row: no G0 row selected")
+            return
+        self.mdi(blocks)
+
+    def stop_callback(self):
+        self.commands.cancel_all()
+
+    def status_received(self, snap):
+        self.status = snap
+        if self.profiler.enabled:
+            # poller thread -> gui thread
+            self.profiler.record("deliver", time.time() - snap.time)
 
     def statusUpdate(self):
-        try:
-            s.poll()
-        except Exception as err:
-            print(f"can not poll linuxcnc: {err}")
+        # uses the newest snapshot of the poller, never polls itself
+        status = self.status
+        if status is None:
             return
 
-        # check coords mode (world/joint)
-        if not args.joints:
-            self.mode = s.aout[3]
-        else:
-            self.mode = 0.0
-
-        # get joint positions
-        # need to update this offsets in Joint-Mode, not available in World-Mode :(
-        offsets_g5x = (0.0, -90.0, 0.0, 0.0, 90.0, 0.0, 0.0, 0.0, 0.0)
-        for n, pos in enumerate(s.joint_position):
-            if n >= len(s.axis):
-                break
-            if not self.checkboxes[f"J_{AXIS_NAMES[n]}"].isChecked():
-                continue
-            if (
-                s.axis[n]["min_position_limit"] != 0
-                and s.axis[n]["max_position_limit"] != 0
-            ):
-                position = round(pos - offsets_g5x[n] - s.g92_offset[n], 2)
-                self.pos_j[n] = position
+        with self.profiler.stage("status"):
+            self.capture.update(status)
+        self.mode = self.capture.mode
 
-        if args.joints or self.mode == 1.0:
+    def axes_changed(self):
+        self.capture.world_axes = {
+            n for n, name in enumerate(AXIS_NAMES) if self.checkboxes[f"W_{name}"].isChecked()
+        }
+        self.capture.joint_axes = {
+            n for n, name in enumerate(AXIS_NAMES) if self.checkboxes[f"J_{name}"].isChecked()
+        }
+
+    def snaptol_changed(self, text):
+        try:
+            self.capture.snap.tolerance = float(text)
+        except ValueError:
             pass
-        else:
-            # get axis positions
-            for n, pos in enumerate(s.position):
-                if not self.checkboxes[f"W_{AXIS_NAMES[n]}"].isChecked():
-                    continue
-                if (
-                    s.axis[n]["min_position_limit"] != 0
-                    and s.axis[n]["max_position_limit"] != 0
-                ):
-                    position = round(pos, 2)
-                    position = round(pos - s.g5x_offset[n] - s.g92_offset[n], 2)
-                    position_raw = position
-
-                    # snap positions
-                    sflag = False
-                    snap_limit = float(self.snaptol.text())
-                    if AXIS_NAMES[n] in self.snap:
-                        snap_positions = self.snap[AXIS_NAMES[n]].text()
-                        for pos in snap_positions.split():
-                            diff = abs(float(pos) - position)
-                            if diff <= snap_limit:
-                                position = float(pos)
-                                sflag = True
-                                break
-
-                    self.pos_w[n] = position
-                    self.pos_wr[n] = position_raw
-                    self.pos_ws[n] = sflag
+
+    def profile_update(self):
+        self.profilelabel.setText(self.profiler.format())
 
     def runTimer(self):
+        self.profiler.tick("refresh", args.refresh / 1000.0)
+        with self.profiler.stage("refresh"):
+            self.refresh()
+
+    def refresh(self):
         self.statusUpdate()
+        status = self.status
+        if status is None:
+            return
 
         if self.pulse == "*":
             self.pulse = " "
         else:
             self.pulse = "*"
 
-        if self.mode == 0:
-            self.mode_world_label.setText(f"World: (ACTIVE) {self.pulse}")
-            self.mode_world_label.setStyleSheet("color: green;")
-            self.mode_joint_label.setText(f"Joint: {self.pulse}")
-            self.mode_joint_label.setStyleSheet("color: blue;")
-        elif self.mode == 1:
-            self.mode_world_label.setText("World:")
-            self.mode_world_label.setStyleSheet("color: red;")
-            self.mode_joint_label.setText(f"Joint: (ACTIVE) {self.pulse}")
-            self.mode_joint_label.setStyleSheet("color: green;")
-
-        for n, _pos in enumerate(s.joint_position):
-            if n >= len(s.axis):
-                break
-            if not self.checkboxes[f"J_{AXIS_NAMES[n]}"].isChecked():
-                self.coords_j[AXIS_NAMES[n]].setText("")
-                continue
-            if (
-                s.axis[n]["min_position_limit"] != 0
-                and s.axis[n]["max_position_limit"] != 0
-            ):
-                self.coords_j[AXIS_NAMES[n]].setText(f"{self.pos_j[n]}")
-
-        if args.joints or self.mode == 1.0:
-            pass
-        else:
-            # get axis positions
-            for n, _pos in enumerate(s.position):
-                if not self.checkboxes[f"W_{AXIS_NAMES[n]}"].isChecked():
-                    self.coords_w[AXIS_NAMES[n]].setText("")
-                    continue
-                if (
-                    s.axis[n]["min_position_limit"] != 0
-                    and s.axis[n]["max_position_limit"] != 0
-                ):
-
-                    if self.pos_ws[n]:
-                        self.coords_w[AXIS_NAMES[n]].setStyleSheet("color: green;")
-                        self.coords_w[AXIS_NAMES[n]].setText(
-                            f"{self.pos_wr[n]} ({self.pos_w[n]})"
-                        )
-                    else:
-                        self.coords_w[AXIS_NAMES[n]].setStyleSheet("color: black;")
-                        self.coords_w[AXIS_NAMES[n]].setText(f"{self.pos_w[n]}")
+        # only touch widgets that changed
+        texts, styles = self.viewmodel.diff(build_view(self.capture, status, self.pulse))
+        for key, text in texts.items():
+            self.view_widgets[key].setText(text)
+        for key, style in styles.items():
+            self.view_widgets[key].setPalette(self.palettes[style])
 
     def snapadd_callback(self, axis):
         self.statusUpdate()
 
-        pos = self.pos_w[AXIS_NAMES.index(axis)]
+        pos = self.capture.pos_w[AXIS_NAMES.index(axis)]
 
-        tol = float(self.snaptol.text())
+        tol = self.capture.snap.tolerance
         if pos is not None:
             if tol >= 1:
                 pos = round(pos, 0)
             else:
                 pos = round(pos, 1)
-            old = self.snap[axis].text()
-            if str(pos) not in old:
+            if pos not in self.capture.snap.values.get(axis, ()):
+                old = self.snap[axis].text()
                 self.snap[axis].setText(f"{old} {pos}")
         self.commentline.setFocus()
 
+    def snappointadd_callback(self):
+        self.statusUpdate()
+
+        point = self.capture.pos_wr[:3]
+        if None not in point:
+            old = self.snappoints.text()
+            self.snappoints.setText(f"{old} {point[0]},{point[1]},{point[2]}")
+        self.commentline.setFocus()
+
     def comment_callback(self):
         comment = self.commentline.text()
         self.commentline.setText("")
@@ -322,158 +576,250 @@ class WinForm(QWidget):
             self.pause_callback()
         elif comment:
             self.addcode(f"\n({comment})")
+            self.session.append_block(f"\n({comment})", self.capture.mode)
         else:
             self.add_callback()
 
-    def reset_callback(self):
+    def reset_callback(self, recover=False):
         self.pulse = " "
         self.mode = None
-        self.last_mode = None
-        self.pos_w = [None] * 9
-        self.pos_ws = [False] * 9
-        self.pos_wr = [None] * 9
-        self.last_pos_w = [None] * 9
-        self.pos_j = [None] * 9
-        self.last_pos_j = [None] * 9
-        self.last_aout = [0.0] * 64
-        self.last_dout = [0] * 64
-        self.logview.clear()
-
-        gcode = ""
-        if os.path.isfile(args.filename[0]):
-            # loading gcode from existing file
-            gcode = open(args.filename[0], "r").read()
-        if gcode:
-            # remove programm end (M02)
-            gcode += "\n(reopen)"
-            self.logview.insertPlainText(gcode)
-        else:
-            # initial code
-            self.logview.insertPlainText("G21   (Metric/mm)\n")
-            self.logview.insertPlainText("G40   (No Offsets)\n")
-            self.logview.insertPlainText("G90   (Absolute-Mode)\n")
-            self.logview.insertPlainText("M05   (Spindle off)\n")
-            self.logview.insertPlainText("F1000 (Feedrate)\n")
-            if args.joints:
-                # switch to joint mode
-                self.logview.insertPlainText("M429\n")
+        self.capture.reset()
+        if not recover:
+            # new session segment, the rows before belong to the discarded program
+            self.session.reset()
+
+        journal = self.program.journal or Journal(args.filename[0])
+        if not recover:
+            # reset discards all unsaved changes
+            journal.clear()
+        # waits for the writer, the journal is complete (or removed) for the recovery
+        journal.close()
+        journal = Journal(args.filename[0])
+        self.program = open_program(args.filename[0], args.joints, journal=journal)
+        self.program_file = ProgramFile(args.filename[0])
+        self.program_file.attach(self.program)
+        self.view_reload()
 
         self.add_callback()
 
+    def record_callback(self, active):
+        # continuous recording, converted to gcode when stopped
+        if active:
+            self.recorder = TrajectoryRecorder(
+                linuxcnc.stat(), f"{args.filename[0]}.traj", rate=args.record_rate
+            )
+            self.recorder.start()
+            self.recordbutton.setText("&Record (RUNNING)")
+            return
+        if self.recorder is None:
+            return
+        self.recorder.stop()
+        print(
+            f"recorded {self.recorder.samples} samples "
+            f"({self.recorder.late} late, {self.recorder.overruns} lost)"
+        )
+        self.recordbutton.setText("&Record")
+        self.add_trajectory(load_trajectory(self.recorder.filename))
+        self.recorder = None
+
+    def enabled_axes(self, prefix):
+        status = self.status
+        return [
+            n
+            for n, name in enumerate(AXIS_NAMES)
+            if self.checkboxes[f"{prefix}_{name}"].isChecked()
+            and n < len(status.axis_active)
+            and status.axis_active[n]
+        ]
+
+    def add_trajectory(self, data):
+        status = self.status
+        if status is None or len(data) == 0:
+            return
+        world_offsets = [
+            status.g5x_offset[n] + status.g92_offset[n] for n in range(len(AXIS_NAMES))
+        ]
+        joint_offsets = [
+            JOINT_OFFSETS[n] + status.g92_offset[n] for n in range(len(AXIS_NAMES))
+        ]
+        world_axes = self.enabled_axes("W")
+        joint_axes = self.enabled_axes("J")
+
+        kinematics = self.capture.kinematics
+        if kinematics is not None and (args.joints or self.mode == 1.0):
+            # world positions of the joint samples
+            data = numpy.array(data)
+            data[:, COLS_WORLD][:, :6] = kinematics.pose(data[:, COLS_JOINT])
+
+        # simplify in world and joint space
+        keep = simplify(
+            (data[:, COLS_WORLD][:, world_axes], self.simplify_tolerance(self.simplify_w)),
+            (data[:, COLS_JOINT][:, joint_axes], self.simplify_tolerance(self.simplify_j)),
+        )
+        print(f"simplify: removed {len(data) - keep.sum()} of {len(data)} points")
+        data = data[keep]
+
+        # drop near-identical points (of the simplified path, mode "any" is a python loop)
+        dedup = self.dedup(new=True)
+        if dedup is not None:
+            keep = dedup.mask(data[:, COLS_WORLD][:, world_axes], data[:, COLS_JOINT][:, joint_axes])
+            print(f"dedup: removed {len(data) - keep.sum()} of {len(data)} points")
+            data = data[keep]
+
+        if args.joints or self.mode == 1.0:
+            positions = data[:, COLS_JOINT]
+            offsets = joint_offsets
+            axes = joint_axes
+            last_pos = self.capture.last_pos_j
+        else:
+            positions = data[:, COLS_WORLD]
+            offsets = world_offsets
+            axes = world_axes
+            last_pos = self.capture.last_pos_w
+        if not axes:
+            return
+        gcode = trajectory_to_gcode(positions, axes, offsets)
+        if gcode:
+            header = f"\n({datetime.now()} recorded {len(data)} points)"
+            self.addcode(f"{header}\n{gcode}")
+            self.session.append_block(header, self.mode)
+            self.session.append_path(
+                data[:, COL_TIME],
+                data[:, COLS_WORLD] - world_offsets,
+                data[:, COLS_JOINT] - joint_offsets,
+                self.mode,
+            )
+            # later adds continue from the last recorded position
+            last_row = positions[-1]
+            for n in axes:
+                last_pos[n] = round(float(last_row[n] - offsets[n]), 2)
+
+    def simplify_tolerance(self, lineedit):
+        try:
+            return max(float(lineedit.text()), 0.0)
+        except ValueError:
+            return 0.0
+
+    def dedup(self, new=False):
+        """Deduplicator of the dedup settings, None if off.
+
+        the same one is used as long as the settings do not change,
+        so the recorded poses are kept for mode "any".
+        """
+        settings = (
+            self.simplify_tolerance(self.dedup_w),
+            self.simplify_tolerance(self.dedup_j),
+            "any" if self.dedup_any.isChecked() else "previous",
+        )
+        if not (settings[0] > 0 or settings[1] > 0):
+            return None
+        if new:
+            return Deduplicator(*settings)
+        if self.dedup_settings != settings:
+            self.dedup_settings = settings
+            self.capture.dedup = Deduplicator(*settings)
+        return self.capture.dedup
+
+    def simplify_callback(self):
+        blocks, removed = simplify_program(
+            self.program.blocks,
+            self.simplify_tolerance(self.simplify_w),
+            self.simplify_tolerance(self.simplify_j),
+            joints=args.joints,
+        )
+        print(f"simplify: removed {removed} of {len(self.program.blocks)} blocks")
+        self.program.replace(blocks)
+        self.view_reload()
+        self.commentline.setFocus()
+
+    def optimize_callback(self):
+        blocks, report = optimize_program(
+            self.program.blocks, parallel_io=self.parallel_io.isChecked()
+        )
+        print(format_report(report))
+        if report["blocks_removed"]:
+            self.program.replace(blocks)
+            self.view_reload()
+        self.commentline.setFocus()
+
+    def estimate_callback(self):
+        if self.limits is None:
+            self.limits = read_ini(args.ini) if args.ini else Limits.default()
+        blocks = self.program.blocks
+        estimate = estimate_program(blocks, self.limits, joints=args.joints)
+        print(format_estimate(estimate, blocks))
+        self.commentline.setFocus()
+
     def pause_callback(self):
         self.addcode("\nG4 P1 (pause)")
+        self.session.append_block("\nG4 P1 (pause)", self.capture.mode)
 
     def add_callback(self):
+        with self.profiler.stage("add"):
+            self.add()
+
+    def add(self):
         self.statusUpdate()
+        status = self.status
+        if status is None:
+            self.commentline.setFocus()
+            return
 
-        gcode = [f"\n({datetime.now()})"]
-
-        # check coords mode (world/joint)
-        mode = 0.0
-        if not args.joints:
-            mode = s.aout[3]
-            if mode != self.last_mode:
-                if mode == 0:
-                    gcode.append(f"\nM428 ({MODE_NAME[int(mode)]}-COORDS)")
-                elif mode == 1:
-                    gcode.append(f"\nM429 ({MODE_NAME[int(mode)]}-COORDS)")
-                self.last_mode = mode
-
-        gcode.append("\nG0")
-        if args.joints or mode == 1.0:
-            for n, _pos in enumerate(s.joint_position):
-                if n >= len(s.axis):
-                    break
-                if not self.checkboxes[f"J_{AXIS_NAMES[n]}"].isChecked():
-                    continue
-                if (
-                    s.axis[n]["min_position_limit"] != 0
-                    and s.axis[n]["max_position_limit"] != 0
-                ):
-                    position = self.pos_j[n]
-                    if position != self.last_pos_j[n]:
-                        gcode.append(f" {AXIS_NAMES[n]}{position}")
-                        self.last_pos_j[n] = position
-        else:
-            # get axis positions
-            for n, _pos in enumerate(s.position):
-                if not self.checkboxes[f"W_{AXIS_NAMES[n]}"].isChecked():
-                    continue
-                if (
-                    s.axis[n]["min_position_limit"] != 0
-                    and s.axis[n]["max_position_limit"] != 0
-                ):
-                    position = self.pos_w[n]
-                    if position != self.last_pos_w[n]:
-                        gcode.append(f" {AXIS_NAMES[n]}{position}")
-                        self.last_pos_w[n] = position
-
-        # analog outputs
-        for n, value in enumerate(s.aout):
-            if n == 3:
-                # in robot mode, we can read the kinstype here
-                continue
-            if value != self.last_aout[n]:
-                self.last_aout[n] = value
-                gcode.append(f"\nM68 E{n} Q{value} (analog-out)")
-                gcode.append("\nG4 P0.5 (pause)")
-
-        # digital outputs
-        for n, value in enumerate(s.dout):
-            if n == 3:
-                # in robot mode, we can read the kinstype here
-                continue
-            if value != self.last_dout[n]:
-                self.last_dout[n] = value
-                if value == 1:
-                    gcode.append(f"\nM64 P{n} (digital-out on)")
-                else:
-                    gcode.append(f"\nM65 P{n} (digital-out off)")
-                gcode.append("\nG4 P0.1 (pause)")
-
-        # add changes
-        if len(gcode) > 2:
-            gcode.append("\n")
-            self.addcode("".join(gcode))
+        self.capture.dedup = self.dedup()
+        gcode = self.capture.record(status)
+        if gcode:
+            world = self.capture.world_pose(status) if self.capture.joint_mode() else None
+            self.session.append(
+                row_from_status(
+                    status,
+                    self.capture.mode,
+                    self.capture.pos_ws,
+                    world,
+                    snap_positions=self.capture.pos_w,
+                )
+            )
+            self.addcode(gcode)
         else:
             self.commentline.setFocus()
 
+    def view_reload(self):
+        self.programmodel.set_program(self.program)
+        self.logview.scrollToBottom()
+
+    def delete_callback(self):
+        rows = [index.row() for index in self.logview.selectedIndexes()]
+        self.programmodel.delete(rows)
+
     def addcode(self, new_code):
-        # clean
-        rawtext = self.logview.toPlainText()
-        lines = []
-        for line in rawtext.split("\n"):
-            if line and line[0] not in {"(", "G", "M", "F"}:
-                line = f"({line})"
-            if not line.startswith("M02"):
-                lines.append(f"{line}\n")
-
-        lines.append(new_code)
-        lines.append("\nM02\n")
-        gcode_string = "".join(lines)
-
-        self.logview.clear()
-        self.logview.insertPlainText(gcode_string)
-
-        # scroll to bottom
-        self.logview.verticalScrollBar().setValue(
-            self.logview.verticalScrollBar().maximum()
-        )
+        with self.profiler.stage("addcode"):
+            self.programmodel.append(new_code)
+
+            # scroll to bottom
+            self.logview.scrollToBottom()
 
         self.commentline.setFocus()
 
     def exit_callback(self):
+        self.commands.stop()
+        if self.poller.publisher is not None:
+            self.poller.publisher.close()
+        self.program.journal.close()
+        self.session.close()
         exit(0)
 
+    def closeEvent(self, event):  # pylint: disable=C0103
+        self.program.journal.close()
+        self.session.close()
+        super().closeEvent(event)
+
     def save_callback(self):
-        gcode = self.logview.toPlainText()
-        open(args.filename[0], "w").write(gcode)
+        # writes only the new tail if possible
+        with self.profiler.stage("save"):
+            self.program_file.save(self.program)
         self.commentline.setFocus()
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--joints", "-j", help="joints", default=False, action="store_true"
@@ -488,9 +834,123 @@ if __name__ == "__main__":
         default=False,
         action="store_true",
     )
+    parser.add_argument(
+        "--poll-fast",
+        help="status poll interval while moving (ms)",
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        "--poll-idle",
+        help="status poll interval while idle (ms)",
+        type=int,
+        default=500,
+    )
+    parser.add_argument(
+        "--refresh",
+        help="display refresh interval (ms)",
+        type=int,
+        default=500,
+    )
+    parser.add_argument(
+        "--motion-timeout",
+        help="seconds to wait for a Go to move, it is not aborted (default: no limit)",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--record-rate",
+        help="sample rate of the continuous recording (Hz)",
+        type=float,
+        default=100.0,
+    )
+    parser.add_argument(
+        "--fake",
+        help="fake linuxcnc: 'synthetic' or a recorded frame file",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--connect",
+        help="use the status of a publisher (unix socket of --publish) instead of polling linuxcnc",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--publish",
+        help="publish the polled status on this unix socket for other loggers/viewers",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--aout-channels",
+        help="analog outputs to log (for example 0-2,4-63 or all)",
+        type=str,
+        default=DEFAULT_CHANNELS,
+    )
+    parser.add_argument(
+        "--dout-channels",
+        help="digital outputs to log (for example 0-2,4-63 or all)",
+        type=str,
+        default=DEFAULT_CHANNELS,
+    )
+    parser.add_argument(
+        "--ini",
+        help="machine INI for the cycle time limits (default $INI_FILE_NAME)",
+        type=str,
+        default=os.environ.get("INI_FILE_NAME"),
+    )
+    parser.add_argument(
+        "--hal",
+        help="hal file with the genserkins parameters, shows world positions in joint mode",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--dedup-world",
+        help="skip motions within this distance of the last recorded world position (0: off)",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--dedup-joint",
+        help="skip motions within this distance of the last recorded joint position (0: off)",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--dedup-any",
+        help="dedup: compare with all recorded positions, not only the last one",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        help="measure the hot paths, shows a live panel and writes a json file on exit (default <filename>.profile.json)",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+    )
     parser.add_argument("filename", help="filename", nargs=1, type=str, default=None)
     args = parser.parse_args()
+    if args.profile == "":
+        args.profile = f"{args.filename[0]}.profile.json"
+    connect(f"{SOCKET_PREFIX}{args.connect}" if args.connect else args.fake)
+
+    if args.check:
+        # no gui needed
+        check(
+            s,
+            args.filename[0],
+            joints=args.joints,
+            aout_channels=args.aout_channels,
+            dout_channels=args.dout_channels,
+            kinematics=load_kinematics(args.hal) if args.hal else None,
+        )
+        sys.exit(0)
 
+    app = QApplication(sys.argv)
     form = WinForm(args)
     form.show()
 
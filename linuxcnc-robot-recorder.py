@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+#
+# LinuxCNC logger without gui (for ssh / controller boxes without X)
+#
+#  triggers: stdin lines, a hal pin or a fixed interval
+#
+
+import argparse
+import os
+import signal
+import sys
+
+from robotlogger.backend import SOCKET_PREFIX, load_backend, record_frames
+from robotlogger.capture import AXIS_NAMES
+from robotlogger.convert import convert_program, format_conversion
+from robotlogger.cycletime import (
+    Limits,
+    estimate_program,
+    format_estimate,
+    read_ini,
+    write_segments,
+)
+from robotlogger.dedup import Deduplicator
+from robotlogger.fanout import run_publisher
+from robotlogger.headless import HeadlessLogger, check, run_hal, run_interval, run_stdin
+from robotlogger.kinematics import load_kinematics
+from robotlogger.optimize import format_report, optimize_program
+from robotlogger.outputs import DEFAULT_CHANNELS
+from robotlogger.program import Program, initial_code
+from robotlogger.session import SessionReader, session_to_gcode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--joints", "-j", help="joints", default=False, action="store_true"
+    )
+    parser.add_argument(
+        "--check", "-c", help="check", default=False, action="store_true"
+    )
+    parser.add_argument(
+        "--trigger",
+        "-t",
+        help="add points on stdin lines, a hal pin or a fixed interval",
+        choices=["stdin", "hal", "interval"],
+        default="stdin",
+    )
+    parser.add_argument(
+        "--interval", help="interval for --trigger interval (s)", type=float, default=1.0
+    )
+    parser.add_argument(
+        "--hal-pin", help="input pin for --trigger hal", type=str, default="trigger"
+    )
+    parser.add_argument("--axes", help="world axes", type=str, default="XYZ")
+    parser.add_argument("--joint-axes", help="joints", type=str, default="012345678")
+    parser.add_argument(
+        "--fake",
+        help="fake linuxcnc: 'synthetic' or a recorded frame file",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--connect",
+        help="use the status of a publisher (unix socket of --publish) instead of polling linuxcnc",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--publish",
+        help="only poll linuxcnc every --interval s and publish the status on the unix socket filename",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--record-frames",
+        help="write N stat frames into filename (for --fake) and exit",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--aout-channels",
+        help="analog outputs to log (for example 0-2,4-63 or all)",
+        type=str,
+        default=DEFAULT_CHANNELS,
+    )
+    parser.add_argument(
+        "--dout-channels",
+        help="digital outputs to log (for example 0-2,4-63 or all)",
+        type=str,
+        default=DEFAULT_CHANNELS,
+    )
+    parser.add_argument(
+        "--from-session",
+        help="generate filename from a session directory and exit",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--optimize",
+        help="optimize filename (pauses, io writes, motions, mode switches) and exit",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--parallel-io",
+        help="optimize: one pause for a group of io writes",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--estimate",
+        help="print the estimated cycle time of filename and exit",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--ini",
+        help="machine INI for the velocity/acceleration limits (default $INI_FILE_NAME)",
+        type=str,
+        default=os.environ.get("INI_FILE_NAME"),
+    )
+    parser.add_argument(
+        "--segments",
+        help="estimate: write the time of every block to this csv file",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--hal",
+        help="hal file with the genserkins parameters, world positions in joint mode",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--joints-to-world",
+        help="convert a joint mode program into a world mode program (filename), needs --hal",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--offsets",
+        help="joints-to-world: G5x+G92 offsets (X Y Z A B C) active when the program runs, "
+        "subtracted from the converted poses (default: 0, machine coordinates)",
+        type=float,
+        nargs="+",
+        default=None,
+    )
+    parser.add_argument(
+        "--workers",
+        help="joints-to-world: processes for the inverse kinematics check (default: all cpus)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--dedup-world",
+        help="skip motions within this distance of the last recorded world position (0: off)",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--dedup-joint",
+        help="skip motions within this distance of the last recorded joint position (0: off)",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--dedup-any",
+        help="dedup: compare with all recorded positions, not only the last one",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument("filename", help="filename", nargs=1, type=str, default=None)
+    args = parser.parse_args()
+    kinematics = load_kinematics(args.hal) if args.hal else None
+
+    def dedup():
+        if not (args.dedup_world > 0 or args.dedup_joint > 0):
+            return None
+        return Deduplicator(
+            args.dedup_world, args.dedup_joint, mode="any" if args.dedup_any else "previous"
+        )
+
+    def optimize_file(filename):
+        program = Program(open(filename).read())
+        blocks, report = optimize_program(program.blocks, parallel_io=args.parallel_io)
+        print(format_report(report))
+        program.replace(blocks)
+        open(filename, "w").write(program.text())
+
+    if args.joints_to_world:
+        if kinematics is None:
+            parser.error("--joints-to-world needs the genserkins parameters (--hal)")
+        program = Program(open(args.joints_to_world).read())
+        blocks, report = convert_program(
+            program.blocks,
+            kinematics,
+            joints=args.joints,
+            workers=args.workers,
+            offsets=args.offsets,
+        )
+        print(format_conversion(report))
+        program.replace(blocks)
+        open(args.filename[0], "w").write(program.text())
+        if args.optimize:
+            optimize_file(args.filename[0])
+        sys.exit(0)
+
+    if args.estimate:
+        program = Program(open(args.filename[0]).read())
+        estimate = estimate_program(
+            program.blocks, read_ini(args.ini) if args.ini else Limits.default()
+        )
+        print(format_estimate(estimate, program.blocks))
+        if args.segments:
+            write_segments(estimate, program.blocks, args.segments)
+        sys.exit(0)
+
+    if args.from_session:
+        program = Program(initial_code(args.joints))
+        program.append(
+            session_to_gcode(
+                SessionReader(args.from_session),
+                joints=args.joints,
+                world_axes=[AXIS_NAMES.index(name) for name in args.axes.upper()],
+                joint_axes=[int(joint) for joint in args.joint_axes],
+                aout_channels=args.aout_channels,
+                dout_channels=args.dout_channels,
+                kinematics=kinematics,
+                dedup=dedup(),
+            )
+        )
+        open(args.filename[0], "w").write(program.text())
+        if args.optimize:
+            optimize_file(args.filename[0])
+        sys.exit(0)
+
+    if args.optimize:
+        optimize_file(args.filename[0])
+        sys.exit(0)
+
+    linuxcnc = load_backend(f"{SOCKET_PREFIX}{args.connect}" if args.connect else args.fake)
+    stat = linuxcnc.stat()
+    if args.publish:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            run_publisher(stat, args.filename[0], interval=args.interval)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    if args.record_frames:
+        record_frames(stat, args.filename[0], args.record_frames, interval=args.interval)
+        sys.exit(0)
+
+    if args.check:
+        check(
+            stat,
+            args.filename[0],
+            joints=args.joints,
+            world_axes=args.axes,
+            joint_axes=args.joint_axes,
+            aout_channels=args.aout_channels,
+            dout_channels=args.dout_channels,
+            kinematics=kinematics,
+        )
+        sys.exit(0)
+
+    logger = HeadlessLogger(
+        stat,
+        args.filename[0],
+        joints=args.joints,
+        world_axes=args.axes,
+        joint_axes=args.joint_axes,
+        aout_channels=args.aout_channels,
+        dout_channels=args.dout_channels,
+        kinematics=kinematics,
+        dedup=dedup(),
+    )
+
+    def stop(signum, frame):
+        logger.save()
+        logger.close()
+        sys.exit(0)
+
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, stop)
+
+    if args.trigger == "hal":
+        run_hal(logger, args.hal_pin)
+    elif args.trigger == "interval":
+        run_interval(logger, args.interval)
+    else:
+        run_stdin(logger)
+    logger.save()
+    logger.close()
+
+
+if __name__ == "__main__":
+    main()
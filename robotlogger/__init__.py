@@ -0,0 +1,5 @@
+#
+# shared (Qt-free) parts of the LinuxCNC robot logger
+#
+
+__version__ = "0.1.0"
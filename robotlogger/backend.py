@@ -0,0 +1,169 @@
+#
+# status/command backends
+#
+#  the real linuxcnc module, the status of a publisher (socket:PATH)
+#  or a deterministic stand-in that replays recorded (json lines)
+#  or synthetic stat frames
+#
+
+import json
+import math
+import time
+
+from .fanout import SubscriberLinuxCNC
+
+SOCKET_PREFIX = "socket:"
+
+FRAME_FIELDS = (
+    "estop",
+    "enabled",
+    "homed",
+    "joints",
+    "interp_state",
+    "task_mode",
+    "axis",
+    "position",
+    "joint_position",
+    "g5x_offset",
+    "g92_offset",
+    "aout",
+    "dout",
+)
+
+
+def load_backend(spec=None):
+    """returns the linuxcnc module, a SubscriberLinuxCNC for 'socket:PATH',
+    or a FakeLinuxCNC for 'synthetic' / a frame file."""
+    if not spec:
+        import linuxcnc
+
+        return linuxcnc
+    if spec.startswith(SOCKET_PREFIX):
+        return SubscriberLinuxCNC(spec[len(SOCKET_PREFIX) :])
+    return FakeLinuxCNC(spec)
+
+
+def synthetic_frame(index):
+    """machine moving on a slow curve, gripper (aout 0) and dout 0 switching."""
+    phase = index * 0.01
+    position = [
+        round(200.0 * math.sin(phase), 4),
+        round(200.0 * math.cos(phase), 4),
+        round(100.0 + 50.0 * math.sin(phase * 0.5), 4),
+        0.0,
+        0.0,
+        round(10.0 * math.sin(phase * 0.2), 4),
+        0.0,
+        0.0,
+        0.0,
+    ]
+    joint_position = [round(90.0 * math.sin(phase + n), 4) for n in range(6)] + [0.0] * 3
+    aout = [0.0] * 64
+    aout[0] = 10.0 if (index // 50) % 2 else 0.0
+    dout = [0] * 64
+    dout[0] = (index // 100) % 2
+    return {
+        "position": position,
+        "joint_position": joint_position,
+        "aout": aout,
+        "dout": dout,
+    }
+
+
+class FakeStat:
+    """linuxcnc.stat replacement, every poll() advances to the next frame."""
+
+    def __init__(self, frames=None):
+        self.frames = frames
+        self.index = -1
+        self.estop = 0
+        self.enabled = True
+        self.homed = (1,) * 6 + (0,) * 3
+        self.joints = 6
+        self.interp_state = FakeLinuxCNC.INTERP_IDLE
+        self.task_mode = FakeLinuxCNC.MODE_MANUAL
+        self.axis = tuple(
+            {"min_position_limit": -1000.0, "max_position_limit": 1000.0}
+            if n < 6
+            else {"min_position_limit": 0.0, "max_position_limit": 0.0}
+            for n in range(9)
+        )
+        self.position = (0.0,) * 9
+        self.joint_position = (0.0,) * 9
+        self.g5x_offset = (0.0,) * 9
+        self.g92_offset = (0.0,) * 9
+        self.aout = (0.0,) * 64
+        self.dout = (0,) * 64
+
+    def poll(self):
+        self.index += 1
+        if self.frames is None:
+            frame = synthetic_frame(self.index)
+        else:
+            frame = self.frames[self.index % len(self.frames)]
+        for key, value in frame.items():
+            if isinstance(value, list):
+                value = tuple(value)
+            setattr(self, key, value)
+
+
+class FakeCommand:
+    """linuxcnc.command replacement, keeps a list of all calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.calls.append((name, args))
+            return 0
+
+        return call
+
+
+class FakeLinuxCNC:
+    """module like stand-in for linuxcnc."""
+
+    MODE_MANUAL = 1
+    MODE_AUTO = 2
+    MODE_MDI = 3
+    INTERP_IDLE = 1
+    INTERP_READING = 2
+    INTERP_PAUSED = 3
+    INTERP_WAITING = 4
+    RCS_DONE = 1
+    RCS_EXEC = 2
+    RCS_ERROR = 3
+
+    error = RuntimeError
+
+    def __init__(self, spec="synthetic"):
+        self.frames = None
+        if spec != "synthetic":
+            self.frames = load_frames(spec)
+
+    def stat(self):
+        return FakeStat(self.frames)
+
+    def command(self):
+        return FakeCommand()
+
+
+def load_frames(filename):
+    with open(filename, "r") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def record_frames(stat, filename, count, interval=0.1):
+    """writes count stat frames of a real machine as json lines for replay."""
+    with open(filename, "w") as fh:
+        for _ in range(count):
+            stat.poll()
+            frame = {}
+            for key in FRAME_FIELDS:
+                value = getattr(stat, key)
+                if isinstance(value, tuple):
+                    value = list(value)
+                frame[key] = value
+            fh.write(json.dumps(frame) + "\n")
+            time.sleep(interval)
@@ -0,0 +1,209 @@
+#
+# position and io capture (shared by the gui and the headless recorder)
+#
+
+from datetime import datetime
+
+from .outputs import OutputState
+from .snap import SnapIndex
+
+MODE_NAME = ["WORLD", "JOINT"]
+AXIS_NAMES = ["X", "Y", "Z", "A", "B", "C", "U", "V", "W"]
+# need to update this offsets in Joint-Mode, not available in World-Mode :(
+JOINT_OFFSETS = (0.0, -90.0, 0.0, 0.0, 90.0, 0.0, 0.0, 0.0, 0.0)
+
+
+class Capture:
+    """turns status snapshots into logger gcode.
+
+    world_axes/joint_axes are the sets of enabled axis/joint numbers,
+    snap is the SnapIndex for the world positions,
+    outputs the OutputState with the channels to log,
+    kinematics (GenSerKins) calculates the world positions in joint mode,
+    dedup (Deduplicator) drops motions near already recorded poses.
+    """
+
+    def __init__(
+        self,
+        joints=False,
+        world_axes=(0, 1, 2),
+        joint_axes=range(9),
+        outputs=None,
+        kinematics=None,
+        dedup=None,
+    ):
+        self.joints = joints
+        self.outputs = outputs if outputs is not None else OutputState()
+        self.kinematics = kinematics
+        self.dedup = dedup
+        self.world_axes = set(world_axes)
+        self.joint_axes = set(joint_axes)
+        self.snap = SnapIndex()
+        self.reset()
+
+    def reset(self):
+        self.mode = None
+        self.last_mode = None
+        self.pos_w = [None] * 9
+        self.pos_ws = [False] * 9
+        self.pos_wr = [None] * 9
+        self.last_pos_w = [None] * 9
+        self.pos_j = [None] * 9
+        self.last_pos_j = [None] * 9
+        self.outputs.reset()
+        if self.dedup is not None:
+            self.dedup.reset()
+
+    def joint_mode(self):
+        return self.joints or self.mode == 1.0
+
+    def world_pose(self, status):
+        """world positions (without offsets) of the joint positions, None without kinematics."""
+        if self.kinematics is None:
+            return None
+        pose = self.kinematics.pose(status.joint_position[: self.kinematics.joints])
+        return [
+            float(pos) - status.g5x_offset[n] - status.g92_offset[n] for n, pos in enumerate(pose)
+        ]
+
+    def update(self, status):
+        """takes over the positions of a snapshot."""
+        # check coords mode (world/joint)
+        if not self.joints:
+            self.mode = status.aout[3]
+        else:
+            self.mode = 0.0
+
+        # get joint positions
+        for n, pos in enumerate(status.joint_position):
+            if n >= len(status.axis_active):
+                break
+            if n not in self.joint_axes:
+                continue
+            if status.axis_active[n]:
+                position = round(pos - JOINT_OFFSETS[n] - status.g92_offset[n], 2)
+                self.pos_j[n] = position
+
+        if self.joint_mode():
+            # world positions by forward kinematics, not snapped
+            world = self.world_pose(status)
+            if world is not None:
+                for n, pos in enumerate(world):
+                    if n in self.world_axes:
+                        self.pos_w[n] = self.pos_wr[n] = round(pos, 2)
+                        self.pos_ws[n] = False
+            return
+
+        # get axis positions
+        for n, pos in enumerate(status.position):
+            if n not in self.world_axes:
+                continue
+            if status.axis_active[n]:
+                position = round(pos - status.g5x_offset[n] - status.g92_offset[n], 2)
+                position_raw = position
+
+                # snap positions
+                position, sflag = self.snap.snap(AXIS_NAMES[n], position)
+
+                self.pos_w[n] = position
+                self.pos_wr[n] = position_raw
+                self.pos_ws[n] = sflag
+
+        # snap points (xyz together)
+        if all(n in self.world_axes and status.axis_active[n] for n in range(3)):
+            point = self.snap.snap_point(self.pos_wr[:3])
+            if point is not None:
+                self.pos_w[:3] = point
+                self.pos_ws[:3] = [True] * 3
+
+    def pose_vectors(self, status):
+        """world and joint positions of the active axes (for the dedup).
+
+        world is None in joint mode without kinematics, pos_w is not updated there.
+        """
+        active = status.axis_active
+        world = None
+        if not self.joint_mode() or self.kinematics is not None:
+            world = [
+                self.pos_w[n]
+                for n in sorted(self.world_axes)
+                if n < len(active) and active[n] and self.pos_w[n] is not None
+            ]
+        joint = [
+            self.pos_j[n]
+            for n in sorted(self.joint_axes)
+            if n < len(active) and active[n] and self.pos_j[n] is not None
+        ]
+        return world, joint
+
+    def record(self, status):
+        """returns the gcode of all changes since the last record, or ''."""
+        self.update(status)
+
+        gcode = [f"\n({datetime.fromtimestamp(status.time)})"]
+
+        # check coords mode (world/joint)
+        mode = 0.0
+        if not self.joints:
+            mode = status.aout[3]
+            if mode != self.last_mode:
+                if mode == 0:
+                    gcode.append(f"\nM428 ({MODE_NAME[int(mode)]}-COORDS)")
+                elif mode == 1:
+                    gcode.append(f"\nM429 ({MODE_NAME[int(mode)]}-COORDS)")
+                self.last_mode = mode
+
+        gcode.append("\nG0")
+        if self.dedup is not None and self.dedup.duplicate(*self.pose_vectors(status)):
+            # near an already recorded pose, only io changes
+            pass
+        elif self.joints or mode == 1.0:
+            moved = False
+            for n, _pos in enumerate(status.joint_position):
+                if n >= len(status.axis_active):
+                    break
+                if n not in self.joint_axes:
+                    continue
+                if status.axis_active[n]:
+                    position = self.pos_j[n]
+                    if position != self.last_pos_j[n]:
+                        gcode.append(f" {AXIS_NAMES[n]}{position}")
+                        self.last_pos_j[n] = position
+                        moved = True
+            if moved and self.kinematics is not None:
+                # world position as comment
+                world = [
+                    f"{AXIS_NAMES[n]}{self.pos_w[n]}"
+                    for n in sorted(self.world_axes)
+                    if self.pos_w[n] is not None
+                ]
+                gcode.append(f" ({' '.join(world)})")
+        else:
+            # get axis positions
+            for n, _pos in enumerate(status.position):
+                if n not in self.world_axes:
+                    continue
+                if status.axis_active[n]:
+                    position = self.pos_w[n]
+                    if position != self.last_pos_w[n]:
+                        gcode.append(f" {AXIS_NAMES[n]}{position}")
+                        self.last_pos_w[n] = position
+
+        # analog outputs
+        for n, value in self.outputs.diff_aout(status.aout):
+            gcode.append(f"\nM68 E{n} Q{value} (analog-out)")
+            gcode.append("\nG4 P0.5 (pause)")
+
+        # digital outputs
+        for n, value in self.outputs.diff_dout(status.dout):
+            if value == 1:
+                gcode.append(f"\nM64 P{n} (digital-out on)")
+            else:
+                gcode.append(f"\nM65 P{n} (digital-out off)")
+            gcode.append("\nG4 P0.1 (pause)")
+
+        # add changes
+        if len(gcode) > 2:
+            gcode.append("\n")
+            return "".join(gcode)
+        return ""
@@ -0,0 +1,175 @@
+#
+# command queue for linuxcnc.command
+#
+#  all commands are sent by one worker thread, the gui never waits for
+#  linuxcnc. every request has a timeout, a completion callback
+#  (called in the worker thread) and can be cancelled
+#
+#  the wait for a motion (after mdi) has its own timeout (default none),
+#  a timeout is only reported, the machine is only aborted on cancel
+#
+
+import queue
+import threading
+import time
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+# wait_complete is called in slices to react on cancel
+WAIT_SLICE = 0.1
+
+
+class CommandRequest:
+    """list of (method, args) steps for linuxcnc.command."""
+
+    def __init__(self, steps, callback=None, timeout=5.0, name="", motion_timeout=None):
+        self.steps = steps
+        self.callback = callback
+        self.timeout = timeout
+        self.motion_timeout = motion_timeout
+        self.name = name
+        self.state = PENDING
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+
+class CommandQueue(threading.Thread):
+    """serializes linuxcnc.command calls in its own thread."""
+
+    def __init__(self, command, linuxcnc, timeout=5.0, motion_timeout=None):
+        super().__init__(daemon=True)
+        self.command = command
+        self.linuxcnc = linuxcnc
+        self.timeout = timeout
+        self.motion_timeout = motion_timeout
+        self.requests = queue.Queue()
+        self.current = None
+        self.stop_event = threading.Event()
+
+    def submit(self, steps, callback=None, timeout=None, name=""):
+        request = CommandRequest(
+            list(steps),
+            callback,
+            self.timeout if timeout is None else timeout,
+            name,
+            self.motion_timeout,
+        )
+        self.requests.put(request)
+        return request
+
+    def mdi(self, blocks, callback=None, timeout=None):
+        """switches to MDI mode and sends the blocks (one MDI command each)."""
+        if isinstance(blocks, str):
+            blocks = [blocks]
+        steps = [("mode", (self.linuxcnc.MODE_MDI,)), ("wait_complete", ())]
+        for block in blocks:
+            steps += [("mdi", (block,)), ("wait_complete", ())]
+        return self.submit(steps, callback, timeout, name=" / ".join(blocks))
+
+    def cancel_all(self):
+        """cancels all pending requests, a running mdi is aborted."""
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                self.finish(request, CANCELLED)
+        current = self.current
+        if current is not None:
+            current.cancel()
+
+    def stop(self):
+        self.cancel_all()
+        self.stop_event.set()
+        self.requests.put(None)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            request = self.requests.get()
+            if request is None:
+                continue
+            if request.cancel_event.is_set():
+                self.finish(request, CANCELLED)
+                continue
+            self.current = request
+            try:
+                self.execute(request)
+            finally:
+                self.current = None
+
+    def execute(self, request):
+        request.state = RUNNING
+        deadline = time.monotonic() + request.timeout
+        sent = False
+        motion = False
+        try:
+            for method, args in request.steps:
+                if method == "wait_complete":
+                    if motion and request.motion_timeout is None:
+                        state = self.wait_complete(request, None)
+                    elif motion:
+                        state = self.wait_complete(
+                            request, time.monotonic() + request.motion_timeout
+                        )
+                    else:
+                        state = self.wait_complete(request, deadline)
+                    motion = False
+                    if state == DONE:
+                        continue
+                    if sent and state == CANCELLED:
+                        self.command.abort()
+                    if state == TIMEOUT:
+                        request.error = "motion not finished" if sent else "no response"
+                    self.finish(request, state)
+                    return
+                if request.cancel_event.is_set():
+                    if sent:
+                        self.command.abort()
+                    self.finish(request, CANCELLED)
+                    return
+                getattr(self.command, method)(*args)
+                motion = method == "mdi"
+                sent = sent or motion
+        except self.linuxcnc.error as err:
+            self.finish(request, FAILED, str(err))
+            return
+        self.finish(request, DONE)
+
+    def wait_complete(self, request, deadline):
+        """waits in slices until deadline (None: no limit)."""
+        while True:
+            if request.cancel_event.is_set():
+                return CANCELLED
+            remaining = WAIT_SLICE if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return TIMEOUT
+            result = self.command.wait_complete(min(remaining, WAIT_SLICE))
+            if result == self.linuxcnc.RCS_ERROR:
+                request.error = "command failed"
+                return FAILED
+            if result != -1:
+                return DONE
+
+    def finish(self, request, state, error=None):
+        request.state = state
+        if error is not None:
+            request.error = error
+        request.finished.set()
+        if request.callback is not None:
+            try:
+                request.callback(request)
+            except Exception as err:
+                print(f"command callback failed: {err}")
@@ -0,0 +1,194 @@
+#
+# converts joint mode programs into world mode programs
+#
+#  the world pose of every joint G0 block comes from the forward
+#  kinematics. the written (rounded) poses are checked with the inverse
+#  kinematics, every solve starts from the previous solution like the
+#  iterative genserkins solver on the machine, the deviation to the
+#  recorded joints shows rounding errors and branch changes
+#
+#  the forward kinematics gives machine coordinates, the G5x/G92 offsets
+#  that are active when the program runs have to be given (like the
+#  logger subtracts them from the world positions)
+#
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from .capture import JOINT_OFFSETS
+from .gcode import AXIS_NAMES, format_motion, motion_words, parse_words
+from .kinematics import pose_to_matrix
+
+CHUNK_SIZE = 4096
+# joint difference (degrees) up to which a solve counts as the same solution,
+# bigger than the differences from rounding the written poses
+SAME_SOLUTION = 1.0
+
+
+def joint_samples(blocks, joints=False, joint_offsets=JOINT_OFFSETS):
+    """block indices and machine joint positions (n, 9) of all joint mode G0 blocks.
+
+    joint words are modal, joints that were never set are nan.
+    """
+    rows = []
+    samples = []
+    current = [numpy.nan] * len(AXIS_NAMES)
+    joint_mode = joints
+    for index, block in enumerate(blocks):
+        words = parse_words(block)
+        if words in ([("M", 428.0)], [("M", 429.0)]):
+            joint_mode = joints or words[0][1] == 429.0
+            continue
+        if not joint_mode:
+            continue
+        axes = motion_words(words)
+        if not axes:
+            continue
+        for axis, value in axes.items():
+            current[axis] = value + joint_offsets[axis]
+        rows.append(index)
+        samples.append(list(current))
+    return rows, numpy.array(samples).reshape(-1, len(AXIS_NAMES))
+
+
+def check_chunk(kinematics, targets, recorded, seed):
+    """inverse kinematics of a chunk, each solve starts from the previous solution.
+
+    all targets are first solved together from the previous recorded
+    joints, that is the same as the sequential solve as long as every
+    solution matches the recorded joints. only after a mismatch the
+    following targets are solved one by one.
+    """
+    seeds = numpy.concatenate(([seed], recorded[:-1]))
+    solved, converged = kinematics.inverse(targets, seeds)
+    mismatch = numpy.abs(solved - recorded).max(axis=1) > SAME_SOLUTION
+    for index in range(1, len(targets)):
+        if mismatch[index - 1]:
+            solution, ok = kinematics.inverse(targets[index : index + 1], solved[index - 1 : index])
+            solved[index] = solution[0]
+            converged[index] = ok[0]
+            mismatch[index] = numpy.abs(solution[0] - recorded[index]).max() > SAME_SOLUTION
+    return solved, converged
+
+
+def check_poses(kinematics, poses, recorded, workers=None, chunk=CHUNK_SIZE):
+    """solves the poses (n, 6) in chunks (process pool for more than one chunk)."""
+    targets = pose_to_matrix(poses)
+    starts = list(range(0, len(poses), chunk))
+    jobs = [
+        (
+            kinematics,
+            targets[start : start + chunk],
+            recorded[start : start + chunk],
+            recorded[max(start - 1, 0)],
+        )
+        for start in starts
+    ]
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(check_chunk, *zip(*jobs)))
+    else:
+        results = [check_chunk(*job) for job in jobs]
+    if not results:
+        return numpy.zeros((0, kinematics.joints)), numpy.zeros(0, dtype=bool)
+    solved = numpy.concatenate([result[0] for result in results])
+    converged = numpy.concatenate([result[1] for result in results])
+    return solved, converged
+
+
+def convert_program(
+    blocks,
+    kinematics,
+    joints=False,
+    world_axes=range(6),
+    digits=2,
+    workers=None,
+    chunk=CHUNK_SIZE,
+    offsets=None,
+):
+    """returns (world mode blocks, report) of a program with joint mode blocks.
+
+    offsets are the G5x + G92 offsets of the world axes (X Y Z A B C), subtracted
+    from the machine poses, without them the program is in machine coordinates.
+    """
+    world_offsets = numpy.zeros(6)
+    if offsets is not None:
+        offsets = list(offsets)[:6]
+        world_offsets[: len(offsets)] = offsets
+    offsets = world_offsets
+    rows, samples = joint_samples(blocks, joints)
+    report = {
+        "converted": len(rows),
+        "skipped": 0,
+        "not_converged": 0,
+        "max_joint_deviation": 0.0,
+        "max_position_deviation": 0.0,
+        "worst_block": None,
+    }
+    recorded = samples[:, : kinematics.joints]
+    complete = ~numpy.isnan(recorded).any(axis=1)
+    report["skipped"] = int((~complete).sum())
+
+    poses = numpy.full((len(rows), 6), numpy.nan)
+    poses[complete] = kinematics.pose(recorded[complete])
+    # continuous A/B/C, the same orientation as +-360 degrees jumps
+    poses[complete, 3:] = numpy.unwrap(poses[complete, 3:], period=360.0, axis=0)
+    # + 0.0: no -0.0 words
+    poses = numpy.round(poses - offsets, digits) + 0.0
+
+    if complete.any():
+        # the written poses in machine coordinates
+        machine = poses[complete] + offsets
+        solved, converged = check_poses(
+            kinematics, machine, recorded[complete], workers=workers, chunk=chunk
+        )
+        deviation = numpy.abs(solved - recorded[complete]).max(axis=1)
+        position = numpy.linalg.norm(kinematics.pose(solved)[:, :3] - machine[:, :3], axis=1)
+        worst = int(numpy.argmax(deviation))
+        report["not_converged"] = int((~converged).sum())
+        report["max_joint_deviation"] = float(deviation[worst])
+        report["max_position_deviation"] = float(position.max())
+        report["worst_block"] = rows[int(numpy.flatnonzero(complete)[worst])]
+
+    # write the program
+    axes = [axis for axis in world_axes if axis < 6]
+    converted = dict(zip(rows, range(len(rows))))
+    result = []
+    last = [None] * 6
+    for index, block in enumerate(blocks):
+        sample = converted.get(index)
+        if sample is None:
+            words = parse_words(block)
+            if words == [("M", 429.0)]:
+                # world mode only
+                block = "M428 (WORLD-COORDS)"
+            if words in ([("M", 428.0)], [("M", 429.0)]):
+                last = [None] * 6
+            result.append(block)
+            continue
+        if not complete[sample]:
+            result.append(f"(not converted, unknown joints: {block})")
+            continue
+        pose = poses[sample].tolist()
+        changed = [axis for axis in axes if pose[axis] != last[axis]]
+        for axis in changed:
+            last[axis] = pose[axis]
+        if changed:
+            result.append(format_motion(changed, [pose[axis] for axis in changed]))
+    return result, report
+
+
+def format_conversion(report):
+    text = (
+        f"converted {report['converted']} joint blocks,"
+        f" max deviation {report['max_joint_deviation']:.4f} deg (joints)"
+        f" / {report['max_position_deviation']:.4f} mm (position)"
+    )
+    if report["worst_block"] is not None:
+        text += f", worst at line {report['worst_block'] + 1}"
+    if report["not_converged"]:
+        text += f", {report['not_converged']} inverse solutions not converged"
+    if report["skipped"]:
+        text += f", {report['skipped']} blocks with unknown joints"
+    return text
@@ -0,0 +1,249 @@
+#
+# cycle time estimation of logged programs
+#
+#  G0 moves are modeled per axis (world mode) or per joint (M429)
+#  with a trapezoidal velocity profile from the INI limits, all axes
+#  arrive together so the slowest one sets the time. feedrates do not
+#  matter for G0. dwells (G4) are added, after io writes they are
+#  counted as io pauses
+#
+
+import configparser
+import re
+
+import numpy
+
+from .gcode import AXIS_NAMES, parse_words
+
+# used if the INI has no limits for an axis/joint
+DEFAULT_VELOCITY = 100.0
+DEFAULT_ACCELERATION = 1000.0
+
+MOTION = 1
+DWELL = 2
+IO_PAUSE = 3
+KIND_NAMES = {MOTION: "motion", DWELL: "dwell", IO_PAUSE: "io pause"}
+
+IO_CODES = {"M62", "M63", "M64", "M65", "M66", "M67", "M68"}
+
+# comments and axis words of many blocks at once (newline separated)
+BATCH_COMMENT_RE = re.compile(r"\([^)\n]*\)|;[^\n]*")
+BATCH_WORD_RE = re.compile(r"(\n)|([XYZABCUVW])\s*([-+]?(?:\d+\.?\d*|\.\d+))", re.IGNORECASE)
+
+# fast path: axis letters become their index, block ends a (NEXT_BLOCK, 0) pair,
+# so the text is a list of (axis, value) number pairs
+NEXT_BLOCK = len(AXIS_NAMES)
+PAIRS_REPLACE = [("\n", f" {NEXT_BLOCK} 0 ")] + [
+    (letter, f" {axis} ")
+    for axis, name in enumerate(AXIS_NAMES)
+    for letter in (name, name.lower())
+]
+PAIRS_LETTERS = dict.fromkeys(ord(old) for old, _new in PAIRS_REPLACE)
+PAIRS_VALID = dict.fromkeys(map(ord, "0123456789.+- \t"))
+PAIRS_GLUED_RE = re.compile(r"[0-9.][+-]")
+
+
+class Limits:
+    """max velocity/acceleration of the world axes and the joints (9 each)."""
+
+    def __init__(self, world_velocity, world_acceleration, joint_velocity, joint_acceleration):
+        self.world_velocity = numpy.asarray(world_velocity, dtype=float)
+        self.world_acceleration = numpy.asarray(world_acceleration, dtype=float)
+        self.joint_velocity = numpy.asarray(joint_velocity, dtype=float)
+        self.joint_acceleration = numpy.asarray(joint_acceleration, dtype=float)
+
+    @classmethod
+    def default(cls):
+        velocity = [DEFAULT_VELOCITY] * len(AXIS_NAMES)
+        acceleration = [DEFAULT_ACCELERATION] * len(AXIS_NAMES)
+        return cls(velocity, acceleration, velocity, acceleration)
+
+
+def read_ini(path):
+    """Limits from the [AXIS_<name>] and [JOINT_<n>] sections of a LinuxCNC INI."""
+    ini = configparser.ConfigParser(
+        strict=False, interpolation=None, inline_comment_prefixes=("#", ";")
+    )
+    ini.read(path)
+
+    def values(prefix, names, key, default):
+        result = []
+        for name in names:
+            try:
+                result.append(float(ini.get(f"{prefix}_{name}", key)))
+            except (configparser.Error, ValueError):
+                result.append(default)
+        return result
+
+    joints = range(len(AXIS_NAMES))
+    return Limits(
+        values("AXIS", AXIS_NAMES, "MAX_VELOCITY", DEFAULT_VELOCITY),
+        values("AXIS", AXIS_NAMES, "MAX_ACCELERATION", DEFAULT_ACCELERATION),
+        values("JOINT", joints, "MAX_VELOCITY", DEFAULT_VELOCITY),
+        values("JOINT", joints, "MAX_ACCELERATION", DEFAULT_ACCELERATION),
+    )
+
+
+def trapezoid_time(distance, velocity, acceleration):
+    """time for distance from stop to stop (arrays)."""
+    distance = numpy.abs(distance)
+    # distance needed to reach max velocity and stop again
+    full = velocity * velocity / acceleration
+    return numpy.where(
+        distance >= full,
+        distance / velocity + velocity / acceleration,
+        2.0 * numpy.sqrt(distance / acceleration),
+    )
+
+
+def parse_motions(blocks):
+    """axis values of G0 blocks as (blocks x axes) array, nan for missing words."""
+    values = numpy.full((len(blocks), len(AXIS_NAMES)), numpy.nan)
+    text = BATCH_COMMENT_RE.sub("", "\n".join(blocks))
+
+    pairs = text
+    for old, new in PAIRS_REPLACE:
+        pairs = pairs.replace(old, new)
+    if not pairs.translate(PAIRS_VALID) and not PAIRS_GLUED_RE.search(pairs):
+        # one pair per axis word and per block end
+        count = len(text) - len(text.translate(PAIRS_LETTERS))
+        numbers = numpy.fromstring(pairs, sep=" ") if pairs.strip() else numpy.zeros(0)
+        if len(numbers) == 2 * count:
+            numbers = numbers.reshape(-1, 2)
+            axes = numbers[:, 0].astype(int)
+            rows = numpy.cumsum(axes == NEXT_BLOCK)
+            words = axes != NEXT_BLOCK
+            values[rows[words], axes[words]] = numbers[words, 1]
+            return values
+
+    # anything else (missing values, other words)
+    tokens = BATCH_WORD_RE.findall(text)
+    if not tokens:
+        return values
+    tokens = numpy.array(tokens)
+    rows = numpy.cumsum(tokens[:, 0] == "\n")
+    words = tokens[:, 1] != ""
+    letters = numpy.char.upper(tokens[words, 1])
+    axes = numpy.searchsorted(numpy.array(sorted(AXIS_NAMES)), letters)
+    axes = numpy.argsort(AXIS_NAMES)[axes]
+    # later words of the same axis win, like in parse order
+    values[rows[words], axes] = tokens[words, 2].astype(float)
+    return values
+
+
+def forward_fill(values, segments):
+    """fills nan values (per column) with the last value of the same segment."""
+    rows = numpy.arange(len(values))[:, None]
+    source = numpy.where(numpy.isnan(values), 0, rows)
+    source = numpy.maximum.accumulate(source, axis=0)
+    filled = numpy.take_along_axis(values, source, axis=0)
+    filled[segments[source] != segments[:, None]] = numpy.nan
+    return filled
+
+
+class Estimate:
+    """per block times (seconds) and kinds of a program."""
+
+    def __init__(self, times, kinds, unknown):
+        self.times = times
+        self.kinds = kinds
+        # moves without a known start position (first move, after M428/M429)
+        self.unknown = unknown
+
+    @property
+    def total(self):
+        return float(self.times.sum())
+
+    def by_kind(self):
+        return {
+            name: float(self.times[self.kinds == kind].sum()) for kind, name in KIND_NAMES.items()
+        }
+
+    def slowest(self, count=10):
+        """indices of the slowest blocks."""
+        order = numpy.argsort(self.times)[::-1][:count]
+        return [int(index) for index in order if self.times[index] > 0]
+
+
+def estimate_program(blocks, limits=None, joints=False):
+    """estimates the time of each block, returns an Estimate."""
+    if limits is None:
+        limits = Limits.default()
+    count = len(blocks)
+    times = numpy.zeros(count)
+    kinds = numpy.zeros(count, dtype=numpy.int8)
+
+    motion_rows = []
+    motion_blocks = []
+    motion_segments = []
+    motion_joint = []
+    segment = 0
+    joint_mode = joints
+    after_io = False
+    for index, block in enumerate(blocks):
+        head = block[:4]
+        if not head or head[0] not in "GM":
+            continue
+        if head.startswith("G0") and not head[2:3].isdigit():
+            motion_rows.append(index)
+            # without the G0 word
+            motion_blocks.append(block[2:])
+            motion_segments.append(segment)
+            motion_joint.append(joint_mode)
+            after_io = False
+        elif head.startswith("G4") and not head[2:3].isdigit():
+            words = dict(parse_words(block))
+            times[index] = words.get("P", 0.0)
+            kinds[index] = IO_PAUSE if after_io else DWELL
+        elif head in {"M428", "M429"}:
+            joint_mode = head == "M429"
+            segment += 1
+            after_io = False
+        elif head[:3] in IO_CODES and not head[3:4].isdigit():
+            after_io = True
+        else:
+            after_io = False
+
+    unknown = 0
+    if motion_rows:
+        rows = numpy.array(motion_rows)
+        segments = numpy.array(motion_segments)
+        joint = numpy.array(motion_joint)[:, None]
+        positions = forward_fill(parse_motions(motion_blocks), segments)
+        distances = numpy.zeros_like(positions)
+        distances[1:] = positions[1:] - positions[:-1]
+        distances[1:][segments[1:] != segments[:-1]] = numpy.nan
+        distances[0] = numpy.nan
+        unknown = int(numpy.isnan(distances).all(axis=1).sum())
+        distances = numpy.nan_to_num(distances)
+        velocity = numpy.where(joint, limits.joint_velocity, limits.world_velocity)
+        acceleration = numpy.where(joint, limits.joint_acceleration, limits.world_acceleration)
+        axis_times = trapezoid_time(distances, velocity, acceleration)
+        times[rows] = axis_times.max(axis=1)
+        kinds[rows] = MOTION
+    return Estimate(times, kinds, unknown)
+
+
+def format_estimate(estimate, blocks, count=10):
+    lines = [f"cycle time: {estimate.total:.1f}s"]
+    lines.append(
+        "  " + ", ".join(f"{name} {value:.1f}s" for name, value in estimate.by_kind().items())
+    )
+    if estimate.unknown:
+        lines.append(f"  {estimate.unknown} moves with unknown start position (not counted)")
+    slowest = estimate.slowest(count)
+    if slowest:
+        lines.append("slowest blocks:")
+        for index in slowest:
+            lines.append(f"  {index + 1:>7} {estimate.times[index]:8.2f}s  {blocks[index]}")
+    return "\n".join(lines)
+
+
+def write_segments(estimate, blocks, filename):
+    """per block breakdown as csv (line, kind, seconds, block)."""
+    with open(filename, "w") as handle:
+        handle.write("line,kind,seconds,block\n")
+        for index in numpy.flatnonzero(estimate.kinds):
+            block = blocks[index].replace('"', '""')
+            kind = KIND_NAMES[int(estimate.kinds[index])]
+            handle.write(f'{index + 1},{kind},{estimate.times[index]:.4f},"{block}"\n')
@@ -0,0 +1,224 @@
+#
+# deduplication of near-identical poses
+#
+#  a pose is a duplicate if it is within the tolerance (per axis, the
+#  chebyshev distance) of the previous kept pose, or optionally of any
+#  kept pose, in every space (world/joint) with a tolerance > 0
+#
+#  "any" uses a grid hash over the first GRID_AXES values of every space
+#  (scaled by its tolerance): cells of CELL_FACTOR * tolerance, only the
+#  neighbour cells of the dimensions where the pose is near a cell
+#  border are checked, so lookups stay O(1) also with 9 joints
+#
+
+import itertools
+import math
+import operator
+
+import numpy
+
+MODES = ("previous", "any")
+CELL_FACTOR = 4.0
+GRID_AXES = 3
+# scaled values are not exact at the cell borders
+GRID_SLACK = 1e-9
+# samples compared at once with every sample (mask, mode "previous")
+LOOKAHEAD = 32
+
+
+def near(point, other, tolerance):
+    return len(point) == len(other) and max(map(abs, map(operator.sub, point, other))) <= tolerance
+
+
+class GridIndex:
+    """grid hash of the poses of one space, cells hold pose numbers."""
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.size = tolerance * CELL_FACTOR
+        self.cells = {}
+
+    def cell(self, point):
+        return tuple(math.floor(value / self.size) for value in point)
+
+    def candidates(self, point):
+        """pose numbers in all cells that can hold a pose within the tolerance."""
+        choices = []
+        for value in point:
+            cell = math.floor(value / self.size)
+            offset = value - cell * self.size
+            cells = [cell]
+            if offset <= self.tolerance:
+                cells.append(cell - 1)
+            if offset >= self.size - self.tolerance:
+                cells.append(cell + 1)
+            choices.append(cells)
+        for cell in itertools.product(*choices):
+            yield from self.cells.get(cell, ())
+
+    def add(self, point, number):
+        self.cells.setdefault(self.cell(point), []).append(number)
+
+
+class Deduplicator:
+    """drops poses near the previous (or any) kept pose, tolerance 0 disables a space."""
+
+    def __init__(self, world_tolerance=0.0, joint_tolerance=0.0, mode="previous"):
+        if mode not in MODES:
+            raise ValueError(f"unknown dedup mode: {mode}")
+        self.tolerances = (max(world_tolerance, 0.0), max(joint_tolerance, 0.0))
+        self.mode = mode
+        self.skipped = 0
+        self.reset()
+
+    @property
+    def active(self):
+        return any(self.tolerances)
+
+    def reset(self):
+        self.poses = []
+        self.grid = None
+
+    def spaces(self, world, joint):
+        """(space number, point) of the spaces to compare."""
+        return [
+            (space, tuple(point))
+            for space, point in enumerate((world, joint))
+            if self.tolerances[space] > 0.0 and point is not None and len(point)
+        ]
+
+    def duplicate(self, world, joint):
+        """True if the pose is a duplicate, otherwise it is kept (remembered)."""
+        spaces = self.spaces(world, joint)
+        if not spaces:
+            return False
+        pose = [None, None]
+        for space, point in spaces:
+            pose[space] = point
+
+        if self.mode == "previous":
+            candidates = self.poses[-1:]
+        else:
+            keys = tuple(space for space, _point in spaces)
+            if self.grid is None or self.grid[0] != keys:
+                # new grid for other spaces
+                self.grid = (keys, GridIndex(1.0 + GRID_SLACK))
+                for number, old in enumerate(self.poses):
+                    if all(old[space] is not None for space in keys):
+                        self.grid[1].add(self.grid_key(old, keys), number)
+            key = self.grid_key(pose, keys)
+            # the previous pose first, the usual duplicate
+            candidates = itertools.chain(
+                self.poses[-1:],
+                (self.poses[number] for number in self.grid[1].candidates(key)),
+            )
+
+        for other in candidates:
+            if all(
+                other[space] is not None and near(point, other[space], self.tolerances[space])
+                for space, point in spaces
+            ):
+                self.skipped += 1
+                return True
+
+        if self.mode == "previous":
+            self.poses = [pose]
+        else:
+            self.poses.append(pose)
+            keys, grid = self.grid
+            grid.add(self.grid_key(pose, keys), len(self.poses) - 1)
+        return False
+
+    def grid_key(self, pose, keys):
+        return [
+            value / self.tolerances[space] for space in keys for value in pose[space][:GRID_AXES]
+        ]
+
+    def mask(self, world, joint=None):
+        """keep mask of sample arrays (n, axes), for continuous recordings."""
+        world = numpy.asarray(world, dtype=float) if world is not None else None
+        joint = numpy.asarray(joint, dtype=float) if joint is not None else None
+        count = len(world) if world is not None else len(joint)
+        keep = numpy.ones(count, dtype=bool)
+        if not self.active:
+            return keep
+        if self.mode == "previous":
+            keep = self.mask_previous(world, joint, count)
+        else:
+            for index in range(count):
+                keep[index] = not self.duplicate(
+                    world[index].tolist() if world is not None else None,
+                    joint[index].tolist() if joint is not None else None,
+                )
+        # the last sample is the end position
+        if count:
+            keep[-1] = True
+        return keep
+
+    def mask_previous(self, world, joint, count):
+        """keep mask of mode "previous" with numpy.
+
+        for every sample the next sample outside the tolerance within
+        LOOKAHEAD samples is calculated at once, the kept samples are a
+        chain through it. only after a longer stop the next sample is
+        searched in growing windows.
+        """
+        keep = numpy.zeros(count, dtype=bool)
+        spaces = [
+            (space, points, self.tolerances[space])
+            for space, points in enumerate((world, joint))
+            if self.tolerances[space] > 0.0 and points is not None and points.shape[1]
+        ]
+        if not spaces or not count:
+            return numpy.ones(count, dtype=bool)
+
+        def search(reference, start):
+            """first sample from start outside the tolerance of reference, count if none."""
+            window = LOOKAHEAD
+            while start < count:
+                end = min(start + window, count)
+                far = numpy.zeros(end - start, dtype=bool)
+                for space, points, tolerance in spaces:
+                    other = reference[space]
+                    if other is None or len(other) != points.shape[1]:
+                        far[:] = True
+                        continue
+                    far |= numpy.abs(points[start:end] - other).max(axis=1) > tolerance
+                if far.any():
+                    return start + int(far.argmax())
+                start = end
+                window *= 2
+            return count
+
+        # far[m - 1, i]: sample i + m is outside the tolerance of sample i
+        far = numpy.zeros((LOOKAHEAD, count), dtype=bool)
+        for _space, points, tolerance in spaces:
+            # per axis, a reduce over the few axes of a row is slow
+            for axis in numpy.ascontiguousarray(points.T):
+                for step in range(1, min(LOOKAHEAD + 1, count)):
+                    far[step - 1, :-step] |= numpy.abs(axis[step:] - axis[:-step]) > tolerance
+        following = numpy.where(
+            far.any(axis=0), numpy.arange(count) + far.argmax(axis=0) + 1, -1
+        ).tolist()
+
+        def row(index):
+            pose = [None, None]
+            for space, points, _tolerance in spaces:
+                pose[space] = tuple(points[index].tolist())
+            return pose
+
+        kept = []
+        index = search(self.poses[-1] if self.poses else [None, None], 0)
+        while index < count:
+            kept.append(index)
+            nxt = following[index]
+            if nxt < 0:
+                nxt = search(row(index), index + LOOKAHEAD + 1)
+            index = nxt
+        keep[kept] = True
+
+        self.skipped += count - len(kept)
+        if kept:
+            # the last kept pose, like duplicate() remembers it
+            self.poses = [row(kept[-1])]
+        return keep
@@ -0,0 +1,272 @@
+#
+# status fan-out: one poller, many local subscribers
+#
+#  the publisher sends every polled stat as one binary frame (struct)
+#  over a unix seqpacket socket to all connected subscribers, the
+#  subscribers use the latest frame as their stat object. the
+#  controller is polled once, however many loggers/viewers are attached.
+#  slow subscribers miss frames instead of blocking the poller
+#
+
+import os
+import socket
+import struct
+import threading
+import time
+
+MAGIC = b"RLST"
+VERSION = 1
+AXES = 9
+HOMED = 16
+AOUT = 64
+DOUT = 64
+CONNECT_TIMEOUT = 1.0
+
+# magic, version, sequence number, poll time,
+# estop, enabled, joints, interp_state, task_mode, homed,
+# axis limits (min/max per axis), position, joint_position, g5x/g92 offsets, aout, dout
+FRAME = struct.Struct(
+    f"<4sHId iBiii{HOMED}B {2 * AXES}d {AXES}d{AXES}d{AXES}d{AXES}d {AOUT}d{DOUT}B"
+)
+
+
+def fixed(values, count, default=0):
+    values = tuple(values)[:count]
+    return values + (default,) * (count - len(values))
+
+
+def pack_frame(stat, sequence=0):
+    """binary frame of the stat values used by the logger."""
+    limits = []
+    for axis in fixed(stat.axis, AXES, {}):
+        limits.append(axis.get("min_position_limit", 0.0))
+        limits.append(axis.get("max_position_limit", 0.0))
+    return FRAME.pack(
+        MAGIC,
+        VERSION,
+        sequence & 0xFFFFFFFF,
+        time.time(),
+        int(stat.estop),
+        bool(stat.enabled),
+        int(stat.joints),
+        int(stat.interp_state),
+        int(stat.task_mode),
+        *fixed((int(bool(homed)) for homed in stat.homed), HOMED),
+        *limits,
+        *fixed(stat.position, AXES, 0.0),
+        *fixed(stat.joint_position, AXES, 0.0),
+        *fixed(stat.g5x_offset, AXES, 0.0),
+        *fixed(stat.g92_offset, AXES, 0.0),
+        *fixed(stat.aout, AOUT, 0.0),
+        *fixed((int(bool(dout)) for dout in stat.dout), DOUT),
+    )
+
+
+def unpack_frame(data):
+    """(sequence, poll time, stat values) of a binary frame."""
+    if len(data) != FRAME.size:
+        raise ValueError(f"status frame with {len(data)} bytes, expected {FRAME.size}")
+    values = FRAME.unpack(data)
+    if values[0] != MAGIC or values[1] != VERSION:
+        raise ValueError("unknown status frame")
+    sequence, poll_time = values[2:4]
+    values = values[4:]
+
+    def take(count):
+        nonlocal values
+        part, values = values[:count], values[count:]
+        return part
+
+    estop, enabled, joints, interp_state, task_mode = take(5)
+    homed = take(HOMED)
+    limits = take(2 * AXES)
+    frame = {
+        "estop": estop,
+        "enabled": bool(enabled),
+        "joints": joints,
+        "interp_state": interp_state,
+        "task_mode": task_mode,
+        "homed": homed,
+        "axis": tuple(
+            {"min_position_limit": limits[2 * n], "max_position_limit": limits[2 * n + 1]}
+            for n in range(AXES)
+        ),
+        "position": take(AXES),
+        "joint_position": take(AXES),
+        "g5x_offset": take(AXES),
+        "g92_offset": take(AXES),
+        "aout": take(AOUT),
+        "dout": take(DOUT),
+    }
+    return sequence, poll_time, frame
+
+
+class StatusPublisher:
+    """sends the polled stat values to all subscribers of a unix socket."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sequence = 0
+        self.last_frame = None
+        self.clients = []
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            # stale socket of an old publisher
+            os.unlink(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.server.bind(path)
+        self.server.listen()
+        self.thread = threading.Thread(target=self.accept, daemon=True)
+        self.thread.start()
+
+    def accept(self):
+        while True:
+            try:
+                client, _address = self.server.accept()
+            except OSError:
+                # closed
+                return
+            client.setblocking(False)
+            with self.lock:
+                if self.last_frame is not None:
+                    self.send(client, self.last_frame)
+                self.clients.append(client)
+
+    def send(self, client, frame):
+        """False if the client is gone, a full buffer only drops the frame."""
+        try:
+            client.send(frame)
+        except BlockingIOError:
+            pass
+        except OSError:
+            client.close()
+            return False
+        return True
+
+    def publish(self, stat):
+        """sends the values of a polled stat object."""
+        self.sequence += 1
+        frame = pack_frame(stat, self.sequence)
+        with self.lock:
+            self.last_frame = frame
+            self.clients = [client for client in self.clients if self.send(client, frame)]
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def run_publisher(stat, path, interval=0.05):
+    """polls stat every interval and publishes it, until interrupted."""
+    publisher = StatusPublisher(path)
+    print(f"publishing the status on {path}")
+    next_tick = time.monotonic()
+    try:
+        while True:
+            stat.poll()
+            publisher.publish(stat)
+            next_tick += interval
+            time.sleep(max(next_tick - time.monotonic(), 0.0))
+    finally:
+        publisher.close()
+
+
+class SubscriberStat:
+    """linuxcnc.stat replacement with the values of the latest published frame."""
+
+    def __init__(self, path, timeout=CONNECT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.sock = None
+        self.sequence = None
+        self.poll_time = None
+        # missed frames (slow subscriber)
+        self.missed = 0
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            sock.connect(self.path)
+        except OSError as err:
+            sock.close()
+            raise RuntimeError(f"no status publisher on {self.path}: {err}")
+        self.sock = sock
+
+    def disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        # a new publisher starts with sequence 1
+        self.sequence = None
+
+    def receive(self, block):
+        """latest frame of the socket, None if there is none."""
+        latest = None
+        self.sock.settimeout(self.timeout if block else 0.0)
+        while True:
+            try:
+                data = self.sock.recv(FRAME.size + 1)
+            except (BlockingIOError, socket.timeout):
+                return latest
+            if not data:
+                self.disconnect()
+                raise RuntimeError(f"status publisher on {self.path} closed")
+            latest = data
+            self.sock.settimeout(0.0)
+
+    def poll(self):
+        if self.sock is None:
+            self.connect()
+        data = self.receive(block=self.sequence is None)
+        if data is None:
+            if self.sequence is None:
+                raise RuntimeError(f"no status from {self.path}")
+            # nothing new, like an unchanged machine
+            return
+        sequence, self.poll_time, frame = unpack_frame(data)
+        if self.sequence is not None:
+            self.missed += (sequence - self.sequence - 1) & 0xFFFFFFFF
+        self.sequence = sequence
+        for key, value in frame.items():
+            setattr(self, key, value)
+
+
+class SubscriberLinuxCNC:
+    """module like backend with the status of a publisher.
+
+    commands go to linuxcnc if it is installed, they do not poll.
+    """
+
+    MODE_MANUAL = 1
+    MODE_AUTO = 2
+    MODE_MDI = 3
+    INTERP_IDLE = 1
+    INTERP_READING = 2
+    INTERP_PAUSED = 3
+    INTERP_WAITING = 4
+    RCS_DONE = 1
+    RCS_EXEC = 2
+    RCS_ERROR = 3
+
+    error = RuntimeError
+
+    def __init__(self, path):
+        self.path = path
+
+    def stat(self):
+        return SubscriberStat(self.path)
+
+    def command(self):
+        try:
+            import linuxcnc
+        except ImportError:
+            from .backend import FakeCommand
+
+            print("linuxcnc not installed, commands are not sent")
+            return FakeCommand()
+        return linuxcnc.command()
@@ -0,0 +1,54 @@
+#
+# minimal gcode parsing for the programs written by the logger
+#
+
+import re
+
+AXIS_NAMES = ["X", "Y", "Z", "A", "B", "C", "U", "V", "W"]
+COMMENT_RE = re.compile(r"\([^)]*\)|;.*$")
+WORD_RE = re.compile(r"([A-Za-z])\s*([-+]?(?:\d+\.?\d*|\.\d+))")
+
+
+def strip_comments(line):
+    return COMMENT_RE.sub("", line).strip()
+
+
+def parse_words(line):
+    """returns the (letter, value) words of a block, comments are ignored."""
+    return [
+        (letter.upper(), float(value))
+        for letter, value in WORD_RE.findall(strip_comments(line))
+    ]
+
+
+def motion_words(words):
+    """returns {axis_index: value} for a pure G0 block, None for other blocks."""
+    if not words or words[0] != ("G", 0.0):
+        return None
+    axes = {}
+    for letter, value in words[1:]:
+        if letter not in AXIS_NAMES:
+            return None
+        axes[AXIS_NAMES.index(letter)] = value
+    return axes
+
+
+def format_motion(axes, values):
+    return "G0" + "".join(f" {AXIS_NAMES[axis]}{value}" for axis, value in zip(axes, values))
+
+
+def goto_blocks(blocks, row):
+    """MDI blocks to reach the point of a logged G0 block (None for other blocks).
+
+    the last M428/M429 in front of the block is sent first, so joint and
+    world points are moved in the mode they were recorded in.
+    """
+    axes = motion_words(parse_words(blocks[row]))
+    if not axes:
+        return None
+    motion = format_motion(sorted(axes), [axes[axis] for axis in sorted(axes)])
+    for index in range(row - 1, -1, -1):
+        words = parse_words(blocks[index])
+        if words in ([("M", 428.0)], [("M", 429.0)]):
+            return [f"M{int(words[0][1])}", motion]
+    return [motion]
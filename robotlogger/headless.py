@@ -0,0 +1,139 @@
+#
+# logger without gui
+#
+
+import sys
+import time
+
+from .capture import AXIS_NAMES, Capture
+from .outputs import DEFAULT_CHANNELS, OutputState
+from .journal import Journal, ProgramFile
+from .program import open_program
+from .session import SessionWriter, row_from_status, session_path
+from .status import snapshot
+
+
+class HeadlessLogger:
+    """records into a program like the gui, triggered from outside."""
+
+    def __init__(
+        self,
+        stat,
+        filename,
+        joints=False,
+        world_axes="XYZ",
+        joint_axes="012345678",
+        aout_channels=DEFAULT_CHANNELS,
+        dout_channels=DEFAULT_CHANNELS,
+        persist=True,
+        kinematics=None,
+        dedup=None,
+    ):
+        self.stat = stat
+        self.filename = filename
+        self.capture = Capture(
+            joints=joints,
+            world_axes=[AXIS_NAMES.index(name) for name in world_axes.upper()],
+            joint_axes=[int(joint) for joint in joint_axes],
+            outputs=OutputState(aout_channels, dout_channels),
+            kinematics=kinematics,
+            dedup=dedup,
+        )
+        self.program = open_program(
+            filename, joints, journal=Journal(filename) if persist else None
+        )
+        self.program_file = ProgramFile(filename)
+        self.program_file.attach(self.program)
+        self.session = SessionWriter(session_path(filename)) if persist else None
+        self.add()
+
+    def add(self):
+        try:
+            status = snapshot(self.stat)
+        except Exception as err:
+            print(f"can not poll linuxcnc: {err}", file=sys.stderr)
+            return ""
+        gcode = self.capture.record(status)
+        if gcode:
+            self.program.append(gcode)
+            if self.session is not None:
+                world = self.capture.world_pose(status) if self.capture.joint_mode() else None
+                self.session.append(
+                    row_from_status(
+                        status,
+                        self.capture.mode,
+                        self.capture.pos_ws,
+                        world,
+                        snap_positions=self.capture.pos_w,
+                    )
+                )
+        return gcode
+
+    def append_block(self, gcode):
+        self.program.append(gcode)
+        if self.session is not None:
+            self.session.append_block(gcode, self.capture.mode)
+
+    def pause(self):
+        self.append_block("\nG4 P1 (pause)")
+
+    def comment(self, text):
+        # same rules as the comment line of the gui
+        if text == "p":
+            self.pause()
+        elif text:
+            self.append_block(f"\n({text})")
+        else:
+            self.add()
+
+    def save(self):
+        self.program_file.save(self.program)
+
+    def close(self):
+        if self.program.journal is not None:
+            self.program.journal.close()
+        if self.session is not None:
+            self.session.close()
+
+
+def run_stdin(logger, stream=sys.stdin):
+    """every input line is handled like the comment line, 'w' saves."""
+    for line in stream:
+        line = line.strip()
+        if line == "w":
+            logger.save()
+            continue
+        logger.comment(line)
+
+
+def run_interval(logger, interval):
+    next_tick = time.monotonic()
+    while True:
+        next_tick += interval
+        time.sleep(max(next_tick - time.monotonic(), 0.0))
+        logger.add()
+
+
+def run_hal(logger, pin_name, interval=0.01):
+    """adds a point on every rising edge of the hal input pin robotlogger.<pin_name>."""
+    import hal
+
+    component = hal.component("robotlogger")
+    component.newpin(pin_name, hal.HAL_BIT, hal.HAL_IN)
+    component.ready()
+    last = False
+    try:
+        while True:
+            value = bool(component[pin_name])
+            if value and not last:
+                logger.add()
+            last = value
+            time.sleep(interval)
+    finally:
+        component.exit()
+
+
+def check(stat, filename, **options):
+    """prints the program with the current position added."""
+    logger = HeadlessLogger(stat, filename, persist=False, **options)
+    print(logger.program.text())
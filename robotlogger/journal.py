@@ -0,0 +1,233 @@
+#
+# crash safe journal and incremental saving
+#
+#  every change of the program after the last save is appended to
+#  <filename>.journal, on startup the journal is replayed on top of the file.
+#
+#  journal lines: '+<block>' appends a block, 'R' ... 'E' replaces the
+#  program with the enclosed '+' blocks, '=<index> <block>' sets and
+#  '-<index>' removes a block
+#
+#  the first line '@<size> <mtime>' is the state of the file the journal
+#  belongs to, a journal of an older file state is left from a crash
+#  between saving the file and removing the journal and is not replayed
+#
+#  the file is written and synced by a writer thread, the caller only
+#  queues the lines and never blocks on the disk
+#
+
+import os
+import threading
+import time
+
+
+def journal_path(filename):
+    return f"{filename}.journal"
+
+
+def file_state(filename):
+    """size and modification time of a file, '-' if it does not exist."""
+    if not os.path.isfile(filename):
+        return "-"
+    stat = os.stat(filename)
+    return f"{stat.st_size} {stat.st_mtime_ns}"
+
+
+class Journal:
+    """append-only change log, fsync after sync_blocks blocks or sync_interval seconds."""
+
+    def __init__(self, filename, sync_blocks=32, sync_interval=1.0):
+        self.filename = filename
+        self.path = journal_path(filename)
+        self.base = file_state(filename)
+        self.sync_blocks = sync_blocks
+        self.sync_interval = sync_interval
+        self.fh = None
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        # queued (operation, value), done by the writer thread
+        self.queue = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.writer = None
+
+    def recover(self, program):
+        """replays the journal onto program, returns the number of replayed blocks."""
+        if not os.path.isfile(self.path):
+            return 0
+        replayed = 0
+        replace = None
+        stale = False
+        with open(self.path, "r") as fh:
+            for line in fh:
+                if not line.endswith("\n"):
+                    # incomplete last line (crash while writing)
+                    break
+                line = line[:-1]
+                if line.startswith("@"):
+                    if line[1:] != self.base:
+                        # the file was saved after the journal was written
+                        print(f"{self.path} is older than {self.filename}, not replayed")
+                        stale = True
+                        break
+                elif line == "R":
+                    replace = []
+                elif line.startswith("+"):
+                    if replace is not None:
+                        replace.append(line[1:])
+                    else:
+                        program.extend([line[1:]])
+                    replayed += 1
+                elif line == "E" and replace is not None:
+                    program.replace(replace)
+                    replace = None
+                elif line.startswith("="):
+                    index, _, block = line[1:].partition(" ")
+                    program.set_block(int(index), block)
+                    replayed += 1
+                elif line.startswith("-"):
+                    program.delete_block(int(line[1:]))
+                    replayed += 1
+        if stale:
+            os.remove(self.path)
+        return replayed
+
+    def put(self, operation, value=None):
+        with self.lock:
+            self.queue.append((operation, value))
+        self.wake.set()
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop, daemon=True)
+            self.writer.start()
+
+    def write(self, lines):
+        self.put("write", [f"{line}\n" for line in lines])
+
+    def append(self, blocks):
+        self.write(f"+{block}" for block in blocks)
+
+    def replace(self, blocks):
+        self.write(["R"] + [f"+{block}" for block in blocks] + ["E"])
+        self.sync()
+
+    def set_block(self, index, block):
+        self.write([f"={index} {block}"])
+        self.sync()
+
+    def delete_block(self, index):
+        self.write([f"-{index}"])
+        self.sync()
+
+    def sync(self):
+        """fsync as soon as possible (in the writer thread)."""
+        self.put("sync")
+
+    def clear(self):
+        """everything is saved, start with an empty journal."""
+        self.put("clear", file_state(self.filename))
+
+    def close(self):
+        """writes and syncs everything queued, waits for the writer thread."""
+        if self.writer is None:
+            return
+        self.put("close")
+        self.writer.join()
+        self.writer = None
+
+    def write_loop(self):
+        while True:
+            self.wake.wait(self.sync_interval)
+            self.wake.clear()
+            with self.lock:
+                operations, self.queue = self.queue, []
+            for operation, value in operations:
+                if operation == "write":
+                    if self.fh is None:
+                        self.fh = open(self.path, "a")
+                        if self.fh.tell() == 0:
+                            self.fh.write(f"@{self.base}\n")
+                    self.fh.write("".join(value))
+                    self.pending += len(value)
+                elif operation == "sync":
+                    self.fsync()
+                elif operation == "clear":
+                    if self.fh is not None:
+                        self.fh.close()
+                        self.fh = None
+                    if os.path.isfile(self.path):
+                        os.remove(self.path)
+                    self.base = value
+                    self.pending = 0
+                elif operation == "close":
+                    self.fsync()
+                    if self.fh is not None:
+                        self.fh.close()
+                        self.fh = None
+                    return
+            if self.fh is not None:
+                self.fh.flush()
+            if (
+                self.pending >= self.sync_blocks
+                or time.monotonic() - self.last_sync >= self.sync_interval
+            ):
+                self.fsync()
+
+    def fsync(self):
+        if self.fh is not None and self.pending:
+            self.fh.flush()
+            os.fsync(self.fh.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+
+class ProgramFile:
+    """saves a program, only the new tail if the program was only appended."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.revision = None
+        self.blocks = 0
+        self.body_end = 0
+        self.size = None
+
+    def attach(self, program):
+        """the program was just loaded from this (logger written) file."""
+        base = program.blocks.base
+        if program.revision == 0 and getattr(base, "pristine", False):
+            self.revision = program.revision
+            self.blocks = len(base)
+            self.body_end = base.body_end
+            self.size = os.path.getsize(self.filename)
+
+    def save(self, program):
+        tail_only = (
+            self.revision == program.revision
+            and self.blocks <= len(program)
+            and os.path.isfile(self.filename)
+            and os.path.getsize(self.filename) == self.size
+        )
+        if tail_only:
+            data = "".join(f"{block}\n" for block in program.blocks[self.blocks :]).encode()
+            with open(self.filename, "r+b") as fh:
+                fh.seek(self.body_end)
+                fh.write(data)
+                fh.write(f"{program.end}\n".encode())
+                fh.truncate()
+                fh.flush()
+                os.fsync(fh.fileno())
+            self.body_end += len(data)
+        else:
+            data = "".join(f"{block}\n" for block in program.blocks).encode()
+            tmp_file = f"{self.filename}.tmp"
+            with open(tmp_file, "wb") as fh:
+                fh.write(data)
+                fh.write(f"{program.end}\n".encode())
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_file, self.filename)
+            self.body_end = len(data)
+        self.revision = program.revision
+        self.blocks = len(program)
+        self.size = os.path.getsize(self.filename)
+        if program.journal is not None:
+            program.journal.clear()
@@ -0,0 +1,272 @@
+#
+# forward kinematics of genserkins (numpy)
+#
+#  same model as the LinuxCNC genserkins module: modified (Craig) DH
+#  parameters, every link is Rx(ALPHA) Tx(A) Rz(joint) Tz(D),
+#  joints in degrees, ALPHA in radians. the world pose is
+#  X Y Z A B C with A/B/C as roll/pitch/yaw in degrees (like genserkins)
+#
+#  works on single joint vectors and on batches (..., joints),
+#  big batches are calculated in chunks
+#
+
+import numpy
+
+# genserkins defaults of a 6 axis robot, same format as a hal file
+DEFAULT_HAL = """
+setp genserkins.A-0 0.0
+setp genserkins.ALPHA-0 0.0
+setp genserkins.D-0 350.0
+setp genserkins.A-1 85.0
+setp genserkins.ALPHA-1 -1.571
+setp genserkins.D-1 0.0
+setp genserkins.A-2 380.0
+setp genserkins.ALPHA-2 0.0
+setp genserkins.D-2 0.0
+setp genserkins.A-3 100.0
+setp genserkins.ALPHA-3 -1.571
+setp genserkins.D-3 425.0
+setp genserkins.A-4 0.0
+setp genserkins.ALPHA-4 1.571
+setp genserkins.D-4 0.0
+setp genserkins.A-5 0.0
+setp genserkins.ALPHA-5 -1.571
+setp genserkins.D-5 0.0
+"""
+
+CHUNK_SIZE = 1 << 14
+
+# inverse kinematics (damped least squares)
+IK_ITERATIONS = 100
+IK_DAMPING = 0.01
+# max joint step per iteration (degrees)
+IK_MAX_STEP = 10.0
+# squared position (mm) and rotation (rad) errors
+IK_POSITION_TOLERANCE = 1e-10
+IK_ROTATION_TOLERANCE = 1e-14
+
+
+def parse_hal(text):
+    """returns the genserkins parameters {'A-0': 0.0, ...} of hal setp lines (in file order)."""
+    params = {}
+    for line in text.split("\n"):
+        line = line.split("#")[0].strip()
+        if not line.startswith("setp genserkins."):
+            continue
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        key = parts[1].split(".", 1)[1]
+        try:
+            params[key] = float(parts[2])
+        except ValueError:
+            continue
+    return params
+
+
+def chain_link(columns, a, alpha, d, theta):
+    """columns (x, y, z, p) of a transform times the link Rx(alpha) Tx(a) Rz(theta) Tz(d).
+
+    theta in radians, works on the (3, ...) columns instead of 4x4
+    matrix products, much faster for big batches.
+    """
+    x, y, z, p = columns
+    ct = numpy.cos(theta)
+    st = numpy.sin(theta)
+    ca = numpy.cos(alpha)
+    sa = numpy.sin(alpha)
+    # y and z rotated around x by alpha
+    y_alpha = ca * y + sa * z
+    z_alpha = ca * z - sa * y
+    return (
+        ct * x + st * y_alpha,
+        ct * y_alpha - st * x,
+        z_alpha,
+        p + a * x + d * z_alpha,
+    )
+
+
+def columns_to_matrix(columns):
+    matrices = numpy.zeros(columns[0].shape[1:] + (4, 4))
+    for n, column in enumerate(columns):
+        matrices[..., :3, n] = numpy.moveaxis(column, 0, -1)
+    matrices[..., 3, 3] = 1.0
+    return matrices
+
+
+def matrix_to_pose(matrices):
+    """(..., 4, 4) -> (..., 6) X Y Z A B C, A/B/C roll/pitch/yaw in degrees."""
+    r00 = matrices[..., 0, 0]
+    r10 = matrices[..., 1, 0]
+    r20 = matrices[..., 2, 0]
+    pitch = numpy.arctan2(-r20, numpy.hypot(r00, r10))
+    roll = numpy.arctan2(matrices[..., 2, 1], matrices[..., 2, 2])
+    yaw = numpy.arctan2(r10, r00)
+    # pitch +-90 degrees: roll and yaw are the same rotation, yaw is 0
+    gimbal = numpy.hypot(r00, r10) < 1e-9
+    if numpy.any(gimbal):
+        sign = numpy.sign(-r20)
+        gimbal_roll = sign * numpy.arctan2(matrices[..., 0, 1], matrices[..., 1, 1])
+        roll = numpy.where(gimbal, gimbal_roll, roll)
+        yaw = numpy.where(gimbal, 0.0, yaw)
+    poses = numpy.empty(matrices.shape[:-2] + (6,))
+    poses[..., :3] = matrices[..., :3, 3]
+    poses[..., 3] = numpy.degrees(roll)
+    poses[..., 4] = numpy.degrees(pitch)
+    poses[..., 5] = numpy.degrees(yaw)
+    return poses
+
+
+def pose_to_matrix(poses):
+    """(..., 6) X Y Z A B C -> (..., 4, 4), inverse of matrix_to_pose."""
+    poses = numpy.asarray(poses, dtype=float)
+    roll, pitch, yaw = numpy.radians(numpy.moveaxis(poses[..., 3:6], -1, 0))
+    cr, sr = numpy.cos(roll), numpy.sin(roll)
+    cp, sp = numpy.cos(pitch), numpy.sin(pitch)
+    cy, sy = numpy.cos(yaw), numpy.sin(yaw)
+    matrices = numpy.zeros(poses.shape[:-1] + (4, 4))
+    # Rz(yaw) Ry(pitch) Rx(roll)
+    matrices[..., 0, 0] = cy * cp
+    matrices[..., 0, 1] = cy * sp * sr - sy * cr
+    matrices[..., 0, 2] = cy * sp * cr + sy * sr
+    matrices[..., 1, 0] = sy * cp
+    matrices[..., 1, 1] = sy * sp * sr + cy * cr
+    matrices[..., 1, 2] = sy * sp * cr - cy * sr
+    matrices[..., 2, 0] = -sp
+    matrices[..., 2, 1] = cp * sr
+    matrices[..., 2, 2] = cp * cr
+    matrices[..., :3, 3] = poses[..., :3]
+    matrices[..., 3, 3] = 1.0
+    return matrices
+
+
+class GenSerKins:
+    """serial chain with modified DH parameters (one entry per joint)."""
+
+    def __init__(self, a, alpha, d):
+        self.a = numpy.asarray(a, dtype=float)
+        self.alpha = numpy.asarray(alpha, dtype=float)
+        self.d = numpy.asarray(d, dtype=float)
+        self.joints = len(self.a)
+
+    @classmethod
+    def from_params(cls, params):
+        joints = 0
+        while f"A-{joints}" in params or f"D-{joints}" in params:
+            joints += 1
+        return cls(
+            [params.get(f"A-{n}", 0.0) for n in range(joints)],
+            [params.get(f"ALPHA-{n}", 0.0) for n in range(joints)],
+            [params.get(f"D-{n}", 0.0) for n in range(joints)],
+        )
+
+    @classmethod
+    def from_hal(cls, text):
+        return cls.from_params(parse_hal(text))
+
+    def frames(self, joints):
+        """transforms of the base and of every link end, (..., joints + 1, 4, 4)."""
+        theta = numpy.radians(numpy.asarray(joints, dtype=float)[..., : self.joints])
+        frames = numpy.empty(theta.shape[:-1] + (self.joints + 1, 4, 4))
+        columns = self.base_columns(theta.shape[:-1])
+        frames[..., 0, :, :] = columns_to_matrix(columns)
+        for n in range(self.joints):
+            columns = chain_link(columns, self.a[n], self.alpha[n], self.d[n], theta[..., n])
+            frames[..., n + 1, :, :] = columns_to_matrix(columns)
+        return frames
+
+    @staticmethod
+    def base_columns(shape):
+        """columns of the identity transform for a batch shape."""
+        return tuple(
+            numpy.broadcast_to(axis.reshape((3,) + (1,) * len(shape)), (3,) + shape)
+            for axis in numpy.eye(4, 3)
+        )
+
+    def forward(self, joints):
+        """end transform (..., 4, 4) of joint positions (..., joints) in degrees."""
+        theta = numpy.radians(numpy.asarray(joints, dtype=float)[..., : self.joints])
+        columns = self.base_columns(theta.shape[:-1])
+        for n in range(self.joints):
+            columns = chain_link(columns, self.a[n], self.alpha[n], self.d[n], theta[..., n])
+        return columns_to_matrix(columns)
+
+    def inverse(self, targets, seeds, iterations=IK_ITERATIONS, damping=IK_DAMPING):
+        """joint positions (n, joints) for target transforms (n, 4, 4).
+
+        damped least squares like the iterative genserkins solver, every
+        target starts from its seed (degrees) and converges to the nearest
+        solution. returns (joints, converged).
+        """
+        targets = numpy.asarray(targets, dtype=float)
+        joints = numpy.array(seeds, dtype=float)[:, : self.joints]
+        converged = numpy.zeros(len(joints), dtype=bool)
+        active = numpy.arange(len(joints))
+        identity = numpy.eye(6) * damping * damping
+        for _iteration in range(iterations):
+            if not len(active):
+                break
+            frames = self.frames(joints[active])
+            end = frames[:, -1]
+            target = targets[active]
+            position_error = target[:, :3, 3] - end[:, :3, 3]
+            rotation_error = 0.5 * sum(
+                numpy.cross(end[:, :3, axis], target[:, :3, axis]) for axis in range(3)
+            )
+            done = (numpy.einsum("ij,ij->i", position_error, position_error) < IK_POSITION_TOLERANCE) & (
+                numpy.einsum("ij,ij->i", rotation_error, rotation_error) < IK_ROTATION_TOLERANCE
+            )
+            converged[active[done]] = True
+            keep = ~done
+            active = active[keep]
+            if not len(active):
+                break
+            # jacobian of revolute joints: z axis and lever of every joint
+            axes = frames[keep, 1:, :3, 2]
+            origins = frames[keep, 1:, :3, 3]
+            lever = end[keep, None, :3, 3] - origins
+            jacobian = numpy.concatenate((numpy.cross(axes, lever), axes), axis=2).transpose(0, 2, 1)
+            error = numpy.concatenate((position_error[keep], rotation_error[keep]), axis=1)
+            step = numpy.linalg.solve(
+                jacobian @ jacobian.transpose(0, 2, 1) + identity, error[..., None]
+            )
+            step = numpy.degrees((jacobian.transpose(0, 2, 1) @ step)[..., 0])
+            joints[active] += numpy.clip(step, -IK_MAX_STEP, IK_MAX_STEP)
+        return joints, converged
+
+    def positions(self, joints, chunk=CHUNK_SIZE):
+        """tool positions (n, 3) of joint positions (n, joints), without the orientation."""
+        joints = numpy.asarray(joints, dtype=float)
+        positions = numpy.empty((len(joints), 3))
+        for start in range(0, len(joints), chunk):
+            theta = numpy.radians(joints[start : start + chunk, : self.joints])
+            columns = self.base_columns(theta.shape[:-1])
+            for n in range(self.joints - 1):
+                columns = chain_link(columns, self.a[n], self.alpha[n], self.d[n], theta[..., n])
+            x, y, z, p = columns
+            if self.joints:
+                # the last link only moves the origin, its rotation does not matter
+                last = self.joints - 1
+                z = numpy.cos(self.alpha[last]) * z - numpy.sin(self.alpha[last]) * y
+                p = p + self.a[last] * x + self.d[last] * z
+            positions[start : start + chunk] = p.T
+        return positions
+
+    def pose(self, joints, chunk=CHUNK_SIZE):
+        """world pose X Y Z A B C of joint positions, single (joints,) or batch (n, joints)."""
+        joints = numpy.asarray(joints, dtype=float)
+        if joints.ndim == 1:
+            return matrix_to_pose(self.forward(joints))
+        poses = numpy.empty((len(joints), 6))
+        for start in range(0, len(joints), chunk):
+            poses[start : start + chunk] = matrix_to_pose(self.forward(joints[start : start + chunk]))
+        return poses
+
+
+def load_kinematics(filename):
+    """GenSerKins of the genserkins setp lines of a hal file."""
+    with open(filename, "r") as handle:
+        kinematics = GenSerKins.from_hal(handle.read())
+    if not kinematics.joints:
+        raise ValueError(f"no genserkins parameters in {filename}")
+    return kinematics
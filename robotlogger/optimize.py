@@ -0,0 +1,177 @@
+#
+# post optimizer for logged programs
+#
+#  - drops G0 blocks without effect and axis words that do not change
+#  - drops IO writes that set the current value (and their pause)
+#  - collapses redundant M428/M429 switches
+#  - merges adjacent pauses (G4)
+#  - optional (parallel_io): one pause for a group of IO writes
+#
+
+from .gcode import format_motion, motion_words, parse_words
+
+
+def format_pause(seconds):
+    return f"G4 P{round(seconds, 3)} (pause)"
+
+
+def optimize_program(blocks, parallel_io=False):
+    """returns (new_blocks, report), report['time_saved'] is in seconds."""
+    report = {
+        "blocks_removed": 0,
+        "motions_removed": 0,
+        "io_removed": 0,
+        "modes_removed": 0,
+        "pauses_merged": 0,
+        "time_saved": 0.0,
+    }
+    result = []
+    position = {}
+    mode = None
+    pending_mode = None
+    aout = {}
+    dout = {}
+    # index in result of the last pause and if it follows an io write
+    last_pause = None
+    after_io = False
+    # pins/channels written in front of the last pause (parallel_io)
+    io_group = set()
+    skip_io_pause = False
+
+    def switch_mode():
+        nonlocal pending_mode, mode, position, last_pause
+        if pending_mode is None:
+            return
+        if pending_mode[0] != mode:
+            mode = pending_mode[0]
+            position = {}
+            result.append(pending_mode[1])
+            last_pause = None
+        else:
+            report["modes_removed"] += 1
+        pending_mode = None
+
+    def emit_io(block, key):
+        nonlocal last_pause, io_group
+        if parallel_io and last_pause is not None and last_pause[2] and key not in io_group:
+            # move the io write in front of the pause of the last io write
+            result.insert(last_pause[0], block)
+            last_pause = (last_pause[0] + 1, last_pause[1], last_pause[2])
+            io_group.add(key)
+        else:
+            # a second write of the same pin/channel starts a new group (pulses)
+            emit(block)
+            io_group = {key}
+
+    def emit(block):
+        nonlocal last_pause
+        switch_mode()
+        result.append(block)
+        last_pause = None
+
+    for block in blocks:
+        words = parse_words(block)
+        if not words:
+            # comments and empty lines
+            result.append(block)
+            continue
+
+        letters = {letter for letter, _value in words}
+        first = words[0]
+
+        # mode switch (world/joint)
+        if first in {("M", 428.0), ("M", 429.0)} and len(words) == 1:
+            if pending_mode is not None:
+                report["modes_removed"] += 1
+            pending_mode = (0 if first[1] == 428 else 1, block)
+            continue
+
+        # pause
+        if first == ("G", 4.0) and letters <= {"G", "P"}:
+            seconds = dict(words).get("P", 0.0)
+            if skip_io_pause:
+                # pause of a removed io write
+                report["time_saved"] += seconds
+                skip_io_pause = False
+                continue
+            if last_pause is not None:
+                merged, merged_seconds, merged_io = last_pause
+                if parallel_io and merged_io and after_io:
+                    # io outputs switch in parallel, wait only for the slowest
+                    total = max(merged_seconds, seconds)
+                    report["time_saved"] += min(merged_seconds, seconds)
+                else:
+                    total = merged_seconds + seconds
+                result[merged] = format_pause(total)
+                last_pause = (merged, total, merged_io and after_io)
+                report["pauses_merged"] += 1
+                after_io = False
+                continue
+            emit(block)
+            last_pause = (len(result) - 1, seconds, after_io)
+            after_io = False
+            continue
+        skip_io_pause = False
+
+        # digital outputs
+        if first[0] == "M" and first[1] in {64.0, 65.0} and letters <= {"M", "P"}:
+            pin = int(dict(words).get("P", 0))
+            value = 1 if first[1] == 64.0 else 0
+            if dout.get(pin) == value:
+                report["io_removed"] += 1
+                skip_io_pause = True
+                continue
+            dout[pin] = value
+            emit_io(block, ("dout", pin))
+            after_io = True
+            continue
+
+        # analog outputs
+        if first == ("M", 68.0) and letters <= {"M", "E", "Q"}:
+            params = dict(words)
+            channel = int(params.get("E", 0))
+            value = params.get("Q", 0.0)
+            if aout.get(channel) == value:
+                report["io_removed"] += 1
+                skip_io_pause = True
+                continue
+            aout[channel] = value
+            emit_io(block, ("aout", channel))
+            after_io = True
+            continue
+
+        after_io = False
+        axes = motion_words(words)
+        if axes is not None:
+            if axes:
+                switch_mode()
+            changed = [axis for axis in sorted(axes) if position.get(axis) != axes[axis]]
+            if not changed:
+                report["motions_removed"] += 1
+                continue
+            position.update(axes)
+            if len(changed) != len(axes):
+                block = format_motion(changed, [axes[axis] for axis in changed])
+            emit(block)
+            continue
+
+        # everything else is kept, positions/outputs may change
+        if "G" in letters or "M" in letters:
+            if letters & {"X", "Y", "Z", "A", "B", "C", "U", "V", "W"}:
+                position = {}
+        emit(block)
+
+    # a mode switch at the end (only comments or empty motions after it)
+    switch_mode()
+
+    report["blocks_removed"] = len(blocks) - len(result)
+    return result, report
+
+
+def format_report(report):
+    return (
+        f"optimize: removed {report['blocks_removed']} blocks"
+        f" ({report['motions_removed']} motions, {report['io_removed']} io writes,"
+        f" {report['modes_removed']} mode switches, {report['pauses_merged']} pauses merged),"
+        f" about {report['time_saved']:.1f}s saved"
+    )
@@ -0,0 +1,75 @@
+#
+# analog/digital output state
+#
+#  dout is kept as integer bitmask, aout as numpy array,
+#  changes are found in one step for the configured channels only
+#
+
+import numpy
+
+CHANNELS = 64
+# aout/dout 3: in robot mode, we can read the kinstype here
+DEFAULT_CHANNELS = "0-2,4-63"
+
+
+def parse_channels(text, channels=CHANNELS):
+    """'0-2,4,8-63' -> sorted list of channel numbers, 'all' / 'none' allowed."""
+    text = text.strip().lower()
+    if text == "all":
+        return list(range(channels))
+    if text in {"", "none"}:
+        return []
+    result = set()
+    for part in text.split(","):
+        if "-" in part:
+            start, end = part.split("-", 1)
+            result.update(range(int(start), int(end) + 1))
+        else:
+            result.add(int(part))
+    return sorted(channel for channel in result if 0 <= channel < channels)
+
+
+def pack_bits(values):
+    """sequence of 0/1 -> int bitmask (bit n = values[n])."""
+    packed = numpy.packbits(numpy.asarray(values, dtype=bool), bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+
+class OutputState:
+    """last written outputs, diffed against new aout/dout values."""
+
+    def __init__(self, aout_channels=DEFAULT_CHANNELS, dout_channels=DEFAULT_CHANNELS):
+        self.aout_channels = numpy.array(parse_channels(aout_channels), dtype=numpy.intp)
+        self.dout_mask = 0
+        for channel in parse_channels(dout_channels):
+            self.dout_mask |= 1 << channel
+        self.reset()
+
+    def reset(self):
+        self.aout = numpy.zeros(CHANNELS, dtype=numpy.float64)
+        self.dout = 0
+
+    def diff_aout(self, aout):
+        """returns [(channel, value)] of the changed analog outputs."""
+        values = numpy.asarray(aout, dtype=numpy.float64)
+        channels = self.aout_channels[self.aout_channels < len(values)]
+        changed = channels[values[channels] != self.aout[channels]]
+        if not len(changed):
+            return []
+        self.aout[changed] = values[changed]
+        return list(zip(changed.tolist(), values[changed].tolist()))
+
+    def diff_dout(self, dout):
+        """returns [(channel, value)] of the changed digital outputs."""
+        bits = pack_bits(dout)
+        changed = (bits ^ self.dout) & self.dout_mask
+        if not changed:
+            return []
+        self.dout ^= changed
+        result = []
+        while changed:
+            low = changed & -changed
+            channel = low.bit_length() - 1
+            result.append((channel, 1 if bits & low else 0))
+            changed ^= low
+        return result
@@ -0,0 +1,156 @@
+#
+# opt-in instrumentation of the hot paths (--profile)
+#
+#  every stage keeps its last latencies in a ring buffer (p50/p99)
+#  plus count and max since the start, ticks of periodic stages are
+#  also checked against their period (jitter, late and dropped ticks)
+#
+
+import json
+import os
+import platform
+import socket
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy
+
+from . import __version__
+
+CAPACITY = 4096
+
+
+class Latencies:
+    """latencies (seconds) of one stage."""
+
+    def __init__(self, capacity=CAPACITY):
+        self.values = numpy.zeros(capacity)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def summary(self):
+        values = self.values[: min(self.count, len(self.values))]
+        if not len(values):
+            return {"count": 0}
+        p50, p99 = numpy.percentile(values, (50, 99))
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1e3,
+            "p50_ms": float(p50) * 1e3,
+            "p99_ms": float(p99) * 1e3,
+            "max_ms": self.max * 1e3,
+        }
+
+
+class Ticks:
+    """jitter of a periodic stage against its period."""
+
+    def __init__(self, capacity=CAPACITY):
+        self.jitter = Latencies(capacity)
+        self.last = None
+        self.late = 0
+        self.dropped = 0
+
+    def tick(self, period, now):
+        if self.last is not None and period > 0:
+            interval = now - self.last
+            self.jitter.add(abs(interval - period))
+            if interval > period * 1.5:
+                self.late += 1
+                # whole periods without a tick
+                self.dropped += int(interval / period + 0.5) - 1
+        self.last = now
+
+    def summary(self):
+        return dict(self.jitter.summary(), late=self.late, dropped=self.dropped)
+
+
+class Profiler:
+    """stage latencies and tick jitter, a disabled profiler costs (nearly) nothing."""
+
+    def __init__(self, enabled=True, capacity=CAPACITY):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.stages = {}
+        self.ticks = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        stage = self.stages.get(name)
+        if stage is None:
+            with self.lock:
+                stage = self.stages.setdefault(name, Latencies(self.capacity))
+        stage.add(seconds)
+
+    @contextmanager
+    def _measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def stage(self, name):
+        """context manager, measures the time of the block."""
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    def tick(self, name, period):
+        """call once per tick of a periodic stage (period in seconds)."""
+        if not self.enabled:
+            return
+        ticks = self.ticks.get(name)
+        if ticks is None:
+            with self.lock:
+                ticks = self.ticks.setdefault(name, Ticks(self.capacity))
+        ticks.tick(period, time.perf_counter())
+
+    def report(self):
+        with self.lock:
+            stages = dict(self.stages)
+            ticks = dict(self.ticks)
+        return {
+            "version": __version__,
+            "host": socket.gethostname(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "pid": os.getpid(),
+            "started": self.started,
+            "duration": time.time() - self.started,
+            "stages": {name: stage.summary() for name, stage in sorted(stages.items())},
+            "ticks": {name: tick.summary() for name, tick in sorted(ticks.items())},
+        }
+
+    def format(self):
+        """short text for the live panel."""
+        report = self.report()
+        lines = [f"{'stage':<10} {'n':>6} {'p50':>7} {'p99':>7} {'max':>7} ms"]
+        for name, stage in report["stages"].items():
+            if stage["count"]:
+                lines.append(
+                    f"{name:<10} {stage['count']:>6} {stage['p50_ms']:>7.2f}"
+                    f" {stage['p99_ms']:>7.2f} {stage['max_ms']:>7.2f}"
+                )
+        lines.append(f"{'ticks':<10} {'jitter p99':>14} {'late':>6} {'drop':>6}")
+        for name, tick in report["ticks"].items():
+            if tick["count"]:
+                lines.append(
+                    f"{name:<10} {tick['p99_ms']:>11.2f} ms {tick['late']:>6} {tick['dropped']:>6}"
+                )
+        return "\n".join(lines)
+
+    def dump(self, filename):
+        with open(filename, "w") as handle:
+            json.dump(self.report(), handle, indent=2)
+        print(f"profile written to {filename}")
@@ -0,0 +1,263 @@
+#
+# in-memory program model of the logger
+#
+#  the block list is the source of truth, views only get the deltas.
+#  existing files are not read completely, blocks are read on access
+#
+
+import os
+
+import numpy
+
+PROGRAM_END = "M02"
+CODE_PREFIXES = {"(", "G", "M", "F"}
+CHUNK_SIZE = 1 << 22
+
+
+def clean_line(line):
+    """wrap everything that is not a code or comment line into a comment."""
+    if line and line[0] not in CODE_PREFIXES:
+        line = f"({line})"
+    return line
+
+
+def parse_code(code):
+    """splits code into cleaned blocks, program ends are removed."""
+    blocks = []
+    if not code:
+        return blocks
+    for line in code.rstrip("\n").split("\n"):
+        line = clean_line(line)
+        if line.startswith(PROGRAM_END):
+            continue
+        blocks.append(line)
+    return blocks
+
+
+class FileBlocks:
+    """blocks of a program file, only a line index is kept in memory.
+
+    the file is scanned in chunks, lines are decoded when they are read.
+    pristine is set if the file looks like written by the logger
+    (clean lines, one program end as last line), body_end is the
+    offset of that program end.
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        size = os.path.getsize(path)
+        self.data = numpy.memmap(path, dtype=numpy.uint8, mode="r") if size else b""
+        newlines = [
+            numpy.flatnonzero(self.data[offset : offset + chunk_size] == 10) + offset
+            for offset in range(0, size, chunk_size)
+        ]
+        newlines = numpy.concatenate(newlines) if newlines else numpy.zeros(0, numpy.int64)
+        starts = numpy.concatenate(([0], newlines + 1)).astype(numpy.int64)
+        ends = numpy.concatenate((newlines, [size])).astype(numpy.int64)
+        # trailing empty lines
+        last = len(starts)
+        while last and starts[last - 1] >= ends[last - 1]:
+            last -= 1
+        starts = starts[:last]
+        ends = ends[:last]
+
+        # program ends (M02)
+        if len(starts):
+            data = numpy.asarray(self.data)
+            first = data[numpy.minimum(starts, size - 1)]
+            second = data[numpy.minimum(starts + 1, size - 1)]
+            third = data[numpy.minimum(starts + 2, size - 1)]
+            program_end = (
+                (ends - starts >= 3)
+                & (first == ord("M"))
+                & (second == ord("0"))
+                & (third == ord("2"))
+            )
+            allowed = numpy.zeros(256, dtype=bool)
+            for prefix in CODE_PREFIXES:
+                allowed[ord(prefix)] = True
+            clean = (ends == starts) | allowed[first]
+            self.pristine = bool(
+                clean.all()
+                and program_end.sum() == 1
+                and program_end[-1]
+                and ends[-1] - starts[-1] == len(PROGRAM_END)
+                and ends[-1] == size - 1
+            )
+            self.body_end = int(starts[-1]) if self.pristine else None
+            starts = starts[~program_end]
+            ends = ends[~program_end]
+        else:
+            self.pristine = False
+            self.body_end = None
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        line = bytes(self.data[self.starts[index] : self.ends[index]])
+        return clean_line(line.decode(errors="replace").rstrip("\r"))
+
+
+class BlockList:
+    """file blocks (read only, edits kept as overrides) plus appended blocks."""
+
+    def __init__(self, base=(), tail=None):
+        self.base = base
+        self.tail = list(tail) if tail is not None else []
+        self.overrides = {}
+
+    def __len__(self):
+        return len(self.base) + len(self.tail)
+
+    def index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("block index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[pos] for pos in range(*index.indices(len(self)))]
+        index = self.index(index)
+        base_len = len(self.base)
+        if index < base_len:
+            if index in self.overrides:
+                return self.overrides[index]
+            return self.base[index]
+        return self.tail[index - base_len]
+
+    def __setitem__(self, index, block):
+        index = self.index(index)
+        base_len = len(self.base)
+        if index < base_len:
+            self.overrides[index] = block
+        else:
+            self.tail[index - base_len] = block
+
+    def __delitem__(self, index):
+        index = self.index(index)
+        if index < len(self.base):
+            # rare, the file part is loaded completely
+            self.tail = list(self)
+            self.base = ()
+            self.overrides = {}
+        del self.tail[index - len(self.base)]
+
+    def __iter__(self):
+        overrides = self.overrides
+        for index in range(len(self.base)):
+            yield overrides[index] if index in overrides else self.base[index]
+        yield from self.tail
+
+    def append(self, block):
+        self.tail.append(block)
+
+    def extend(self, blocks):
+        self.tail.extend(blocks)
+
+
+class Program:
+    """list of gcode blocks with a single trailing program end.
+
+    revision changes whenever blocks are replaced, edited or removed
+    instead of appended, all changes are written to the journal (if set).
+    """
+
+    end = PROGRAM_END
+
+    def __init__(self, text=""):
+        self.blocks = BlockList()
+        self.revision = 0
+        self.journal = None
+        if text:
+            self.append(text)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def clear(self):
+        self.replace([])
+
+    def replace(self, blocks):
+        self.blocks = BlockList(tail=blocks)
+        self.revision += 1
+        if self.journal is not None:
+            self.journal.replace(self.blocks.tail)
+
+    def extend(self, blocks):
+        self.blocks.extend(blocks)
+        if self.journal is not None and blocks:
+            self.journal.append(blocks)
+
+    def append(self, code):
+        """append code to the program, returns the list of new blocks."""
+        blocks = parse_code(code)
+        self.extend(blocks)
+        return blocks
+
+    def set_block(self, index, text):
+        """replaces one block (manual edit), returns the cleaned block."""
+        block = clean_line(text.replace("\n", " "))
+        self.blocks[index] = block
+        self.revision += 1
+        if self.journal is not None:
+            self.journal.set_block(index, block)
+        return block
+
+    def delete_block(self, index):
+        del self.blocks[index]
+        self.revision += 1
+        if self.journal is not None:
+            self.journal.delete_block(index)
+
+    def load(self, text):
+        """replace the whole program (for example after manual edits)."""
+        self.replace(parse_code(text))
+
+    def view_text(self):
+        return "\n".join(list(self.blocks) + [PROGRAM_END])
+
+    def text(self):
+        return f"{self.view_text()}\n"
+
+
+def open_program(filename, joints=False, journal=None):
+    """loads an existing program or starts a new one with the initial code.
+
+    unsaved changes of a crashed session are recovered from the journal.
+    """
+    program = Program()
+    gcode = os.path.isfile(filename) and os.path.getsize(filename) > 0
+    if gcode:
+        # only the line index of the file is loaded,
+        # programm end (M02) is removed by the program model
+        program.blocks = BlockList(FileBlocks(filename))
+    else:
+        program.append(initial_code(joints))
+    if journal is not None:
+        recovered = journal.recover(program)
+        program.journal = journal
+        if recovered:
+            print(f"recovered {recovered} blocks from {journal.path}")
+            program.append("\n(recovered)")
+    if gcode:
+        program.append("\n(reopen)")
+    return program
+
+
+def initial_code(joints=False):
+    lines = [
+        "G21   (Metric/mm)",
+        "G40   (No Offsets)",
+        "G90   (Absolute-Mode)",
+        "M05   (Spindle off)",
+        "F1000 (Feedrate)",
+    ]
+    if joints:
+        # switch to joint mode
+        lines.append("M429")
+    return "\n".join(lines)
@@ -0,0 +1,135 @@
+#
+# continuous trajectory recording
+#
+#  samples the machine positions into a preallocated ring buffer,
+#  a second thread writes the buffer in chunks to disk
+#
+#  file format: float64 rows of (time, 9 world positions, 9 joint positions)
+#
+
+import threading
+import time
+
+import numpy
+
+AXIS_NAMES = ["X", "Y", "Z", "A", "B", "C", "U", "V", "W"]
+CHANNELS = len(AXIS_NAMES)
+COLUMNS = 1 + CHANNELS * 2
+COL_TIME = 0
+COLS_WORLD = slice(1, 1 + CHANNELS)
+COLS_JOINT = slice(1 + CHANNELS, 1 + CHANNELS * 2)
+
+
+class TrajectoryRecorder:
+    """records stat.position/stat.joint_position with a fixed rate."""
+
+    def __init__(self, stat, filename, rate=100.0, capacity=65536, chunk=4096):
+        self.stat = stat
+        self.filename = filename
+        self.period = 1.0 / rate
+        self.capacity = capacity
+        self.chunk = min(chunk, capacity // 2)
+        self.buffer = numpy.zeros((capacity, COLUMNS), dtype=numpy.float64)
+        self.head = 0
+        self.flushed = 0
+        self.late = 0
+        self.overruns = 0
+        self.stop_event = threading.Event()
+        self.flush_event = threading.Event()
+        self.sampler = threading.Thread(target=self.sample_loop, daemon=True)
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+
+    @property
+    def samples(self):
+        return self.head
+
+    def start(self):
+        self.fh = open(self.filename, "wb")
+        self.sampler.start()
+        self.writer.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.sampler.join()
+        self.flush_event.set()
+        self.writer.join()
+        self.fh.close()
+
+    def sample_loop(self):
+        buffer = self.buffer
+        capacity = self.capacity
+        chunk = self.chunk
+        period = self.period
+        stat = self.stat
+        perf_counter = time.perf_counter
+        start = time.time() - perf_counter()
+        next_tick = perf_counter()
+        while not self.stop_event.is_set():
+            try:
+                stat.poll()
+            except Exception as err:
+                print(f"can not poll linuxcnc: {err}")
+                self.stop_event.wait(0.5)
+                continue
+            now = perf_counter()
+            row = buffer[self.head % capacity]
+            row[COL_TIME] = start + now
+            row[COLS_WORLD] = stat.position[:CHANNELS]
+            row[COLS_JOINT] = stat.joint_position[:CHANNELS]
+            self.head += 1
+            if self.head - self.flushed > capacity:
+                # writer can not keep up, oldest samples are lost
+                self.overruns += 1
+            if self.head - self.flushed >= chunk:
+                self.flush_event.set()
+
+            next_tick += period
+            delay = next_tick - perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.late += 1
+                if delay < -period:
+                    next_tick = perf_counter()
+
+    def write_loop(self):
+        while True:
+            self.flush_event.wait()
+            self.flush_event.clear()
+            finished = self.stop_event.is_set() and not self.sampler.is_alive()
+            head = self.head
+            start = max(self.flushed, head - self.capacity)
+            while start < head:
+                begin = start % self.capacity
+                end = min(begin + head - start, self.capacity)
+                self.buffer[begin:end].tofile(self.fh)
+                start += end - begin
+            self.flushed = head
+            self.fh.flush()
+            if finished:
+                break
+
+
+def load_trajectory(filename):
+    """returns the recorded samples as (n, COLUMNS) array."""
+    return numpy.fromfile(filename, dtype=numpy.float64).reshape(-1, COLUMNS)
+
+
+def trajectory_to_gcode(positions, axes, offsets=None, digits=2):
+    """converts an (n, CHANNELS) position array into G0 blocks.
+
+    only the words of the given axes are written and only if they changed.
+    """
+    positions = numpy.asarray(positions)[:, axes]
+    if offsets is not None:
+        positions = positions - numpy.asarray(offsets)[axes]
+    positions = positions.round(digits)
+    names = [AXIS_NAMES[axis] for axis in axes]
+    changed = numpy.ones(positions.shape, dtype=bool)
+    changed[1:] = positions[1:] != positions[:-1]
+    lines = []
+    for row, mask in zip(positions.tolist(), changed.tolist()):
+        words = [f" {name}{value}" for name, value, flag in zip(names, row, mask) if flag]
+        if words:
+            lines.append("G0" + "".join(words))
+    return "\n".join(lines)
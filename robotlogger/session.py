@@ -0,0 +1,336 @@
+#
+# binary session log
+#
+#  one directory per session, one append-only raw file per column,
+#  every column can be memory mapped (numpy.memmap) for analysis.
+#  the gcode is generated from it on demand.
+#
+#  every row is an event: an added point, a verbatim block (pause,
+#  comment, its text in blocks.txt), a sample of a recorded trajectory
+#  or a reset (the rows before it belong to a discarded program)
+#
+
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy
+
+from .capture import JOINT_OFFSETS, Capture
+from .outputs import CHANNELS, OutputState
+from .recorder import trajectory_to_gcode
+from .status import Snapshot
+
+VERSION = 2
+AXES = 9
+EVENT_POINT = 0
+EVENT_BLOCK = 1
+EVENT_PATH = 2
+EVENT_RESET = 3
+# name: (dtype, values per row)
+COLUMNS = {
+    "time": ("<f8", 1),
+    "world": ("<f8", AXES),
+    "joint": ("<f8", AXES),
+    "aout": ("<f8", CHANNELS),
+    "dout": ("<u8", 1),
+    "mode": ("<u1", 1),
+    "snap": ("<u2", 1),
+    "event": ("<u1", 1),
+    # offset and length of the block text in blocks.txt
+    "text": ("<u8", 2),
+}
+# not in version 1 sessions, zero there
+ADDED_COLUMNS = ("event", "text")
+TEXT_FILE = "blocks.txt"
+
+
+def session_path(filename):
+    return f"{filename}.session"
+
+
+def row_from_status(status, mode, snapped, world=None, snap_positions=None):
+    """session values of a snapshot, positions without offsets.
+
+    world replaces the world positions of the snapshot (forward kinematics in joint mode),
+    snap_positions (capture.pos_w) the snapped axes, so the session has the logged values.
+    """
+    if world is None:
+        world = [
+            pos - status.g5x_offset[n] - status.g92_offset[n]
+            for n, pos in enumerate(status.position[:AXES])
+        ]
+    else:
+        world = list(world[:AXES])
+    world = world + [0.0] * (AXES - len(world))
+    if snap_positions is not None:
+        for n, flag in enumerate(snapped[:AXES]):
+            if flag and snap_positions[n] is not None:
+                world[n] = snap_positions[n]
+    joint = [
+        pos - JOINT_OFFSETS[n] - status.g92_offset[n]
+        for n, pos in enumerate(status.joint_position[:AXES])
+    ]
+    dout = 0
+    for n, value in enumerate(status.dout[:CHANNELS]):
+        if value:
+            dout |= 1 << n
+    snap = 0
+    for n, flag in enumerate(snapped[:AXES]):
+        if flag:
+            snap |= 1 << n
+    return {
+        "time": status.time,
+        "world": world,
+        "joint": joint,
+        "aout": status.aout[:CHANNELS],
+        "dout": dout,
+        "mode": int(mode or 0),
+        "snap": snap,
+    }
+
+
+def complete_rows(path, columns=COLUMNS):
+    """number of complete rows of the column files (a crash can leave a partly written row)."""
+    sizes = []
+    for name in columns:
+        dtype, width = COLUMNS[name]
+        filename = os.path.join(path, f"{name}.bin")
+        row_size = numpy.dtype(dtype).itemsize * width
+        sizes.append(os.path.getsize(filename) // row_size if os.path.isfile(filename) else 0)
+    return min(sizes)
+
+
+def empty_row(timestamp, mode=0):
+    """row without positions and outputs (events)."""
+    return {
+        "time": timestamp,
+        "world": [0.0] * AXES,
+        "joint": [0.0] * AXES,
+        "aout": [0.0] * CHANNELS,
+        "dout": 0,
+        "mode": int(mode or 0),
+        "snap": 0,
+    }
+
+
+class SessionWriter:
+    """appends rows to the column files of a session directory."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_file = os.path.join(path, "meta.json")
+        if os.path.isfile(meta_file):
+            meta = json.load(open(meta_file, "r"))
+            if meta.get("version") == 1:
+                self.upgrade(meta, meta_file)
+            elif meta.get("version") != VERSION:
+                raise ValueError(f"unsupported session version: {meta.get('version')}")
+        else:
+            meta = {
+                "version": VERSION,
+                "created": datetime.now().isoformat(),
+            }
+            self.write_meta(meta, meta_file)
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "ab") for name in COLUMNS}
+        self.text_file = open(os.path.join(path, TEXT_FILE), "ab")
+
+    def write_meta(self, meta, meta_file):
+        meta["version"] = VERSION
+        meta["columns"] = {name: list(spec) for name, spec in COLUMNS.items()}
+        json.dump(meta, open(meta_file, "w"), indent=2)
+
+    def upgrade(self, meta, meta_file):
+        """adds the event/text columns (zero: points) to a version 1 session."""
+        rows = complete_rows(self.path, [name for name in COLUMNS if name not in ADDED_COLUMNS])
+        for name in ADDED_COLUMNS:
+            dtype, width = COLUMNS[name]
+            with open(os.path.join(self.path, f"{name}.bin"), "wb") as fh:
+                fh.write(numpy.zeros(rows * width, dtype=dtype).tobytes())
+        self.write_meta(meta, meta_file)
+
+    def append(self, row, event=EVENT_POINT, text=None):
+        """appends one row, text is the gcode of a block event."""
+        row = dict(row, event=event, text=(0, 0))
+        if text is not None:
+            data = text.encode()
+            self.text_file.write(data)
+            self.text_file.flush()
+            row["text"] = (self.text_file.tell() - len(data), len(data))
+        for name, (dtype, width) in COLUMNS.items():
+            value = numpy.asarray(row[name], dtype=dtype)
+            if value.size != width:
+                raise ValueError(f"session column {name}: {value.size} values, expected {width}")
+            self.files[name].write(value.tobytes())
+        for fh in self.files.values():
+            fh.flush()
+
+    def append_block(self, text, mode=0):
+        """a verbatim gcode block (pause, comment)."""
+        self.append(empty_row(time.time(), mode), EVENT_BLOCK, text)
+
+    def append_path(self, times, world, joint, mode=0):
+        """the samples (n, AXES) of a recorded trajectory, positions without offsets."""
+        count = len(times)
+        columns = {
+            "time": numpy.asarray(times),
+            "world": numpy.asarray(world),
+            "joint": numpy.asarray(joint),
+            "aout": numpy.zeros((count, CHANNELS)),
+            "dout": numpy.zeros(count),
+            "mode": numpy.full(count, int(mode or 0)),
+            "snap": numpy.zeros(count),
+            "event": numpy.full(count, EVENT_PATH),
+            "text": numpy.zeros((count, 2)),
+        }
+        for name, (dtype, width) in COLUMNS.items():
+            value = numpy.ascontiguousarray(columns[name], dtype=dtype)
+            if value.size != count * width:
+                raise ValueError(f"session column {name}: {value.size} values, expected {width}")
+            self.files[name].write(value.tobytes())
+        for fh in self.files.values():
+            fh.flush()
+
+    def reset(self):
+        """starts a new segment, the program before it is discarded."""
+        self.append(empty_row(time.time()), EVENT_RESET)
+
+    def close(self):
+        for fh in self.files.values():
+            fh.close()
+        self.text_file.close()
+
+
+class SessionReader:
+    """memory mapped columns of a session."""
+
+    def __init__(self, path):
+        self.path = path
+        # version 1 sessions have no event/text columns
+        names = [
+            name
+            for name in COLUMNS
+            if name not in ADDED_COLUMNS or os.path.isfile(os.path.join(path, f"{name}.bin"))
+        ]
+        self.rows = complete_rows(path, names)
+        self.columns = {}
+        for name, (dtype, width) in COLUMNS.items():
+            if self.rows == 0 or name not in names:
+                shape = (self.rows, width) if width > 1 else (self.rows,)
+                self.columns[name] = numpy.zeros(shape, dtype=dtype)
+                continue
+            shape = (self.rows, width) if width > 1 else (self.rows,)
+            self.columns[name] = numpy.memmap(
+                os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=shape
+            )
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def text(self, index):
+        """gcode of a block event."""
+        offset, length = (int(value) for value in self.columns["text"][index])
+        with open(os.path.join(self.path, TEXT_FILE), "rb") as fh:
+            fh.seek(offset)
+            return fh.read(length).decode()
+
+    def between(self, start, end):
+        """row slice of the time range [start, end)."""
+        times = self.columns["time"]
+        return slice(
+            int(numpy.searchsorted(times, start, side="left")),
+            int(numpy.searchsorted(times, end, side="left")),
+        )
+
+    def snapshots(self, rows=slice(None)):
+        """yields the rows as Snapshot (positions without offsets)."""
+        columns = self.columns
+        for index in range(*rows.indices(self.rows)):
+            dout_bits = int(columns["dout"][index])
+            aout = columns["aout"][index].tolist()
+            yield index, Snapshot(
+                time=float(columns["time"][index]),
+                position=tuple(columns["world"][index].tolist()),
+                joint_position=tuple(
+                    value + JOINT_OFFSETS[n]
+                    for n, value in enumerate(columns["joint"][index].tolist())
+                ),
+                axis_active=(True,) * AXES,
+                g5x_offset=(0.0,) * AXES,
+                g92_offset=(0.0,) * AXES,
+                aout=tuple(aout),
+                dout=tuple((dout_bits >> n) & 1 for n in range(CHANNELS)),
+                estop=0,
+                enabled=True,
+                homed=(),
+                joints=AXES,
+                interp_state=0,
+            )
+
+
+def session_to_gcode(
+    reader,
+    joints=False,
+    world_axes=(0, 1, 2),
+    joint_axes=range(AXES),
+    aout_channels="0-2,4-63",
+    dout_channels="0-2,4-63",
+    snap=None,
+    rows=slice(None),
+    kinematics=None,
+    dedup=None,
+):
+    """generates the logger gcode of a session with the given settings."""
+    capture = Capture(
+        joints=joints,
+        world_axes=world_axes,
+        joint_axes=joint_axes,
+        outputs=OutputState(aout_channels, dout_channels),
+        kinematics=kinematics,
+        dedup=dedup,
+    )
+    if snap is not None:
+        capture.snap = snap
+    events = reader["event"]
+    gcode = []
+    path = []
+
+    def add_path():
+        if joints or reader["mode"][path[0]] == 1:
+            positions = reader["joint"][path]
+            axes = sorted(capture.joint_axes)
+            last_pos = capture.last_pos_j
+        else:
+            positions = reader["world"][path]
+            axes = sorted(capture.world_axes)
+            last_pos = capture.last_pos_w
+        path.clear()
+        lines = trajectory_to_gcode(positions, axes) if axes else ""
+        if lines:
+            gcode.append(f"\n{lines}")
+            # later points continue from the last recorded position
+            for n in axes:
+                last_pos[n] = round(float(positions[-1][n]), 2)
+
+    for index, status in reader.snapshots(rows):
+        event = int(events[index])
+        if path and event != EVENT_PATH:
+            add_path()
+        if event == EVENT_RESET:
+            # the program was discarded
+            gcode = []
+            capture.reset()
+        elif event == EVENT_BLOCK:
+            gcode.append(reader.text(index))
+        elif event == EVENT_PATH:
+            path.append(index)
+        else:
+            gcode.append(capture.record(status))
+    if path:
+        add_path()
+    return "".join(gcode)
@@ -0,0 +1,146 @@
+#
+# path simplification (Ramer-Douglas-Peucker)
+#
+#  a path can be simplified in several spaces at once (world and joints),
+#  a point is only removed if it is inside the tolerance in every space
+#
+
+import numpy
+
+from .gcode import format_motion, motion_words, parse_words
+
+
+def segment_distances(points, starts, ends, owner, indices):
+    """squared distances of points[indices] to the line points[starts] - points[ends] of their segment (owner)."""
+    origin = points[starts]
+    direction = points[ends] - origin
+    length = numpy.sqrt(numpy.einsum("ij,ij->i", direction, direction))
+    direction = direction / numpy.where(length == 0.0, 1.0, length)[:, None]
+    # take is much faster than fancy indexing for the large arrays
+    vectors = numpy.take(points, indices, axis=0) - numpy.take(origin, owner, axis=0)
+    squared = numpy.einsum("ij,ij->i", vectors, vectors)
+    projected = numpy.einsum("ij,ij->i", vectors, numpy.take(direction, owner, axis=0))
+    rest = numpy.maximum(squared - projected * projected, 0.0)
+    # zero length segment: distance to the point
+    return numpy.where(numpy.take(length, owner) == 0.0, squared, rest)
+
+
+def simplify(*spaces):
+    """Ramer-Douglas-Peucker over (points, tolerance) pairs of equal length.
+
+    returns a boolean mask of the points to keep, first and last are always kept.
+    all segments of one recursion level are split in one numpy pass.
+    """
+    spaces = [
+        (numpy.asarray(points, dtype=numpy.float64), float(tolerance))
+        for points, tolerance in spaces
+    ]
+    count = len(spaces[0][0])
+    keep = numpy.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    starts = numpy.array([0])
+    ends = numpy.array([count - 1])
+    while True:
+        inner = ends - starts - 1
+        wide = inner > 0
+        starts, ends, inner = starts[wide], ends[wide], inner[wide]
+        if len(starts) == 0:
+            break
+        # inner point indices of all segments, owner is their segment
+        offsets = numpy.cumsum(inner) - inner
+        owner = numpy.repeat(numpy.arange(len(starts)), inner)
+        indices = numpy.arange(len(owner)) + numpy.take(starts - offsets + 1, owner)
+
+        ratio = None
+        for points, tolerance in spaces:
+            distances = segment_distances(points, starts, ends, owner, indices)
+            if tolerance > 0.0:
+                distances = distances / (tolerance * tolerance)
+            else:
+                distances = numpy.where(distances > 0.0, numpy.inf, 0.0)
+            ratio = distances if ratio is None else numpy.maximum(ratio, distances)
+
+        # first point with the largest distance of every segment
+        largest = numpy.maximum.reduceat(ratio, offsets)
+        candidates = numpy.flatnonzero(ratio == numpy.take(largest, owner))
+        segments = owner[candidates]
+        first = numpy.ones(len(candidates), dtype=bool)
+        first[1:] = segments[1:] != segments[:-1]
+        split = indices[candidates[first]]
+        outside = largest > 1.0
+        split, starts, ends = split[outside], starts[outside], ends[outside]
+        keep[split] = True
+        starts = numpy.concatenate((starts, split))
+        ends = numpy.concatenate((split, ends))
+    return keep
+
+
+def simplify_program(blocks, world_tolerance, joint_tolerance, joints=False):
+    """simplifies runs of G0 blocks of a logged program.
+
+    comments directly in front of a removed G0 block are removed with it,
+    every other block ends a run and is kept untouched.
+    returns (new_blocks, removed_blocks).
+    """
+    result = []
+    removed = 0
+    position = {}
+    base = {}
+    run = []  # (leading_comments, block, full position)
+
+    def flush_run():
+        nonlocal removed
+        if len(run) > 2:
+            axes = sorted(set().union(*(entry[2].keys() for entry in run)))
+            points = [[entry[2].get(axis, 0.0) for axis in axes] for entry in run]
+            tolerance = joint_tolerance if joints else world_tolerance
+            keep = simplify((points, tolerance))
+            last = base
+            for entry, flag in zip(run, keep):
+                if not flag:
+                    removed += len(entry[0]) + 1
+                    continue
+                result.extend(entry[0])
+                changed = [
+                    axis
+                    for axis in axes
+                    if axis in entry[2] and entry[2][axis] != last.get(axis)
+                ]
+                result.append(
+                    format_motion(changed, [entry[2][axis] for axis in changed])
+                )
+                last = entry[2]
+        else:
+            for entry in run:
+                result.extend(entry[0])
+                result.append(entry[1])
+        run.clear()
+
+    comments = []
+    for block in blocks:
+        words = parse_words(block)
+        if not words:
+            comments.append(block)
+            continue
+        axes = motion_words(words)
+        if axes is None:
+            flush_run()
+            result.extend(comments)
+            comments = []
+            result.append(block)
+            for letter, value in words:
+                if letter == "M" and value in {428, 429}:
+                    # coordinates change their meaning
+                    joints = value == 429
+                    position = {}
+            continue
+        if not run:
+            base = dict(position)
+        position.update(axes)
+        run.append((comments, block, dict(position)))
+        comments = []
+    flush_run()
+    result.extend(comments)
+    return result, removed
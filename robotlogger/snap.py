@@ -0,0 +1,109 @@
+#
+# snap positions
+#
+#  per axis values are kept sorted (bisect lookup),
+#  xyz points are kept in a kd-tree
+#
+
+import bisect
+import math
+
+
+def parse_values(text):
+    values = []
+    for token in text.replace(",", " ").split():
+        try:
+            values.append(float(token))
+        except ValueError:
+            pass
+    return sorted(set(values))
+
+
+def parse_points(text):
+    """'x,y,z x,y,z ...' -> list of (x, y, z)."""
+    points = []
+    for token in text.split():
+        try:
+            point = tuple(float(value) for value in token.split(","))
+        except ValueError:
+            continue
+        if len(point) == 3:
+            points.append(point)
+    return points
+
+
+class KDTree:
+    """static kd-tree for nearest neighbour lookups."""
+
+    def __init__(self, points):
+        self.nodes = []
+        self.root = self.build(list(points), 0)
+
+    def build(self, points, depth):
+        if not points:
+            return -1
+        axis = depth % 3
+        points.sort(key=lambda point: point[axis])
+        middle = len(points) // 2
+        index = len(self.nodes)
+        self.nodes.append([points[middle], axis, -1, -1])
+        self.nodes[index][2] = self.build(points[:middle], depth + 1)
+        self.nodes[index][3] = self.build(points[middle + 1 :], depth + 1)
+        return index
+
+    def nearest(self, target):
+        """returns (point, distance) of the nearest point or (None, inf)."""
+        best = [None, math.inf]
+        stack = [self.root]
+        while stack:
+            index = stack.pop()
+            if index < 0:
+                continue
+            point, axis, left, right = self.nodes[index]
+            distance = math.dist(point, target)
+            if distance < best[1]:
+                best = [point, distance]
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            if abs(diff) < best[1]:
+                stack.append(far)
+            stack.append(near)
+        return best[0], best[1]
+
+
+class SnapIndex:
+    """compiled snap values, rebuilt only when the texts change."""
+
+    def __init__(self, tolerance=5.0):
+        self.tolerance = tolerance
+        self.values = {}
+        self.points = KDTree(())
+
+    def set_values(self, axis, text):
+        self.values[axis] = parse_values(text)
+
+    def set_points(self, text):
+        self.points = KDTree(parse_points(text))
+
+    def nearest(self, axis, position):
+        """returns the nearest snap value of the axis or None."""
+        values = self.values.get(axis)
+        if not values:
+            return None
+        index = bisect.bisect_left(values, position)
+        candidates = values[max(index - 1, 0) : index + 1]
+        return min(candidates, key=lambda value: abs(value - position))
+
+    def snap(self, axis, position):
+        """returns (position, snapped)."""
+        value = self.nearest(axis, position)
+        if value is not None and abs(value - position) <= self.tolerance:
+            return value, True
+        return position, False
+
+    def snap_point(self, position):
+        """returns the nearest xyz snap point inside the tolerance or None."""
+        point, distance = self.points.nearest(position)
+        if distance <= self.tolerance:
+            return point
+        return None
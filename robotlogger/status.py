@@ -0,0 +1,120 @@
+#
+# linuxcnc status snapshots and background polling
+#
+
+import threading
+import time
+from typing import NamedTuple
+
+from .profile import Profiler
+
+
+class Snapshot(NamedTuple):
+    """immutable copy of the linuxcnc.stat values used by the logger."""
+
+    time: float
+    position: tuple
+    joint_position: tuple
+    axis_active: tuple
+    g5x_offset: tuple
+    g92_offset: tuple
+    aout: tuple
+    dout: tuple
+    estop: int
+    enabled: bool
+    homed: tuple
+    joints: int
+    interp_state: int
+
+
+def axis_active(axis):
+    # axis without limits are not configured
+    return axis["min_position_limit"] != 0 and axis["max_position_limit"] != 0
+
+
+def snapshot(stat):
+    """poll the stat object and copy the values into a Snapshot."""
+    stat.poll()
+    return Snapshot(
+        time=time.time(),
+        position=tuple(stat.position),
+        joint_position=tuple(stat.joint_position),
+        axis_active=tuple(axis_active(axis) for axis in stat.axis),
+        g5x_offset=tuple(stat.g5x_offset),
+        g92_offset=tuple(stat.g92_offset),
+        aout=tuple(stat.aout),
+        dout=tuple(stat.dout),
+        estop=stat.estop,
+        enabled=stat.enabled,
+        homed=tuple(stat.homed),
+        joints=stat.joints,
+        interp_state=stat.interp_state,
+    )
+
+
+def is_moving(old, new):
+    if old is None:
+        return True
+    return old.position != new.position or old.joint_position != new.joint_position
+
+
+class StatusPoller(threading.Thread):
+    """polls linuxcnc in its own thread and hands every snapshot to callback.
+
+    polls with fast_interval while the machine moves and for hold seconds
+    afterwards, with idle_interval otherwise.
+    publisher (StatusPublisher) gets every polled stat for other subscribers.
+    """
+
+    def __init__(
+        self,
+        stat,
+        callback,
+        fast_interval=0.05,
+        idle_interval=0.5,
+        hold=1.0,
+        profiler=None,
+        publisher=None,
+    ):
+        super().__init__(daemon=True)
+        self.stat = stat
+        self.callback = callback
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.hold = hold
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.publisher = publisher
+        self.latest = None
+        self.last_error = None
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        last_move = 0.0
+        interval = 0.0
+        while not self.stop_event.is_set():
+            self.profiler.tick("poll", interval)
+            try:
+                with self.profiler.stage("poll"):
+                    snap = snapshot(self.stat)
+            except Exception as err:
+                if str(err) != self.last_error:
+                    print(f"can not poll linuxcnc: {err}")
+                    self.last_error = str(err)
+                interval = self.idle_interval
+                self.stop_event.wait(interval)
+                continue
+            self.last_error = None
+            if self.publisher is not None:
+                self.publisher.publish(self.stat)
+            if is_moving(self.latest, snap):
+                last_move = snap.time
+            self.latest = snap
+            self.callback(snap)
+            if snap.time - last_move < self.hold:
+                interval = self.fast_interval
+            else:
+                interval = self.idle_interval
+            self.stop_event.wait(interval)
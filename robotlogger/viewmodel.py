@@ -0,0 +1,73 @@
+#
+# view model of the position display
+#
+#  builds the wanted (text, style) of every display widget and
+#  returns only what differs from the last shown state
+#
+
+from .capture import AXIS_NAMES
+
+
+def build_view(capture, status, pulse):
+    """returns {key: (text, style)} for the labels and coordinate fields."""
+    view = {}
+    if capture.mode == 0:
+        view["mode_world"] = (f"World: (ACTIVE) {pulse}", "active")
+        view["mode_joint"] = (f"Joint: {pulse}", "passive")
+    elif capture.mode == 1:
+        view["mode_world"] = ("World:", "inactive")
+        view["mode_joint"] = (f"Joint: (ACTIVE) {pulse}", "active")
+
+    for n, _pos in enumerate(status.joint_position):
+        if n >= len(status.axis_active):
+            break
+        if n not in capture.joint_axes:
+            view[f"J_{AXIS_NAMES[n]}"] = ("", "normal")
+        elif status.axis_active[n]:
+            view[f"J_{AXIS_NAMES[n]}"] = (f"{capture.pos_j[n]}", "normal")
+
+    if not capture.joint_mode():
+        for n, _pos in enumerate(status.position):
+            if n not in capture.world_axes:
+                view[f"W_{AXIS_NAMES[n]}"] = ("", "normal")
+            elif status.axis_active[n]:
+                if capture.pos_ws[n]:
+                    view[f"W_{AXIS_NAMES[n]}"] = (
+                        f"{capture.pos_wr[n]} ({capture.pos_w[n]})",
+                        "snapped",
+                    )
+                else:
+                    view[f"W_{AXIS_NAMES[n]}"] = (f"{capture.pos_w[n]}", "normal")
+    elif capture.kinematics is not None:
+        # calculated by forward kinematics
+        for n, _pos in enumerate(status.position):
+            if n not in capture.world_axes or capture.pos_w[n] is None:
+                view[f"W_{AXIS_NAMES[n]}"] = ("", "normal")
+            else:
+                view[f"W_{AXIS_NAMES[n]}"] = (f"{capture.pos_w[n]}", "passive")
+    return view
+
+
+class ViewModel:
+    """remembers what is shown and diffs new views against it."""
+
+    def __init__(self):
+        self.texts = {}
+        self.styles = {}
+
+    def clear(self):
+        self.texts = {}
+        self.styles = {}
+
+    def diff(self, view):
+        """returns ({key: text}, {key: style}) of the changed widgets."""
+        texts = {}
+        styles = {}
+        for key, (text, style) in view.items():
+            if self.texts.get(key) != text:
+                self.texts[key] = text
+                texts[key] = text
+            if self.styles.get(key) != style:
+                self.styles[key] = style
+                styles[key] = style
+        return texts, styles
@@ -0,0 +1,167 @@
+#
+# reachable workspace of a genserkins robot
+#
+#  monte carlo samples of the joint space within the joint limits,
+#  the tool positions (batch forward kinematics in a process pool) are
+#  reduced to voxels in the workers, only new voxels are handed on, so
+#  the point cloud grows progressively and stays small
+#
+
+import configparser
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy
+
+CHUNK_SIZE = 1 << 18
+VOXEL_SIZE = 10.0
+# used if the INI has no limits for a joint (degrees)
+DEFAULT_LIMIT = 180.0
+# voxel indices packed into one int64, 21 bits per axis
+KEY_BITS = 21
+KEY_OFFSET = 1 << (KEY_BITS - 1)
+KEY_MASK = (1 << KEY_BITS) - 1
+
+
+def read_joint_limits(path, joints):
+    """(lower, upper) of the [JOINT_<n>] MIN_LIMIT/MAX_LIMIT of a LinuxCNC INI."""
+    ini = configparser.ConfigParser(
+        strict=False, interpolation=None, inline_comment_prefixes=("#", ";")
+    )
+    ini.read(path)
+
+    def values(key, default):
+        result = []
+        for joint in range(joints):
+            try:
+                result.append(float(ini.get(f"JOINT_{joint}", key)))
+            except (configparser.Error, ValueError):
+                result.append(default)
+        return numpy.array(result)
+
+    return values("MIN_LIMIT", -DEFAULT_LIMIT), values("MAX_LIMIT", DEFAULT_LIMIT)
+
+
+def voxel_keys(positions, voxel):
+    """unique voxel keys of positions (n, 3)."""
+    indices = numpy.floor(positions / voxel).astype(numpy.int64) + KEY_OFFSET
+    indices = numpy.clip(indices, 0, KEY_MASK)
+    return numpy.unique(
+        (indices[:, 0] << (2 * KEY_BITS)) | (indices[:, 1] << KEY_BITS) | indices[:, 2]
+    )
+
+
+def voxel_centers(keys, voxel):
+    """positions (n, 3) of voxel keys."""
+    keys = numpy.asarray(keys, dtype=numpy.int64)
+    indices = numpy.stack(
+        ((keys >> (2 * KEY_BITS)) & KEY_MASK, (keys >> KEY_BITS) & KEY_MASK, keys & KEY_MASK),
+        axis=1,
+    )
+    return (indices - KEY_OFFSET + 0.5) * voxel
+
+
+def sample_chunk(kinematics, lower, upper, count, seed, voxel):
+    """voxel keys of the tool positions of count random joint vectors (worker)."""
+    rng = numpy.random.default_rng(seed)
+    joints = rng.uniform(lower, upper, (count, len(lower)))
+    return voxel_keys(kinematics.positions(joints), voxel)
+
+
+class WorkspaceSampler(threading.Thread):
+    """samples the workspace in the background.
+
+    callback(points) gets the centers of new voxels, finished() is called
+    at the end (also after stop).
+    """
+
+    def __init__(
+        self,
+        kinematics,
+        lower,
+        upper,
+        samples,
+        callback,
+        finished=None,
+        voxel=VOXEL_SIZE,
+        workers=None,
+        chunk=CHUNK_SIZE,
+        seed=None,
+    ):
+        super().__init__(daemon=True)
+        self.kinematics = kinematics
+        self.lower = numpy.asarray(lower, dtype=float)
+        self.upper = numpy.asarray(upper, dtype=float)
+        self.samples = samples
+        self.callback = callback
+        self.finished = finished
+        self.voxel = voxel
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk = chunk
+        self.seed = seed
+        self.done = 0
+        # sorted keys of the voxels handed on
+        self.voxels = numpy.empty(0, dtype=numpy.int64)
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        try:
+            self.sample()
+        except Exception as err:
+            print(f"workspace: {err}")
+        if self.finished is not None:
+            self.finished()
+
+    def sample(self):
+        counts = [
+            min(self.chunk, self.samples - start) for start in range(0, self.samples, self.chunk)
+        ]
+        jobs = iter(zip(counts, numpy.random.SeedSequence(self.seed).spawn(len(counts))))
+        # no fork of a process with running (qt/sampler) threads
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver")
+        )
+        pending = {}
+        try:
+            while True:
+                # a few chunks per worker in flight, bounds the memory
+                while not self.stop_event.is_set() and len(pending) < 2 * self.workers:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    count, seed = job
+                    future = pool.submit(
+                        sample_chunk,
+                        self.kinematics,
+                        self.lower,
+                        self.upper,
+                        count,
+                        seed,
+                        self.voxel,
+                    )
+                    pending[future] = count
+                if not pending or self.stop_event.is_set():
+                    break
+                finished, _pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self.done += pending.pop(future)
+                    fresh = self.add_voxels(future.result())
+                    if len(fresh) and not self.stop_event.is_set():
+                        self.callback(voxel_centers(fresh, self.voxel))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def add_voxels(self, keys):
+        """the keys (unique, sorted) that are new, they are added to the seen voxels."""
+        positions = numpy.searchsorted(self.voxels, keys)
+        seen = numpy.zeros(len(keys), dtype=bool)
+        inside = positions < len(self.voxels)
+        seen[inside] = self.voxels[positions[inside]] == keys[inside]
+        fresh = keys[~seen]
+        self.voxels = numpy.insert(self.voxels, positions[~seen], fresh)
+        return fresh
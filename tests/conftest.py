@@ -0,0 +1,31 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# the repository root, robotlogger is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_status(position=(0.0, 0.0, 0.0), joints=None, mode=0.0, timestamp=0.0, axes=3):
+    """snapshot like status of the first axes axes, joints default to position, mode is aout[3]."""
+    position = list(position) + [0.0] * (9 - len(position))
+    joints = position if joints is None else list(joints) + [0.0] * (9 - len(joints))
+    aout = [0.0] * 64
+    aout[3] = mode
+    return SimpleNamespace(
+        time=timestamp,
+        aout=aout,
+        dout=[0] * 64,
+        axis_active=[True] * axes + [False] * (9 - axes),
+        position=position,
+        joint_position=joints,
+        g5x_offset=[0.0] * 9,
+        g92_offset=[0.0] * 9,
+    )
+
+
+@pytest.fixture
+def status():
+    return make_status
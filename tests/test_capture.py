@@ -0,0 +1,20 @@
+from robotlogger.capture import Capture
+from robotlogger.dedup import Deduplicator
+
+
+def test_reset_then_add_records_the_start_pose(status):
+    capture = Capture(dedup=Deduplicator(world_tolerance=0.5, mode="any"))
+    assert "X10.0 Y20.0 Z30.0" in capture.record(status((10.0, 20.0, 30.0)))
+
+    capture.reset()
+    gcode = capture.record(status((10.0, 20.0, 30.0)))
+    assert "G0 X10.0 Y20.0 Z30.0" in gcode
+
+
+def test_joint_moves_are_kept_after_the_switch_to_joint_mode(status):
+    # pos_w keeps the last world position in joint mode without kinematics
+    capture = Capture(dedup=Deduplicator(world_tolerance=0.5))
+    assert capture.record(status((10.0, 20.0, 30.0)))
+    for angle in (10.0, 20.0, 30.0):
+        gcode = capture.record(status((10.0, 20.0, 30.0), joints=(angle, 0.0, 0.0), mode=1.0))
+        assert f" X{angle}" in gcode
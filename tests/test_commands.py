@@ -0,0 +1,64 @@
+import time
+
+from robotlogger.backend import FakeLinuxCNC
+from robotlogger.commands import CANCELLED, DONE, TIMEOUT, CommandQueue
+
+
+class SlowCommand:
+    """linuxcnc.command stand-in, a mdi motion takes duration seconds."""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.finish = 0.0
+        self.calls = []
+
+    def mode(self, mode):
+        self.calls.append("mode")
+
+    def mdi(self, block):
+        self.calls.append("mdi")
+        self.finish = time.monotonic() + self.duration
+
+    def abort(self):
+        self.calls.append("abort")
+
+    def wait_complete(self, timeout):
+        remaining = self.finish - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return -1
+        time.sleep(max(remaining, 0.0))
+        return FakeLinuxCNC.RCS_DONE
+
+
+def run(command, **options):
+    commands = CommandQueue(command, FakeLinuxCNC, timeout=0.2, **options)
+    commands.start()
+    return commands
+
+
+def test_long_motion_is_not_limited_by_the_request_timeout():
+    command = SlowCommand(0.5)
+    request = run(command).mdi("G0 X100")
+    assert request.wait(5.0)
+    assert request.state == DONE
+    assert "abort" not in command.calls
+
+
+def test_motion_timeout_is_reported_without_abort():
+    command = SlowCommand(1.0)
+    request = run(command, motion_timeout=0.2).mdi("G0 X100")
+    assert request.wait(5.0)
+    assert request.state == TIMEOUT
+    assert "abort" not in command.calls
+
+
+def test_cancel_aborts_the_motion():
+    command = SlowCommand(5.0)
+    commands = run(command)
+    request = commands.mdi("G0 X100")
+    time.sleep(0.3)
+    commands.cancel_all()
+    assert request.wait(5.0)
+    assert request.state == CANCELLED
+    assert command.calls[-1] == "abort"
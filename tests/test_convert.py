@@ -0,0 +1,33 @@
+import numpy
+
+from robotlogger.convert import convert_program
+from robotlogger.gcode import motion_words, parse_words
+from robotlogger.kinematics import DEFAULT_HAL, GenSerKins
+
+BLOCKS = ["M429 (JOINT-COORDS)", "G0 X0.0 Y0.0 Z0.0 A0.0 B0.0 C0.0", "G0 X10.0 Y5.0 Z-5.0"]
+
+
+def world_poses(blocks):
+    poses = []
+    current = {}
+    for block in blocks:
+        axes = motion_words(parse_words(block))
+        if axes:
+            current.update(axes)
+            poses.append([current.get(axis, 0.0) for axis in range(6)])
+    return numpy.array(poses)
+
+
+def test_offsets_are_subtracted():
+    kinematics = GenSerKins.from_hal(DEFAULT_HAL)
+    machine, _report = convert_program(BLOCKS, kinematics, workers=1)
+    offsets = [100.0, -20.0, 5.0, 0.0, 0.0, 0.0]
+    shifted, report = convert_program(BLOCKS, kinematics, workers=1, offsets=offsets)
+    assert numpy.allclose(world_poses(machine) - offsets, world_poses(shifted), atol=0.011)
+    assert report["max_position_deviation"] < 0.1
+
+
+def test_no_negative_zero_words():
+    kinematics = GenSerKins.from_hal(DEFAULT_HAL)
+    blocks, _report = convert_program(BLOCKS, kinematics, workers=1)
+    assert not any("-0.0 " in f"{block} " for block in blocks)
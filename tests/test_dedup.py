@@ -0,0 +1,26 @@
+import numpy
+
+from robotlogger.dedup import Deduplicator
+
+
+def loop_mask(dedup, world, joint):
+    keep = [not dedup.duplicate(w, j) for w, j in zip(world.tolist(), joint.tolist())]
+    if keep:
+        keep[-1] = True
+    return numpy.array(keep, dtype=bool)
+
+
+def test_previous_mask_matches_the_sample_loop():
+    rng = numpy.random.default_rng(0)
+    for _trial in range(50):
+        count = int(rng.integers(1, 300))
+        # stops and moves
+        steps = rng.normal(scale=rng.choice([0.01, 0.3, 2.0]), size=(count, 3))
+        world = (steps * (rng.random((count, 1)) < 0.5)).cumsum(axis=0)
+        joint = rng.normal(scale=0.2, size=(count, 6)).cumsum(axis=0)
+        for tolerances in ((0.5, 0.0), (0.0, 0.3), (0.5, 0.3)):
+            vectorized = Deduplicator(*tolerances)
+            reference = Deduplicator(*tolerances)
+            assert (vectorized.mask(world, joint) == loop_mask(reference, world, joint)).all()
+            assert vectorized.skipped == reference.skipped
+            assert vectorized.poses == reference.poses
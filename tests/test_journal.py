@@ -0,0 +1,115 @@
+import os
+
+from robotlogger.journal import Journal, ProgramFile, file_state
+from robotlogger.program import Program, open_program
+
+
+def test_close_writes_everything_queued(tmp_path):
+    filename = str(tmp_path / "test.ngc")
+    journal = Journal(filename)
+    journal.append(["G0 X1", "G0 X2"])
+    journal.set_block(0, "G0 X3")
+    journal.close()
+
+    program = Program()
+    assert Journal(filename).recover(program) == 3
+    assert program.blocks[-2:] == ["G0 X3", "G0 X2"]
+
+
+def test_clear_removes_the_journal(tmp_path):
+    filename = str(tmp_path / "test.ngc")
+    journal = Journal(filename)
+    journal.append(["G0 X1"])
+    journal.clear()
+    journal.close()
+    assert not os.path.exists(f"{filename}.journal")
+
+
+def test_recover_replays_all_operations(tmp_path):
+    filename = str(tmp_path / "test.ngc")
+    with open(f"{filename}.journal", "w") as fh:
+        fh.write(f"@{file_state(filename)}\n")
+        fh.write("+G0 X1\n+G0 X2\n+G0 X3\n")
+        fh.write("=1 G0 Y2\n")
+        fh.write("-0\n")
+        fh.write("R\n+G0 Z1\n+G0 Z2\nE\n")
+        fh.write("+G0 Z3\n")
+        # crash while writing the last line
+        fh.write("+G0 Z")
+
+    program = Program()
+    assert Journal(filename).recover(program) == 8
+    assert list(program.blocks) == ["G0 Z1", "G0 Z2", "G0 Z3"]
+
+    program = Program()
+    with open(f"{filename}.journal", "w") as fh:
+        fh.write("+G0 X1\n+G0 X2\n+G0 X3\n=1 G0 Y2\n-0\n")
+    Journal(filename).recover(program)
+    assert list(program.blocks) == ["G0 Y2", "G0 X3"]
+
+
+def test_crash_recovery_marks_the_recovered_blocks(tmp_path):
+    filename = str(tmp_path / "test.ngc")
+    program = open_program(filename, journal=Journal(filename))
+    program.append("G0 X1\nG0 X2")
+    # crash: the journal is written, the program not saved
+    program.journal.close()
+
+    recovered = open_program(filename, journal=Journal(filename))
+    assert list(recovered.blocks) == list(program.blocks) + ["", "(recovered)"]
+    recovered.journal.close()
+
+
+def test_save_reopen_and_save_the_tail(tmp_path):
+    filename = str(tmp_path / "test.ngc")
+    program = open_program(filename, journal=Journal(filename))
+    program.append("G0 X1")
+    ProgramFile(filename).save(program)
+    program.journal.close()
+    assert not os.path.exists(f"{filename}.journal")
+    inode = os.stat(filename).st_ino
+
+    program = open_program(filename, journal=Journal(filename))
+    program_file = ProgramFile(filename)
+    program_file.attach(program)
+    program.append("G0 X2")
+    program_file.save(program)
+    program.journal.close()
+    assert not os.path.exists(f"{filename}.journal")
+
+    # only the tail is written at the end of the body (same file)
+    assert os.stat(filename).st_ino == inode
+    with open(filename) as fh:
+        lines = fh.read().split("\n")
+    assert lines[-6:] == ["G0 X1", "", "(reopen)", "G0 X2", "M02", ""]
+    assert lines.count("M02") == 1
+
+    # after an edit the file is rewritten
+    program.set_block(-1, "G0 X3")
+    program_file.save(program)
+    program.journal.close()
+    assert os.stat(filename).st_ino != inode
+    with open(filename) as fh:
+        assert fh.read() == program.text()
+
+
+def test_journal_of_a_saved_file_is_not_replayed(tmp_path):
+    filename = str(tmp_path / "test.ngc")
+    program = open_program(filename, journal=Journal(filename))
+    ProgramFile(filename).save(program)
+    program.journal.close()
+
+    program = open_program(filename, journal=Journal(filename))
+    program_file = ProgramFile(filename)
+    program_file.attach(program)
+    program.append("G0 X1\nG0 X2")
+    program.journal.close()
+    # crash after the tail save, before the journal is removed
+    program.journal = None
+    program_file.save(program)
+    assert os.path.exists(f"{filename}.journal")
+
+    reopened = open_program(filename, journal=Journal(filename))
+    assert list(reopened.blocks) == list(program.blocks) + ["", "(reopen)"]
+    assert not os.path.exists(f"{filename}.journal")
+    reopened.journal.close()
@@ -0,0 +1,31 @@
+from robotlogger.optimize import optimize_program
+
+
+def test_parallel_io_keeps_pulses_of_one_pin():
+    blocks = ["M64 P1", "G4 P0.1", "M65 P1", "G4 P0.1"]
+    assert optimize_program(blocks, parallel_io=True)[0] == blocks
+
+
+def test_parallel_io_keeps_analog_steps_of_one_channel():
+    blocks = ["M68 E0 Q10", "G4 P0.5", "M68 E0 Q0", "G4 P0.5"]
+    assert optimize_program(blocks, parallel_io=True)[0] == blocks
+
+
+def test_parallel_io_groups_other_pins():
+    blocks = ["M64 P1", "G4 P0.1", "M64 P2", "G4 P0.1", "M65 P1", "G4 P0.1"]
+    result, _report = optimize_program(blocks, parallel_io=True)
+    assert result == ["M64 P1", "M64 P2", "G4 P0.1 (pause)", "M65 P1", "G4 P0.1"]
+
+
+def test_mode_switch_at_the_end_is_kept():
+    blocks = ["G0 X1", "", "(ts)", "M429 (JOINT-COORDS)", "G0"]
+    result, report = optimize_program(blocks)
+    assert result == ["G0 X1", "", "(ts)", "M429 (JOINT-COORDS)"]
+    assert report["modes_removed"] == 0
+
+
+def test_repeated_mode_switch_at_the_end_is_counted():
+    blocks = ["M428", "G0 X1", "M428"]
+    result, report = optimize_program(blocks)
+    assert result == ["M428", "G0 X1"]
+    assert report["modes_removed"] == 1
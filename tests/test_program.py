@@ -0,0 +1,81 @@
+import pytest
+
+from robotlogger.journal import ProgramFile
+from robotlogger.program import FileBlocks, clean_line, open_program
+
+PROGRAMS = [
+    "G21\nG0 X1\nM02\n",
+    "G21\r\nG0 X1\r\n(comment)\r\nM02\r\n",
+    "G21\nM02\nG0 X1\nM02 (end)\n\n\n",
+    "no code\n\nG0 X1.5 Y2\nM2\nM02",
+    "G0 X1\nM0\nM02\nM020\n",
+    "\n\nG0 X1\n",
+    "",
+    "M02\n",
+    "\n\n",
+    "G0 X1\r\n\r\nM02\r\n\r\n",
+]
+
+
+def readlines_blocks(path):
+    """the same blocks with a plain line by line parse."""
+    with open(path, "rb") as fh:
+        lines = fh.read().split(b"\n")
+    while lines and not lines[-1]:
+        lines.pop()
+    return [
+        clean_line(line.decode().rstrip("\r")) for line in lines if not line.startswith(b"M02")
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 1 << 22])
+@pytest.mark.parametrize("text", PROGRAMS)
+def test_file_blocks_match_readlines(tmp_path, text, chunk_size):
+    path = tmp_path / "test.ngc"
+    path.write_bytes(text.encode())
+    blocks = FileBlocks(str(path), chunk_size=chunk_size)
+    assert [blocks[index] for index in range(len(blocks))] == readlines_blocks(path)
+
+
+def test_file_blocks_pristine(tmp_path):
+    path = tmp_path / "test.ngc"
+    path.write_bytes(b"G21\nG0 X1\nM02\n")
+    blocks = FileBlocks(str(path), chunk_size=3)
+    assert blocks.pristine
+    assert blocks.body_end == len(b"G21\nG0 X1\n")
+
+    for text in (b"G21\nM02\nG0 X1\nM02\n", b"G21\nG0 X1\n", b"x\nM02\n", b"G21\r\nM02\r\n"):
+        path.write_bytes(text)
+        assert not FileBlocks(str(path)).pristine
+
+
+def test_edit_and_delete_then_save(tmp_path):
+    filename = str(tmp_path / "test.ngc")
+    lines = [f"G0 X{index}" for index in range(10)]
+    with open(filename, "w") as fh:
+        fh.write("\n".join(lines + ["M02", ""]))
+
+    program = open_program(filename)
+    program_file = ProgramFile(filename)
+    program_file.attach(program)
+    program.append("G0 Y1")
+    # edits of the file part are kept as overrides
+    program.set_block(2, "G0 X20")
+    program.set_block(-1, "G0 Y2")
+    assert program.blocks.overrides == {2: "G0 X20"}
+    program_file.save(program)
+    expected = lines[:2] + ["G0 X20"] + lines[3:] + ["", "(reopen)", "G0 Y2"]
+    with open(filename) as fh:
+        assert fh.read() == "\n".join(expected + ["M02", ""])
+
+    program = open_program(filename)
+    program_file = ProgramFile(filename)
+    program_file.attach(program)
+    # deleting a file block loads the file part
+    program.delete_block(0)
+    program.delete_block(-1)
+    assert program.blocks.base == ()
+    program_file.save(program)
+    expected = expected[1:] + [""]
+    with open(filename) as fh:
+        assert fh.read() == "\n".join(expected + ["M02", ""])
@@ -0,0 +1,54 @@
+import numpy
+
+from robotlogger.capture import Capture
+from robotlogger.session import (
+    SessionReader,
+    SessionWriter,
+    row_from_status,
+    session_to_gcode,
+)
+
+
+
+def test_blocks_paths_and_reset(tmp_path, status):
+    writer = SessionWriter(str(tmp_path / "test.session"))
+    writer.append(row_from_status(status((1.0, 1.0, 1.0)), 0, [False] * 9))
+    writer.reset()
+    writer.append(row_from_status(status((2.0, 2.0, 2.0)), 0, [False] * 9))
+    writer.append_block("\nG4 P1 (pause)")
+    writer.append_block("\n(gripper)")
+    path = numpy.zeros((3, 9))
+    path[:, 0] = [3.0, 4.0, 5.0]
+    path[:, 1:3] = 2.0
+    writer.append_path([1.0, 2.0, 3.0], path, numpy.zeros((3, 9)))
+    writer.append(row_from_status(status((5.0, 2.0, 2.0)), 0, [False] * 9))
+    writer.close()
+
+    gcode = session_to_gcode(SessionReader(str(tmp_path / "test.session")))
+    blocks = [line for line in gcode.split("\n") if line and not line.startswith("(1970")]
+    assert "X1.0" not in gcode
+    assert blocks == [
+        "M428 (WORLD-COORDS)",
+        "G0 X2.0 Y2.0 Z2.0",
+        "G4 P1 (pause)",
+        "(gripper)",
+        "G0 X3.0 Y2.0 Z2.0",
+        "G0 X4.0",
+        "G0 X5.0",
+    ]
+
+
+def test_snapped_points_are_regenerated_as_logged(tmp_path, status):
+    capture = Capture()
+    capture.snap.set_values("X", "100")
+    sample = status((98.7, 20.0, 30.0))
+    logged = capture.record(sample)
+    assert "G0 X100.0 Y20.0 Z30.0" in logged
+
+    writer = SessionWriter(str(tmp_path / "test.session"))
+    writer.append(
+        row_from_status(sample, capture.mode, capture.pos_ws, snap_positions=capture.pos_w)
+    )
+    writer.close()
+    gcode = session_to_gcode(SessionReader(str(tmp_path / "test.session")))
+    assert "G0 X100.0 Y20.0 Z30.0" in gcode